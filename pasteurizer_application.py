@@ -1,173 +1,111 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-import threading
-import time
+from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
-import csv
+import argparse
+import logging
 import os
-import socket
-import serial
-import serial.tools.list_ports
+import time
+import threading
 
+from pasteurizer_chart import TemperatureChart
+from pasteurizer_engine import PasteurizerEngine
+from pasteurizer_metrics import SAMPLE_AGE
+import pasteurizer_logger
+import pasteurizer_metrics
+from pasteurizer_modbus import ModbusControllerInterface
+from pasteurizer_recipes import BatchScheduler, Recipe, load_recipes
+from pasteurizer_transports import (  # noqa: F401 - re-exported for existing imports
+    ArduinoSerialInterface, DeviceDiscovery, DeviceReader, Sample, WiFiArduinoInterface,
+    discover_arduinos, list_serial_ports, parse_frame, split_frames)
 
-class WiFiArduinoInterface:
-    def __init__(self, host='0.0.0.0', port=12345):
-        self.host = host
-        self.port = port
-        self.sock = None
+logger = logging.getLogger(__name__)
 
-    def connect(self):
-        try:
-            self.sock = socket.create_connection((self.host, self.port))
-            return True
-        except Exception as e:
-            print(f"[WiFiArduinoInterface] Connection failed: {e}")
-            return False
-
-    def disconnect(self):
-        if self.sock:
-            self.sock.close()
-            self.sock = None
-
-    def read_temperatures(self):
-        try:
-            data = self.sock.recv(1024).decode().strip()
-            parts = {}
-            for kv in data.split(","):
-                if ":" in kv:
-                    key, val = kv.split(":", 1)
-                    try:
-                        parts[key] = float(val)
-                    except ValueError:
-                        pass
-            return parts.get("T_CORE", 0.0), parts.get("T_WATER", 0.0)
-        except Exception as e:
-            print(f"[WiFiArduinoInterface] Read error: {e}")
-            return 0.0, 0.0
-
-    def write_command(self, command):
-        try:
-            self.sock.sendall((command + "\n").encode())
-        except Exception as e:
-            print(f"[WiFiArduinoInterface] Write error: {e}")
 
+class UiRefreshScheduler:
+    """Collapses UI updates requested from any thread into one repaint per frame.
 
-class ArduinoSerialInterface:
-    def __init__(self, port='/dev/tty.usbmodem12345', baudrate=9600):
-        self.port = port
-        self.baudrate = baudrate
-        self.ser = None
-        self.core_temp = 0.0
-        self.water_temp = 0.0
+    request() keeps only the latest call per key, so a burst of samples costs a
+    single label update; the Tk event queue sees one timer per frame no matter
+    how fast the controller streams.
+    """
 
-    def connect(self):
-        try:
-            self.ser = serial.Serial(self.port, self.baudrate, timeout=1)
-            time.sleep(2)
-            return True
-        except Exception as e:
-            print(f"[ArduinoSerialInterface] Connection failed: {e}")
-            return False
-
-    def disconnect(self):
-        if self.ser and self.ser.is_open:
-            self.ser.close()
-
-    def read_temperatures(self):
-        try:
-            if self.ser.in_waiting:
-                line = self.ser.readline().decode('utf-8', errors='ignore').strip()
-                print(f"[USB DEBUG] Raw: {line}")  # Debug output
-
-                # Extract substring with temperature info, e.g., T_CORE:25.5,T_WATER:25.9
-                if "T_CORE:" in line and "T_WATER:" in line:
-                    parts = {}
-                    # Optional: if your data is always like "[Arduino] Sent: T_CORE:...,T_WATER:..." you can just extract the substring after the colon
-                    payload = line.split(
-                        "Sent:", 1)[-1].strip() if "Sent:" in line else line
-
-                    for kv in payload.split(","):
-                        if ":" in kv:
-                            key, val = kv.split(":", 1)
-                            key = key.strip()
-                            val = val.strip()
-
-                            if key in ("T_CORE", "T_WATER"):  # Only parse known float keys
-                                try:
-                                    parts[key] = float(val)
-                                except ValueError:
-                                    print(
-                                        f"[USB DEBUG] Invalid float in: {kv}")
-                    if "T_CORE" in parts and "T_WATER" in parts:
-                        self.core_temp = parts["T_CORE"]
-                        self.water_temp = parts["T_WATER"]
-                return self.core_temp, self.water_temp
-
-            return self.core_temp, self.water_temp
-
-        except Exception as e:
-            print(f"[ArduinoSerialInterface] Read error: {e}")
-            return self.core_temp, self.water_temp
-
-    def write_command(self, command):
-        try:
-            self.ser.write((command + "\n").encode())
-        except Exception as e:
-            print(f"[ArduinoSerialInterface] Write error: {e}")
-
-
-def discover_arduinos(timeout=3):
-    import socket
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    sock.settimeout(timeout)
-    sock.bind(("", 8888))  # Port should match Arduino broadcast
-
-    found = set()
-    try:
-        while True:
-            data, addr = sock.recvfrom(1024)
-            msg = data.decode()
-            found.add((msg, addr[0]))
-    except socket.timeout:
-        pass
-    finally:
-        sock.close()
-    return list(found)
+    def __init__(self, root, fps=15):
+        self.root = root
+        self.interval = int(1000 / fps)
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def request(self, key, callback, *args):
+        with self.lock:
+            self.pending[key] = (callback, args)
+
+    def start(self):
+        self.root.after(self.interval, self.tick)
+
+    def tick(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for callback, args in pending.values():
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.exception("UI update failed: %s", e)
+        self.root.after(self.interval, self.tick)
+
+
+class LogPane:
+    """tk.Text capped to the last max_lines lines; lines added in one frame are inserted together"""
+
+    def __init__(self, text, scheduler, max_lines=500):
+        self.text = text
+        self.scheduler = scheduler
+        self.max_lines = max_lines
+        self.lines = []
+        self.lock = threading.Lock()
+
+    def append(self, line):
+        with self.lock:
+            self.lines.append(line)
+        self.scheduler.request("log", self.flush)
+
+    def flush(self):
+        with self.lock:
+            lines, self.lines = self.lines[-self.max_lines:], []
+        if not lines:
+            return
+        self.text.insert(tk.END, "\n".join(lines) + "\n")
+        excess = int(self.text.index("end-1c").split(".")[0]) - 1 - self.max_lines
+        if excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+        self.text.see(tk.END)
 
 
 class MountjoyPasteurizerApp:
-    def __init__(self, root):
+    def __init__(self, root, engine=None):
         self.root = root
         self.root.title("Pasteurizer Control")
-        self.root.geometry("850x700")
+        self.root.geometry("850x900")
 
-        self.client = None
-        self.connected = False
-        self.monitoring = False
         self.connection_mode = tk.StringVar(value="wifi")
-
-        self.core_temp = 0.0
-        self.water_temp = 0.0
         self.unit = "C"
 
-        # Create logs directory and set up file path
+        # All acquisition, control and logging lives in the engine; this class is the view
         self.logs_dir = "pasteurizer_logs"
-        os.makedirs(self.logs_dir, exist_ok=True)
-        self.log_file = os.path.join(
-            self.logs_dir, f"pasteurizer_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        self.engine = engine or PasteurizerEngine(self.logs_dir)
+        self.engine.subscribe_samples(self.on_sample)
+        self.engine.subscribe_events(self.on_event)
+        self.engine.subscribe_status(self.on_link_status)
+        self.batches = BatchScheduler(self.engine)
+        self.batches.subscribe(self.on_batch_status)
 
-        self.process_state = "IDLE"
         self.process_type = tk.StringVar(value="HEAT_COOL")
-        self.start_time = None
         self.hold_time = 30
-        self.hold_start = None
 
         self.heat_setpoint = tk.DoubleVar(value=72.0)
         self.cool_setpoint = tk.DoubleVar(value=32.0)
 
         self.setup_ui()
-        self.setup_logging()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def setup_ui(self):
         main = ttk.Frame(self.root, padding="10")
@@ -181,18 +119,23 @@ class MountjoyPasteurizerApp:
                         value="wifi", command=self.toggle_mode).grid(row=0, column=1, sticky="w")
         ttk.Radiobutton(conn, text="USB", variable=self.connection_mode, value="usb",
                         command=self.toggle_mode).grid(row=0, column=2, sticky="w")
+        ttk.Radiobutton(conn, text="Modbus", variable=self.connection_mode, value="modbus",
+                        command=self.toggle_mode).grid(row=0, column=3, sticky="w")
 
         self.wifi_host_entry = ttk.Entry(conn)
         self.wifi_host_entry.insert(0, "0.0.0.0")
         self.wifi_port_entry = ttk.Entry(conn, width=6)
         self.wifi_port_entry.insert(0, "12345")
 
-        self.port_combo = ttk.Combobox(
-            conn, values=self.get_serial_ports(), state="readonly")
+        self.port_combo = ttk.Combobox(conn, state="readonly")
+
+        self.slave_spin = ttk.Spinbox(conn, from_=1, to=247, width=4)
+        self.slave_spin.set(1)
 
         self.wifi_host_entry.grid(row=1, column=0)
         self.wifi_port_entry.grid(row=1, column=1)
         self.port_combo.grid(row=1, column=0, columnspan=2)
+        self.slave_spin.grid(row=2, column=2, sticky="w")
 
         # Dropdown for discovered devices (auto-populated)
         self.device_combo = ttk.Combobox(conn, state="readonly")
@@ -213,6 +156,8 @@ class MountjoyPasteurizerApp:
         self.water_label = ttk.Label(
             temp, text="Water: --", font=("Arial", 14))
         self.water_label.grid(row=1, column=0, sticky="w")
+        self.lethality_label = ttk.Label(temp, text="F: --", font=("Arial", 14))
+        self.lethality_label.grid(row=2, column=0, sticky="w")
 
         unit_frame = ttk.LabelFrame(main, text="Units")
         unit_frame.grid(row=1, column=1, sticky="nsew")
@@ -236,25 +181,50 @@ class MountjoyPasteurizerApp:
                 row=i, column=0, sticky="w")
 
         process = ttk.LabelFrame(main, text="Process")
-        process.grid(row=3, column=0, columnspan=2, sticky="nsew")
+        process.grid(row=3, column=0, sticky="nsew")
         self.status = ttk.Label(process, text="IDLE", font=("Arial", 14))
         self.status.grid(row=0, column=0, columnspan=2)
         ttk.Label(process, text="Hold Time (s):").grid(row=1, column=0)
         self.hold_var = tk.IntVar(value=self.hold_time)
         ttk.Entry(process, textvariable=self.hold_var).grid(row=1, column=1)
+        ttk.Label(process, text="Target F (min, blank = timed hold):").grid(row=2, column=0)
+        self.target_lethality_entry = ttk.Entry(process)
+        self.target_lethality_entry.grid(row=2, column=1)
         ttk.Button(process, text="Start",
-                   command=self.start_process).grid(row=2, column=0)
+                   command=self.start_process).grid(row=3, column=0)
         ttk.Button(process, text="Stop", command=self.stop_process).grid(
-            row=2, column=1)
+            row=3, column=1)
+
+        batch = ttk.LabelFrame(main, text="Batch Queue")
+        batch.grid(row=3, column=1, sticky="nsew")
+        self.queue_list = tk.Listbox(batch, height=5, width=45)
+        self.queue_list.grid(row=0, column=0, columnspan=3, sticky="ew")
+        ttk.Label(batch, text="Water below (°C, optional):").grid(row=1, column=0, columnspan=2,
+                                                                 sticky="w")
+        self.water_below_entry = ttk.Entry(batch, width=8)
+        self.water_below_entry.grid(row=1, column=2, sticky="w")
+        ttk.Button(batch, text="Add Current", command=self.queue_current).grid(row=2, column=0)
+        ttk.Button(batch, text="Load...", command=self.load_queue).grid(row=2, column=1)
+        ttk.Button(batch, text="Remove", command=self.remove_queued).grid(row=2, column=2)
+        ttk.Button(batch, text="Run Queue", command=self.batches.start).grid(row=3, column=0)
+        ttk.Button(batch, text="Pause", command=self.batches.pause).grid(row=3, column=1)
+        self.queue_status = ttk.Label(batch, text="")
+        self.queue_status.grid(row=4, column=0, columnspan=3, sticky="w")
+
+        chart = ttk.LabelFrame(main, text="Temperature Chart")
+        chart.grid(row=4, column=0, columnspan=2, sticky="nsew")
+        self.chart = TemperatureChart(chart)
+        self.chart.pack(expand=True, fill="both")
+        self.chart.start()
 
         log = ttk.LabelFrame(main, text="Logs")
-        log.grid(row=4, column=0, columnspan=2, sticky="nsew")
+        log.grid(row=5, column=0, columnspan=2, sticky="nsew")
         self.log_text = tk.Text(log, height=8)
         self.log_text.pack(expand=True, fill="both")
-        # Schedule auto-discovery after UI setup is complete
-        if self.connection_mode.get() == "wifi":
-            # Schedule device discovery shortly after UI setup finishes
-            self.root.after(100, self.populate_discovered_devices)
+        self.ui = UiRefreshScheduler(self.root)
+        self.log_pane = LogPane(self.log_text, self.ui)
+        self.ui.start()
+        self.start_discovery()
 
 
     def toggle_mode(self):
@@ -262,18 +232,38 @@ class MountjoyPasteurizerApp:
             self.wifi_host_entry.grid()
             self.wifi_port_entry.grid()
             self.port_combo.grid_remove()
+            self.slave_spin.grid_remove()
             self.device_combo.grid()
         else:
             self.wifi_host_entry.grid_remove()
             self.wifi_port_entry.grid_remove()
             self.device_combo.grid_remove()
-            self.port_combo['values'] = self.get_serial_ports()
-            if self.port_combo['values']:
-                self.port_combo.set(self.port_combo['values'][0])
+            self.refresh_serial_ports()
             self.port_combo.grid()
+            if self.connection_mode.get() == "modbus":
+                self.slave_spin.grid()
+            else:
+                self.slave_spin.grid_remove()
 
     def get_serial_ports(self):
-        return [port.device for port in serial.tools.list_ports.comports()]
+        return list_serial_ports()
+
+    def refresh_serial_ports(self):
+        """Enumerate ports on a worker thread; the combobox fills in when it is done"""
+        def enumerate_ports():
+            try:
+                ports = list_serial_ports()
+            except Exception as e:
+                logger.warning("Could not list serial ports: %s", e)
+                ports = []
+            self.root.after(0, self.show_serial_ports, ports)
+
+        threading.Thread(target=enumerate_ports, daemon=True).start()
+
+    def show_serial_ports(self, ports):
+        self.port_combo['values'] = ports
+        if ports and self.port_combo.get() not in ports:
+            self.port_combo.set(ports[0])
 
     def change_unit(self, event):
         self.unit = self.unit_toggle.get()
@@ -283,160 +273,189 @@ class MountjoyPasteurizerApp:
         return c * 9 / 5 + 32
 
     def display_temp(self, temp):
+        if temp is None:
+            return "--"
         return f"{self.c_to_f(temp):.1f} °F" if self.unit == "F" else f"{temp:.1f} °C"
 
     def update_display(self):
+        if self.engine.last_sample_time is not None:
+            SAMPLE_AGE.observe(time.monotonic() - self.engine.last_sample_time)
         self.core_label.config(
-            text=f"Core: {self.display_temp(self.core_temp)}")
+            text=f"Core: {self.display_temp(self.engine.core_temp)}")
         self.water_label.config(
-            text=f"Water: {self.display_temp(self.water_temp)}")
-
-    def setup_logging(self):
-        if not os.path.exists(self.log_file):
-            with open(self.log_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(['Timestamp', 'Core_Temp_C', 'Water_Temp_C', 'Process_State',
-                                'Heat_Setpoint', 'Cool_Setpoint', 'Process_Type', 'Event'])
+            text=f"Water: {self.display_temp(self.engine.water_temp)}")
+        self.lethality_label.config(
+            text=f"F: {self.engine.machine.lethality.value:.2f} min")
+        color = "gray" if self.engine.connected and self.engine.stale else ""
+        self.core_label.config(foreground=color)
+        self.water_label.config(foreground=color)
+        remaining = self.engine.machine.hold_remaining()
+        if remaining is not None:
+            self.status.config(text=f"HOLDING {remaining:.0f}s")
 
     def log_to_csv(self, event=""):
-        """Log current state to CSV file"""
-        try:
-            with open(self.log_file, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    datetime.now().isoformat(),
-                    self.core_temp,
-                    self.water_temp,
-                    self.process_state,
-                    self.heat_setpoint.get(),
-                    self.cool_setpoint.get(),
-                    self.process_type.get(),
-                    event
-                ])
-        except Exception as e:
-            print(f"Error writing to CSV: {e}")
+        self.engine.log_to_csv(event)
 
     def log(self, msg, log_to_csv=True, event=""):
         ts = datetime.now().strftime('%H:%M:%S')
-        self.log_text.insert(tk.END, f"[{ts}] {msg}\n")
-        self.log_text.see(tk.END)
+        self.log_pane.append(f"[{ts}] {msg}")
 
         if log_to_csv:
             self.log_to_csv(event or msg)
 
     def toggle_connection(self):
-        if not self.connected:
+        if not self.engine.connected:
             if self.connection_mode.get() == "wifi":
                 host = self.wifi_host_entry.get()
                 port = int(self.wifi_port_entry.get())
-                self.client = WiFiArduinoInterface(host, port)
+                client = WiFiArduinoInterface(host, port)
+            elif self.connection_mode.get() == "modbus":
+                client = ModbusControllerInterface(self.port_combo.get(), int(self.slave_spin.get()))
             else:
                 port = self.port_combo.get()
-                self.client = ArduinoSerialInterface(port)
+                client = ArduinoSerialInterface(port)
 
-            if self.client.connect():
-                self.connected = True
+            if self.engine.connect(client):
                 self.status_label.config(text="Connected", foreground="green")
                 self.connect_btn.config(text="Disconnect")
-                self.log(
-                    f"Connected via {self.connection_mode.get().upper()}", event="CONNECTION_ESTABLISHED")
-                self.start_monitoring()
+                self.log(f"Connected via {self.connection_mode.get().upper()}", log_to_csv=False)
             else:
                 messagebox.showerror("Error", "Could not connect")
         else:
-            self.monitoring = False
-            self.client.disconnect()
-            self.connected = False
+            self.engine.disconnect()
             self.status_label.config(text="Disconnected", foreground="red")
             self.connect_btn.config(text="Connect")
-            self.log("Disconnected", event="CONNECTION_LOST")
-
-    def start_monitoring(self):
-        self.monitoring = True
-        threading.Thread(target=self.monitor_loop, daemon=True).start()
-
-    def monitor_loop(self):
-        last_log_time = 0
-        while self.monitoring and self.connected:
-            self.core_temp, self.water_temp = self.client.read_temperatures()
-            self.root.after(0, self.update_display)
-
-            # Log temperature data every 10 seconds during monitoring
-            current_time = time.time()
-            if current_time - last_log_time >= 10:
-                self.log_to_csv("TEMPERATURE_READING")
-                last_log_time = current_time
+            self.log("Disconnected", log_to_csv=False)
+
+    def on_sample(self, sample):
+        """Called on the reader thread for every frame the controller sends"""
+        self.chart.add_sample(sample)
+        self.ui.request("display", self.update_display)
+
+    def on_event(self, transition):
+        """Called on whichever thread caused the transition"""
+        if transition.event == "PROCESS_STARTED":
+            machine = self.engine.machine
+            self.chart.set_setpoints(machine.heat_setpoint, machine.cool_setpoint)
+        self.chart.add_transition(transition)
+        self.ui.request("status", self.show_status, transition)
+        self.log(transition.message, log_to_csv=False)
+
+    def on_link_status(self, status, message):
+        """Called on the reader or command thread when the link changes"""
+        self.ui.request("link", self.show_link_status, status)
+        self.log(message, log_to_csv=False)
+
+    def show_link_status(self, status):
+        if not self.engine.connected:
+            return
+        if status == "CONNECTED":
+            self.status_label.config(text="Connected", foreground="green")
+        elif status in ("STALE", "RECONNECTING"):
+            self.status_label.config(text=status.capitalize() + "...", foreground="orange")
+        self.update_display()
 
-            time.sleep(1)
+    def current_recipe(self, water_below=None):
+        """Recipe from the setpoint, mode and hold fields, or None after showing the error"""
+        target = self.target_lethality_entry.get().strip()
+        try:
+            self.hold_time = self.hold_var.get()
+            target_lethality = float(target) if target else None
+            return Recipe(process_type=self.process_type.get(),
+                          heat_setpoint=self.heat_setpoint.get(),
+                          cool_setpoint=self.cool_setpoint.get(), hold_time=self.hold_time,
+                          target_lethality=target_lethality, water_below=water_below)
+        except (ValueError, tk.TclError) as e:
+            messagebox.showerror("Error", f"Invalid recipe: {e}")
+            return None
 
     def start_process(self):
-        self.process_state = "HEATING" if self.process_type.get() in [
-            "HEAT", "HEAT_COOL"] else "COOLING"
-        self.hold_time = self.hold_var.get()
-        self.status.config(text=f"{self.process_state}")
-        self.start_time = datetime.now()
-        self.hold_start = None
-
-        self.client.write_command(
-            "heat" if self.process_state == "HEATING" else "cool")
-        threading.Thread(target=self.control_loop, daemon=True).start()
-        self.log(f"Started {self.process_state} cycle (Target: {self.heat_setpoint.get() if self.process_state == 'HEATING' else self.cool_setpoint.get()}°C)",
-                 event="PROCESS_STARTED")
+        recipe = self.current_recipe()
+        if recipe:
+            self.engine.start_recipe(**recipe.params())
 
     def stop_process(self):
-        self.process_state = "IDLE"
-        self.client.write_command("stop")
-        self.status.config(text="IDLE")
-        self.log("Process stopped manually", event="PROCESS_STOPPED")
-
-    def control_loop(self):
-        while self.process_state != "IDLE":
-            if self.process_state == "HEATING" and self.core_temp >= self.heat_setpoint.get():
-                self.process_state = "HOLDING"
-                self.hold_start = datetime.now()
-                self.status.config(text=f"HOLDING {self.hold_time}s")
-                self.log(
-                    f"Hold started - Target temp {self.heat_setpoint.get()}°C reached", event="HOLD_STARTED")
-
-            elif self.process_state == "HOLDING":
-                elapsed = (datetime.now() - self.hold_start).total_seconds()
-                remaining = max(0, self.hold_time - elapsed)
-                self.status.config(text=f"HOLDING {remaining:.0f}s")
-
-                if elapsed >= self.hold_time:
-                    if self.process_type.get() == "HEAT_COOL":
-                        self.process_state = "COOLING"
-                        self.client.write_command("cool")
-                        self.status.config(text="COOLING")
-                        self.log(
-                            f"Hold complete - Starting cooling to {self.cool_setpoint.get()}°C", event="COOLING_STARTED")
-                    else:
-                        self.stop_process()
-                        self.status.config(text="COMPLETE")
-                        self.log("Process completed successfully",
-                                 event="PROCESS_COMPLETED")
-
-            elif self.process_state == "COOLING" and self.core_temp <= self.cool_setpoint.get():
-                self.stop_process()
-                self.status.config(text="COMPLETE")
-                self.log(
-                    f"Cooling complete - Target temp {self.cool_setpoint.get()}°C reached", event="PROCESS_COMPLETED")
-
-            time.sleep(1)
-
-    def populate_discovered_devices(self, repeat=True):
-        self.log("Scanning for devices...", log_to_csv=False)
-        devices = discover_arduinos()
+        self.engine.stop()
+
+    def queue_current(self):
+        text = self.water_below_entry.get().strip()
+        try:
+            water_below = float(text) if text else None
+        except ValueError:
+            messagebox.showerror("Error", f"Invalid water temperature: {text}")
+            return
+        recipe = self.current_recipe(water_below)
+        if recipe:
+            self.batches.add(recipe)
+            self.show_queue()
+
+    def load_queue(self):
+        path = filedialog.askopenfilename(title="Load recipes", initialdir=self.logs_dir,
+                                          filetypes=[("Recipe lists", "*.json")])
+        if not path:
+            return
+        try:
+            self.batches.extend(load_recipes(path))
+        except (OSError, ValueError, TypeError) as e:
+            messagebox.showerror("Error", f"Could not load {path}: {e}")
+            return
+        self.show_queue()
+
+    def remove_queued(self):
+        for index in reversed(self.queue_list.curselection()):
+            self.batches.remove(index)
+        self.show_queue()
+
+    def on_batch_status(self, status, message):
+        """Called on the batch scheduler thread"""
+        self.ui.request("queue", self.show_queue)
+        self.log(message, log_to_csv=False)
+
+    def show_queue(self):
+        self.queue_list.delete(0, tk.END)
+        for recipe in self.batches.pending():
+            self.queue_list.insert(tk.END, recipe.describe())
+        self.queue_status.config(text=f"{self.batches.status.capitalize()} - "
+                                      f"{len(self.batches.summaries)} run(s) done")
+
+    def show_status(self, transition):
+        if transition.event == "PROCESS_COMPLETED":
+            self.status.config(text="COMPLETE")
+        elif transition.state == "HOLDING" and self.engine.machine.target_lethality is not None:
+            self.status.config(text=f"HOLDING to F={self.engine.machine.target_lethality}")
+        elif transition.state == "HOLDING":
+            self.status.config(text=f"HOLDING {self.engine.machine.hold_time}s")
+        else:
+            self.status.config(text=transition.state)
+
+    def start_discovery(self):
+        self.discovered_devices = []
+        self.discovery = DeviceDiscovery(
+            cache_file=os.path.join(self.logs_dir, "known_devices.json"))
+        self.discovery.subscribe(
+            lambda devices: self.root.after(0, self.show_discovered_devices, devices))
+        # Devices remembered from the last session are offered before the listener hears anything
+        self.show_discovered_devices(self.discovery.snapshot())
+        if self.discovery.start():
+            self.log("Listening for device announcements...", log_to_csv=False)
+
+    def show_discovered_devices(self, devices):
         display_list = [f"{msg} ({ip})" for msg, ip in devices]
         self.device_combo['values'] = display_list
         self.discovered_devices = devices
         if display_list:
-            self.device_combo.set(display_list[0])
+            if self.device_combo.get() not in display_list:
+                self.device_combo.set(display_list[0])
             self.log(f"Found {len(devices)} device(s)", log_to_csv=False)
         else:
+            self.device_combo.set("")
             self.log("No devices found.", log_to_csv=False)
-            if repeat:
-                self.root.after(5000, self.populate_discovered_devices)  # Retry after 5 seconds
+
+    def on_close(self):
+        self.batches.close()
+        self.discovery.stop()
+        self.engine.close()
+        self.root.destroy()
 
     def select_discovered_device(self, event=None):
         selection = self.device_combo.get()
@@ -448,9 +467,42 @@ class MountjoyPasteurizerApp:
         self.toggle_connection()  # Auto-connect after selecting
 
 
+def report_startup(root, started, exit_after, close):
+    """Runs once the window has been drawn and the event loop is idle"""
+    elapsed = (time.perf_counter() - started) * 1000
+    logger.info("Window interactive %.0f ms after Tk start", elapsed)
+    if exit_after:
+        print(f"STARTUP_MS {elapsed:.1f}", flush=True)
+        root.after(0, close)
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Pasteurizer control GUI")
+    parser.add_argument("--web", type=int, metavar="PORT", help="serve a live web dashboard")
+    parser.add_argument("--acquisition-process", action="store_true",
+                        help="read the controller and run the cycle logic in a child process")
+    parser.add_argument("--exit-after-startup", action="store_true",
+                        help="print the startup time and quit (used by the startup benchmark)")
+    parser.add_argument("--web-host", default="127.0.0.1",
+                        help="dashboard address (0.0.0.0 to allow other machines)")
+    pasteurizer_logger.add_arguments(parser)
+    pasteurizer_metrics.add_arguments(parser)
+    args = parser.parse_args()
+    pasteurizer_metrics.configure(args)
+    started = time.perf_counter()
+    if args.acquisition_process:
+        from pasteurizer_process import ProcessEngine
+
+        engine = ProcessEngine("pasteurizer_logs", **pasteurizer_logger.options(args))
+    else:
+        engine = PasteurizerEngine("pasteurizer_logs", **pasteurizer_logger.options(args))
     root = tk.Tk()
-    MountjoyPasteurizerApp(root)
+    app = MountjoyPasteurizerApp(root, engine)
+    root.after_idle(report_startup, root, started, args.exit_after_startup, app.on_close)
+    if args.web is not None:
+        from pasteurizer_web import WebDashboard
+
+        WebDashboard(app.engine, args.web_host, args.web).start()
     root.mainloop()
 
 
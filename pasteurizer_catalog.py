@@ -0,0 +1,351 @@
+"""SQLite index of the CSV logs, so searches don't re-read every file.
+
+    python pasteurizer_catalog.py update
+    python pasteurizer_catalog.py query --since 2025-05-01 --hold-below 72
+    python pasteurizer_catalog.py events 42
+    python pasteurizer_catalog.py export cycles.csv --process-type HEAT_COOL
+
+Each file is read from where the previous update stopped (only complete
+lines), so indexing a log that is still being written costs only the new
+rows. A file that shrank or was replaced is indexed again from the start.
+"""
+import argparse
+import csv
+import glob
+import io
+import json
+import logging
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+CATALOG_NAME = "catalog.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime REAL,
+    offset INTEGER,
+    columns TEXT,
+    open_cycle INTEGER
+);
+CREATE TABLE IF NOT EXISTS cycles (
+    id INTEGER PRIMARY KEY,
+    file TEXT,
+    start TEXT,
+    end TEXT,
+    result TEXT,
+    process_type TEXT,
+    heat_setpoint REAL,
+    cool_setpoint REAL,
+    min_core REAL,
+    max_core REAL,
+    hold_start TEXT,
+    hold_end TEXT,
+    hold_seconds REAL,
+    min_hold_core REAL,
+    lethality REAL,
+    samples INTEGER
+);
+CREATE TABLE IF NOT EXISTS events (
+    cycle_id INTEGER,
+    file TEXT,
+    timestamp TEXT,
+    event TEXT,
+    state TEXT,
+    core_temp REAL
+);
+CREATE INDEX IF NOT EXISTS cycles_start ON cycles (start);
+CREATE INDEX IF NOT EXISTS events_cycle ON events (cycle_id);
+CREATE INDEX IF NOT EXISTS events_file ON events (file);
+"""
+
+CYCLE_FIELDS = ("file", "start", "end", "result", "process_type", "heat_setpoint",
+                "cool_setpoint", "min_core", "max_core", "hold_start", "hold_end",
+                "hold_seconds", "min_hold_core", "lethality", "samples")
+
+CYCLE_END_EVENTS = ("PROCESS_COMPLETED", "PROCESS_STOPPED")
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def reading(row):
+    """Core temperature of a row, or None when it holds no real reading
+
+    Logs written before the engine left temperatures empty until the first
+    sample carry 0.0 / 0.0 on their CONNECTION_ESTABLISHED and PROCESS_STARTED
+    rows.
+    """
+    core = to_float(row.get("Core_Temp_C"))
+    if core == 0.0 and to_float(row.get("Water_Temp_C")) == 0.0 \
+            and row.get("Event") != "TEMPERATURE_READING":
+        return None
+    return core
+
+
+def seconds_between(start, end):
+    try:
+        return (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds()
+    except (TypeError, ValueError):
+        return None
+
+
+class Catalog:
+    """Index of every pasteurizer_log_*.csv under logs_dir (fleet subdirectories included)"""
+
+    def __init__(self, logs_dir="pasteurizer_logs", path=None):
+        self.logs_dir = logs_dir
+        self.path = path or os.path.join(logs_dir, CATALOG_NAME)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def log_files(self):
+        pattern = os.path.join(self.logs_dir, "**", "pasteurizer_log_*.csv")
+        return sorted(glob.glob(pattern, recursive=True))
+
+    def update(self):
+        """Index whatever was appended since the last update; returns the number of new rows"""
+        total = 0
+        for path in self.log_files():
+            try:
+                total += self.update_file(path)
+            except OSError as e:
+                logger.warning("Could not index %s: %s", path, e)
+        return total
+
+    def update_file(self, path):
+        stat = os.stat(path)
+        with self.db:
+            # Take the write lock before reading the offset, so two updates running at once (the
+            # engine's timer and close(), or two processes) cannot both index the same rows
+            self.db.execute("BEGIN IMMEDIATE")
+            known = self.db.execute("SELECT * FROM files WHERE path = ?", (path,)).fetchone()
+            if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+                return 0
+            if known and stat.st_size < known["offset"]:
+                logger.info("%s shrank, indexing it again", path)
+                self.forget(path)
+                known = None
+
+            offset = known["offset"] if known else 0
+            columns = json.loads(known["columns"]) if known and known["columns"] else None
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+            end = data.rfind(b"\n") + 1  # leave a partial last line for next time
+            lines = io.StringIO(data[:end].decode(errors="replace"), newline="")
+            rows = csv.reader(lines)
+            if columns is None:
+                columns = next(rows, None)
+
+            cycle = self.load_cycle(known["open_cycle"]) if known and known["open_cycle"] else None
+            count = 0
+            for values in rows:
+                if not values:
+                    continue
+                cycle = self.index_row(path, cycle, dict(zip(columns, values)))
+                count += 1
+            if cycle:
+                self.save_cycle(cycle)
+            self.db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime, offset + end,
+                 json.dumps(columns) if columns else None,
+                 cycle["id"] if cycle and cycle["end"] is None else None))
+        return count
+
+    def forget(self, path):
+        """Drop everything indexed from path (inside the caller's transaction)"""
+        self.db.execute("DELETE FROM events WHERE file = ?", (path,))
+        self.db.execute("DELETE FROM cycles WHERE file = ?", (path,))
+        self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def index_row(self, path, cycle, row):
+        """Fold one CSV row into the open cycle; returns the cycle still open (or None)"""
+        timestamp = row.get("Timestamp")
+        event = row.get("Event", "")
+        state = row.get("Process_State")
+        core = reading(row)
+
+        if event == "PROCESS_STARTED":
+            if cycle and cycle["end"] is None:
+                cycle["end"] = timestamp
+                cycle["result"] = "INTERRUPTED"
+                self.save_cycle(cycle)
+            cycle = self.new_cycle(path, row)
+        elif cycle is not None and cycle["end"] is not None:
+            cycle = None
+
+        if event and event != "TEMPERATURE_READING":
+            self.db.execute("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)",
+                            (cycle["id"] if cycle else None, path, timestamp, event, state, core))
+        if cycle is None:
+            return None
+
+        cycle["samples"] += 1
+        if core is not None:
+            cycle["min_core"] = core if cycle["min_core"] is None else min(cycle["min_core"], core)
+            cycle["max_core"] = core if cycle["max_core"] is None else max(cycle["max_core"], core)
+            if state == "HOLDING":
+                low = cycle["min_hold_core"]
+                cycle["min_hold_core"] = core if low is None else min(low, core)
+        lethality = to_float(row.get("Lethality_F_min"))
+        if lethality is not None:
+            cycle["lethality"] = lethality
+
+        if event == "HOLD_STARTED":
+            cycle["hold_start"] = timestamp
+        elif cycle["hold_start"] and not cycle["hold_end"] and state != "HOLDING":
+            cycle["hold_end"] = timestamp
+            cycle["hold_seconds"] = seconds_between(cycle["hold_start"], timestamp)
+        if event in CYCLE_END_EVENTS:
+            cycle["end"] = timestamp
+            cycle["result"] = event
+            self.save_cycle(cycle)
+        return cycle
+
+    def new_cycle(self, path, row):
+        cycle = dict.fromkeys(CYCLE_FIELDS)
+        cycle.update(file=path, start=row.get("Timestamp"), process_type=row.get("Process_Type"),
+                     heat_setpoint=to_float(row.get("Heat_Setpoint")),
+                     cool_setpoint=to_float(row.get("Cool_Setpoint")), samples=0)
+        cursor = self.db.execute(
+            f"INSERT INTO cycles ({', '.join(CYCLE_FIELDS)}) VALUES ({', '.join('?' * len(CYCLE_FIELDS))})",
+            [cycle[k] for k in CYCLE_FIELDS])
+        cycle["id"] = cursor.lastrowid
+        return cycle
+
+    def load_cycle(self, cycle_id):
+        row = self.db.execute("SELECT * FROM cycles WHERE id = ?", (cycle_id,)).fetchone()
+        return dict(row) if row else None
+
+    def save_cycle(self, cycle):
+        self.db.execute(
+            f"UPDATE cycles SET {', '.join(f'{k} = ?' for k in CYCLE_FIELDS)} WHERE id = ?",
+            [cycle[k] for k in CYCLE_FIELDS] + [cycle["id"]])
+
+    def cycles(self, since=None, until=None, process_type=None, result=None, hold_below=None,
+               heat_below=None):
+        """Cycles matching every given filter, oldest first"""
+        clauses, params = [], []
+        if since:
+            clauses.append("start >= ?")
+            params.append(since)
+        if until:
+            clauses.append("start < ?")
+            params.append(until)
+        if process_type:
+            clauses.append("process_type = ?")
+            params.append(process_type)
+        if result:
+            clauses.append("result = ?")
+            params.append(result)
+        if hold_below is not None:
+            clauses.append("min_hold_core < ?")
+            params.append(hold_below)
+        if heat_below is not None:
+            clauses.append("heat_setpoint < ?")
+            params.append(heat_below)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return [dict(row) for row in
+                self.db.execute(f"SELECT * FROM cycles {where} ORDER BY start", params)]
+
+    def events(self, cycle_id):
+        return [dict(row) for row in self.db.execute(
+            "SELECT timestamp, event, state, core_temp FROM events WHERE cycle_id = ? "
+            "ORDER BY rowid", (cycle_id,))]
+
+
+def update_catalog(logs_dir):
+    """Open, update and close the catalog; safe to call from any thread"""
+    try:
+        catalog = Catalog(logs_dir)
+        try:
+            return catalog.update()
+        finally:
+            catalog.close()
+    except sqlite3.Error as e:
+        logger.warning("Catalog update failed: %s", e)
+        return 0
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return "" if value is None else str(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search the pasteurizer log catalog")
+    parser.add_argument("--logs-dir", default="pasteurizer_logs")
+    parser.add_argument("--no-update", action="store_true",
+                        help="query the index as it is, without indexing new rows first")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("update", help="index new and changed log files")
+    query = commands.add_parser("query", help="list matching cycles")
+    export = commands.add_parser("export", help="write matching cycles to a CSV file")
+    export.add_argument("output")
+    for sub in (query, export):
+        sub.add_argument("--since", help="ISO date/time, inclusive")
+        sub.add_argument("--until", help="ISO date/time, exclusive")
+        sub.add_argument("--process-type", choices=["HEAT", "COOL", "HEAT_COOL"])
+        sub.add_argument("--result", help="e.g. PROCESS_COMPLETED, PROCESS_STOPPED, INTERRUPTED")
+        sub.add_argument("--hold-below", type=float, metavar="TEMP",
+                         help="core temperature dropped below TEMP during the hold")
+        sub.add_argument("--heat-below", type=float, metavar="TEMP",
+                         help="heat setpoint below TEMP")
+    events = commands.add_parser("events", help="events of one cycle")
+    events.add_argument("cycle_id", type=int)
+    args = parser.parse_args(argv)
+
+    catalog = Catalog(args.logs_dir)
+    try:
+        if args.command == "update" or not args.no_update:
+            count = catalog.update()
+            if args.command == "update":
+                print(f"Indexed {count} new rows")
+                return 0
+
+        if args.command == "events":
+            for event in catalog.events(args.cycle_id):
+                print(f"{event['timestamp']}  {event['event']:<24} {event['state'] or '':<8} "
+                      f"{format_value(event['core_temp'])}")
+            return 0
+
+        cycles = catalog.cycles(args.since, args.until, args.process_type, args.result,
+                                args.hold_below, args.heat_below)
+        if args.command == "export":
+            with open(args.output, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=("id",) + CYCLE_FIELDS)
+                writer.writeheader()
+                writer.writerows(cycles)
+            print(f"Wrote {len(cycles)} cycles to {args.output}")
+            return 0
+
+        for c in cycles:
+            hold = f"hold {c['hold_seconds']:.0f}s min {format_value(c['min_hold_core'])}" \
+                if c["hold_seconds"] is not None else "no hold"
+            print(f"#{c['id']:<5} {c['start']}  {c['process_type'] or '':<9} "
+                  f"heat {format_value(c['heat_setpoint'])} core {format_value(c['min_core'])}-"
+                  f"{format_value(c['max_core'])}  {hold}  {c['result'] or 'RUNNING'}")
+        print(f"{len(cycles)} cycles")
+        return 0
+    finally:
+        catalog.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
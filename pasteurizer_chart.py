@@ -0,0 +1,197 @@
+import threading
+import tkinter as tk
+from array import array
+from collections import deque
+
+
+STATE_COLORS = {"HEATING": "#fde2d4", "HOLDING": "#fff3c4", "COOLING": "#d6e8fb"}
+
+
+class SampleRingBuffer:
+    """Preallocated ring of (timestamp, core, water); memory never grows past capacity"""
+
+    def __init__(self, capacity=36000):
+        self.capacity = capacity
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.core = array("f", bytes(4 * capacity))
+        self.water = array("f", bytes(4 * capacity))
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, core_temp, water_temp):
+        i = self.head
+        self.timestamps[i] = timestamp
+        self.core[i] = core_temp
+        self.water[i] = water_temp
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def __iter__(self):
+        start = (self.head - self.count) % self.capacity
+        for n in range(self.count):
+            i = (start + n) % self.capacity
+            yield self.timestamps[i], self.core[i], self.water[i]
+
+
+class MinMaxDecimator:
+    """Folds samples into fixed-duration buckets of min/max per series.
+
+    One bucket per pixel column, so redraw cost depends on chart width only;
+    each sample costs O(1) when it is added.
+    """
+
+    def __init__(self, bucket_seconds, max_buckets):
+        self.bucket_seconds = bucket_seconds
+        self.buckets = deque(maxlen=max_buckets)
+
+    def add(self, timestamp, core_temp, water_temp):
+        index = int(timestamp // self.bucket_seconds)
+        if self.buckets and self.buckets[-1][0] == index:
+            b = self.buckets[-1]
+            if core_temp < b[1]:
+                b[1] = core_temp
+            elif core_temp > b[2]:
+                b[2] = core_temp
+            if water_temp < b[3]:
+                b[3] = water_temp
+            elif water_temp > b[4]:
+                b[4] = water_temp
+        else:
+            self.buckets.append([index, core_temp, core_temp, water_temp, water_temp])
+
+
+class TemperatureChart:
+    """Scrolling core/water chart on a Tk canvas, redrawn at most `fps` times a second.
+
+    add_sample() and add_transition() may be called from any thread.
+    """
+
+    MARGIN_LEFT = 40
+    MARGIN = 10
+
+    def __init__(self, parent, window_seconds=600, capacity=36000, fps=5, width=800, height=180):
+        self.root = parent.winfo_toplevel()
+        self.canvas = tk.Canvas(parent, width=width, height=height, background="white",
+                                highlightthickness=0)
+        self.window_seconds = window_seconds
+        self.interval = int(1000 / fps)
+        self.lock = threading.Lock()
+        self.ring = SampleRingBuffer(capacity)
+        self.decimator = None
+        self.plot_width = 0
+        self.transitions = deque(maxlen=256)
+        self.heat_setpoint = None
+        self.cool_setpoint = None
+        self.dirty = False
+        self.core_line = None
+        self.water_line = None
+        self.canvas.bind("<Configure>", self.on_resize)
+
+    def pack(self, **kwargs):
+        self.canvas.pack(**kwargs)
+
+    def start(self):
+        self.root.after(self.interval, self.tick)
+
+    def add_sample(self, sample):
+        with self.lock:
+            self.ring.append(sample.timestamp, sample.core_temp, sample.water_temp)
+            if self.decimator:
+                self.decimator.add(sample.timestamp, sample.core_temp, sample.water_temp)
+            self.dirty = True
+
+    def add_transition(self, transition):
+        with self.lock:
+            self.transitions.append((transition.timestamp, transition.state))
+            self.dirty = True
+
+    def set_setpoints(self, heat_setpoint, cool_setpoint):
+        with self.lock:
+            self.heat_setpoint = heat_setpoint
+            self.cool_setpoint = cool_setpoint
+            self.dirty = True
+
+    def on_resize(self, event):
+        width = max(1, event.width - self.MARGIN_LEFT - self.MARGIN)
+        if width == self.plot_width:
+            return
+        with self.lock:
+            self.plot_width = width
+            self.decimator = MinMaxDecimator(self.window_seconds / width, width + 1)
+            for timestamp, core, water in self.ring:
+                self.decimator.add(timestamp, core, water)
+            self.dirty = True
+
+    def tick(self):
+        if self.dirty:
+            self.redraw()
+        self.root.after(self.interval, self.tick)
+
+    def redraw(self):
+        with self.lock:
+            self.dirty = False
+            if not self.decimator or not self.decimator.buckets:
+                return
+            buckets = list(self.decimator.buckets)
+            transitions = list(self.transitions)
+            setpoints = [sp for sp in (self.heat_setpoint, self.cool_setpoint) if sp is not None]
+
+        bucket_seconds = self.decimator.bucket_seconds
+        end = buckets[-1][0] + 1
+        start = end - self.plot_width
+        low = min(min(b[1], b[3]) for b in buckets)
+        high = max(max(b[2], b[4]) for b in buckets)
+        low = min([low] + setpoints) - 2
+        high = max([high] + setpoints) + 2
+
+        height = self.canvas.winfo_height()
+        plot_height = max(1, height - 2 * self.MARGIN)
+        scale = plot_height / (high - low)
+
+        def x(index):
+            return self.MARGIN_LEFT + (index - start)
+
+        def y(temp):
+            return self.MARGIN + (high - temp) * scale
+
+        c = self.canvas
+        c.delete("band", "setpoint", "axis")
+
+        # State bands from transitions that overlap the visible window
+        for n, (timestamp, state) in enumerate(transitions):
+            band_end = transitions[n + 1][0] if n + 1 < len(transitions) else end * bucket_seconds
+            color = STATE_COLORS.get(state)
+            if color is None or band_end / bucket_seconds < start:
+                continue
+            x0 = x(max(start, timestamp / bucket_seconds))
+            x1 = x(min(end, band_end / bucket_seconds))
+            c.create_rectangle(x0, self.MARGIN, x1, self.MARGIN + plot_height,
+                               fill=color, outline="", tags="band")
+
+        for sp, color in ((self.heat_setpoint, "#c0392b"), (self.cool_setpoint, "#2471a3")):
+            if sp is not None:
+                c.create_line(self.MARGIN_LEFT, y(sp), self.MARGIN_LEFT + self.plot_width, y(sp),
+                              fill=color, dash=(4, 3), tags="setpoint")
+
+        for temp in (low + 2, (low + high) / 2, high - 2):
+            c.create_text(self.MARGIN_LEFT - 4, y(temp), text=f"{temp:.0f}", anchor="e",
+                          font=("Arial", 8), tags="axis")
+
+        # One zig-zag polyline per series: min then max for every pixel column
+        core_points = []
+        water_points = []
+        for b in buckets:
+            px = x(b[0])
+            core_points += (px, y(b[1]), px, y(b[2]))
+            water_points += (px, y(b[3]), px, y(b[4]))
+
+        if self.core_line is None:
+            self.water_line = c.create_line(*water_points, fill="#2471a3", tags="series")
+            self.core_line = c.create_line(*core_points, fill="#c0392b", width=2, tags="series")
+        else:
+            c.coords(self.water_line, *water_points)
+            c.coords(self.core_line, *core_points)
+        c.tag_lower("band")
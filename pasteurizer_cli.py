@@ -0,0 +1,288 @@
+"""Run a pasteurization cycle (or a queue of them) without a GUI.
+
+    python -m pasteurizer_cli --host 192.168.1.40 --heat 72 --cool 32 --hold 30
+    python -m pasteurizer_cli --serial /dev/ttyACM0 --recipe recipe.json
+    python -m pasteurizer_cli --modbus /dev/ttyUSB0 --slave 3 --register-map panel.json
+    python -m pasteurizer_cli --replay pasteurizer_logs/pasteurizer_log_20250601_101500.csv --hold 45
+    python -m pasteurizer_cli --host 192.168.1.40 --queue shift.json
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from pasteurizer_engine import PasteurizerEngine
+import pasteurizer_logger
+import pasteurizer_metrics
+from pasteurizer_modbus import (ModbusBus, ModbusControllerInterface, ModbusPollScheduler,
+                                RegisterMap)
+from pasteurizer_transports import ArduinoSerialInterface, WiFiArduinoInterface
+
+
+RECIPE_KEYS = ("heat_setpoint", "cool_setpoint", "hold_time", "process_type",
+               "target_lethality", "ref_temp", "z_value")
+
+
+def slave_ids(text):
+    try:
+        ids = [int(part) for part in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected slave IDs like 1 or 1,2,3, got {text!r}")
+    if len(set(ids)) != len(ids):
+        raise argparse.ArgumentTypeError(f"duplicate slave ID in {text!r}")
+    return ids
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pasteurizer_cli",
+                                     description="Run a pasteurization cycle headless")
+    conn = parser.add_mutually_exclusive_group(required=True)
+    conn.add_argument("--host", help="controller IP (WiFi/TCP)")
+    conn.add_argument("--serial", metavar="PORT", help="controller serial port (USB)")
+    conn.add_argument("--modbus", metavar="PORT", help="RS-485 port of a Modbus RTU controller")
+    conn.add_argument("--replay", metavar="PATH",
+                      help="play a recorded CSV log or telemetry run back as the controller")
+    parser.add_argument("--replay-cycle", type=int, default=1,
+                        help="which cycle of a --replay CSV to play (default 1)")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="--replay pace; hold times are timed by the clock, so keep 1.0 "
+                             "for faithful results (pasteurizer_replay.py replays at any speed)")
+    parser.add_argument("--port", type=int, default=12345, help="TCP port (default 12345)")
+    parser.add_argument("--baudrate", type=int, default=9600)
+    parser.add_argument("--protocol", choices=["text", "binary"], default="text",
+                        help="frame format to request from --host/--serial controllers; "
+                             "binary falls back to text if the controller does not support it")
+    parser.add_argument("--slave", type=slave_ids, default=[1],
+                        help="Modbus slave ID (default 1); several, e.g. 1,2,3, share one bus "
+                             "and each run the recipe with logs in <logs-dir>/slave_<id>")
+    parser.add_argument("--register-map", help="JSON register map for --modbus")
+    parser.add_argument("--poll-interval", type=float, default=0.5,
+                        help="seconds between Modbus polls (default 0.5)")
+    parser.add_argument("--recipe", help="JSON file with heat_setpoint, cool_setpoint, "
+                                         "hold_time and process_type (optionally "
+                                         "target_lethality, ref_temp, z_value)")
+    parser.add_argument("--queue", metavar="FILE",
+                        help="JSON list of recipes to run back to back (see pasteurizer_recipes)")
+    parser.add_argument("--gap", type=float, default=0,
+                        help="seconds to wait between queued cycles (default 0)")
+    parser.add_argument("--heat", type=float, dest="heat_setpoint")
+    parser.add_argument("--cool", type=float, dest="cool_setpoint")
+    parser.add_argument("--hold", type=int, dest="hold_time")
+    parser.add_argument("--process-type", choices=["HEAT", "COOL", "HEAT_COOL"])
+    parser.add_argument("--target-lethality", type=float,
+                        help="end the hold once F reaches this many minutes")
+    parser.add_argument("--ref-temp", type=float, help="lethality reference temperature (default 60)")
+    parser.add_argument("--z-value", type=float, help="lethality z-value (default 7)")
+    parser.add_argument("--logs-dir", default="pasteurizer_logs")
+    parser.add_argument("--status-interval", type=float, default=10,
+                        help="seconds between status lines (0 to disable)")
+    parser.add_argument("--acquisition-process", action="store_true",
+                        help="read the controller and run the cycle logic in a child process")
+    parser.add_argument("--web", type=int, metavar="PORT", help="serve a live web dashboard")
+    parser.add_argument("--web-host", default="127.0.0.1",
+                        help="dashboard address (0.0.0.0 to allow other machines)")
+    pasteurizer_logger.add_arguments(parser)
+    pasteurizer_metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if len(args.slave) > 1 and (not args.modbus or args.queue or args.web is not None
+                                or args.acquisition_process):
+        parser.error("several --slave IDs need --modbus and cannot be combined with "
+                     "--queue, --web or --acquisition-process")
+    return args
+
+
+def load_recipe(args):
+    recipe = {"heat_setpoint": 72.0, "cool_setpoint": 32.0, "hold_time": 30,
+              "process_type": "HEAT_COOL", "target_lethality": None, "ref_temp": 60.0,
+              "z_value": 7.0}
+    if args.recipe:
+        with open(args.recipe) as f:
+            recipe.update({k: v for k, v in json.load(f).items() if k in RECIPE_KEYS})
+    # Command-line values override the file
+    for key in RECIPE_KEYS:
+        value = getattr(args, key)
+        if value is not None:
+            recipe[key] = value
+    return recipe
+
+
+def format_temp(temp):
+    return "--" if temp is None else f"{temp:.1f} °C"
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    pasteurizer_metrics.configure(args)
+    recipe = load_recipe(args)
+    queue = None
+    if args.queue:
+        from pasteurizer_recipes import load_recipes
+
+        try:
+            queue = load_recipes(args.queue)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Could not load {args.queue}: {e}", file=sys.stderr)
+            return 2
+    if args.host:
+        client = WiFiArduinoInterface(args.host, args.port, protocol=args.protocol)
+    elif args.replay:
+        from pasteurizer_replay import ReplayTransport, load_path
+
+        recordings = load_path(args.replay)
+        if not 1 <= args.replay_cycle <= len(recordings):
+            print(f"{args.replay} has {len(recordings)} cycles", file=sys.stderr)
+            return 1
+        client = ReplayTransport(recordings[args.replay_cycle - 1], args.replay_speed)
+    elif args.modbus:
+        register_map = RegisterMap.load(args.register_map) if args.register_map else None
+        if len(args.slave) > 1:
+            return run_slaves(args, recipe, register_map)
+        client = ModbusControllerInterface(args.modbus, args.slave[0], args.baudrate,
+                                           register_map, poll_interval=args.poll_interval)
+    else:
+        client = ArduinoSerialInterface(args.serial, args.baudrate, protocol=args.protocol)
+
+    if args.acquisition_process:
+        from pasteurizer_process import ProcessEngine
+
+        engine = ProcessEngine(args.logs_dir, log_level=args.log_level,
+                               **pasteurizer_logger.options(args))
+    else:
+        engine = PasteurizerEngine(args.logs_dir, **pasteurizer_logger.options(args))
+    done = threading.Event()
+    result = {}
+    scheduler = None
+
+    def on_event(transition):
+        print(f"[{time.strftime('%H:%M:%S')}] {transition.message}", flush=True)
+        if transition.state == "IDLE" and scheduler is None:
+            result["event"] = transition.event
+            done.set()
+
+    engine.subscribe_events(on_event)
+    engine.subscribe_status(
+        lambda status, message: print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True))
+    if not engine.connect(client):
+        print("Could not connect", file=sys.stderr)
+        engine.close()
+        return 2
+
+    print(f"Logging to {engine.log_file}")
+    if args.web is not None:
+        from pasteurizer_web import WebDashboard
+
+        dashboard = WebDashboard(engine, args.web_host, args.web)
+        if dashboard.start():
+            print(f"Dashboard at http://{args.web_host}:{dashboard.port}/")
+    if queue is not None:
+        from pasteurizer_recipes import BatchScheduler
+
+        def on_batch(status, message):
+            print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+            if status in ("DONE", "PAUSED", "ABORTED"):
+                done.set()
+
+        scheduler = BatchScheduler(engine, gap=args.gap)
+        scheduler.subscribe(on_batch)
+        scheduler.extend(queue)
+        scheduler.start()
+    else:
+        engine.start_recipe(**recipe)
+    try:
+        while not done.wait(args.status_interval or None):
+            remaining = engine.machine.hold_remaining()
+            hold = f" hold {remaining:.0f}s" if remaining is not None else ""
+            stale = " (stale)" if engine.stale else ""
+            print(f"[{time.strftime('%H:%M:%S')}] {engine.process_state}{hold}{stale} "
+                  f"core {format_temp(engine.core_temp)} water {format_temp(engine.water_temp)} "
+                  f"F {engine.machine.lethality.value:.2f} min", flush=True)
+    except KeyboardInterrupt:
+        if scheduler is not None:
+            scheduler.stop()
+        else:
+            engine.stop()
+    finally:
+        if scheduler is not None:
+            scheduler.close()
+        engine.close()
+    if scheduler is not None:
+        return print_batch_summary(scheduler)
+    return 0 if result.get("event") == "PROCESS_COMPLETED" else 1
+
+
+def run_slaves(args, recipe, register_map):
+    """Run the recipe on several Modbus slaves sharing one bus, polled round-robin"""
+    bus = ModbusBus(args.modbus, args.baudrate)
+    engines = {}
+    results = {}
+    all_done = threading.Event()
+
+    def subscribe(slave, engine):
+        def on_event(transition):
+            print(f"[{time.strftime('%H:%M:%S')}] slave {slave}: {transition.message}", flush=True)
+            if transition.state == "IDLE":
+                results[slave] = transition.event
+                if len(results) == len(engines):
+                    all_done.set()
+
+        engine.subscribe_events(on_event)
+        engine.subscribe_status(lambda status, message: print(
+            f"[{time.strftime('%H:%M:%S')}] slave {slave}: {message}", flush=True))
+
+    interfaces = []
+    for slave in args.slave:
+        interface = ModbusControllerInterface(args.modbus, slave, register_map=register_map,
+                                              bus=bus, poll_interval=args.poll_interval)
+        engine = PasteurizerEngine(os.path.join(args.logs_dir, f"slave_{slave}"),
+                                   **pasteurizer_logger.options(args))
+        subscribe(slave, engine)
+        if not engine.connect(interface):
+            print(f"Could not connect to slave {slave}", file=sys.stderr)
+            for other in list(engines.values()) + [engine]:
+                other.close()
+            return 2
+        print(f"Slave {slave}: logging to {engine.log_file}")
+        engines[slave] = engine
+        interfaces.append(interface)
+
+    scheduler = ModbusPollScheduler(interfaces, rate=1.0 / args.poll_interval)
+    scheduler.start()
+    for engine in engines.values():
+        engine.start_recipe(**recipe)
+    try:
+        while not all_done.wait(args.status_interval or None):
+            for slave, engine in engines.items():
+                stale = " (stale)" if engine.stale else ""
+                print(f"[{time.strftime('%H:%M:%S')}] slave {slave}: {engine.process_state}{stale} "
+                      f"core {format_temp(engine.core_temp)} "
+                      f"water {format_temp(engine.water_temp)} "
+                      f"F {engine.machine.lethality.value:.2f} min", flush=True)
+    except KeyboardInterrupt:
+        for engine in engines.values():
+            engine.stop()
+    finally:
+        scheduler.stop()
+        for engine in engines.values():
+            engine.close()
+    completed = [slave for slave in engines if results.get(slave) == "PROCESS_COMPLETED"]
+    print(f"{len(completed)}/{len(engines)} slaves completed")
+    return 0 if len(completed) == len(engines) else 1
+
+
+def print_batch_summary(scheduler):
+    """Print one line per queued run; 0 when every recipe ran to completion"""
+    summaries = scheduler.summaries
+    for s in summaries:
+        hold = f"hold {s['Hold_s']:.0f}s" if s["Hold_s"] is not None else "no hold"
+        print(f"{s['Recipe']:<24} {s['Result']:<18} {s['Duration_s']:>7.0f}s  {hold:<10} "
+              f"F {s['Lethality_F_min']:.2f}  {os.path.basename(s['Log_File'] or '')}")
+    left = len(scheduler.pending())
+    completed = sum(1 for s in summaries if s["Result"] == "PROCESS_COMPLETED")
+    print(f"{completed}/{len(summaries)} runs completed, {left} still queued")
+    return 0 if completed == len(summaries) and not left else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
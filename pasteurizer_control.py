@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import namedtuple
+
+
+Transition = namedtuple(
+    "Transition", ["timestamp", "previous", "state", "event", "command", "message"])
+
+
+class LethalityAccumulator:
+    """Running lethality (F-value, in minutes at ref_temp) from core temperature samples.
+
+    Integrates 10 ** ((T - ref_temp) / z_value) over time with the trapezoid
+    rule, so each sample costs one power and a few additions.
+    """
+
+    def __init__(self, ref_temp=60.0, z_value=7.0):
+        self.ref_temp = ref_temp
+        self.z_value = z_value
+        self.reset()
+
+    def reset(self):
+        self.value = 0.0
+        self.last_time = None
+        self.last_rate = 0.0
+
+    def rate(self, temp):
+        """Lethal rate: minutes at ref_temp per minute at temp"""
+        return 10 ** ((temp - self.ref_temp) / self.z_value)
+
+    def add(self, temp, now):
+        rate = self.rate(temp)
+        if self.last_time is not None and now > self.last_time:
+            self.value += (rate + self.last_rate) * (now - self.last_time) / 120.0
+        self.last_time = now
+        self.last_rate = rate
+        return self.value
+
+
+class ProcessStateMachine:
+    """HEATING/HOLDING/COOLING cycle logic driven by incoming samples.
+
+    Every call takes the sample's monotonic timestamp, so the same sequence of
+    samples always produces the same transitions no matter how fast it is fed.
+    Methods return the transitions they caused; the caller decides how to
+    apply them (send the command, log, update the UI).
+
+    With target_lethality set, the hold ends once the accumulated F-value
+    reaches it instead of after hold_time seconds.
+    """
+
+    def __init__(self, heat_setpoint=72.0, cool_setpoint=32.0, hold_time=30,
+                 process_type="HEAT_COOL", clock=time.monotonic, target_lethality=None,
+                 ref_temp=60.0, z_value=7.0):
+        self.heat_setpoint = heat_setpoint
+        self.cool_setpoint = cool_setpoint
+        self.hold_time = hold_time
+        self.process_type = process_type
+        self.clock = clock
+        self.target_lethality = target_lethality
+        self.lethality = LethalityAccumulator(ref_temp, z_value)
+        self.state = "IDLE"
+        self.start_time = None
+        self.hold_start = None
+        self.lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.state != "IDLE"
+
+    def start(self, now=None):
+        now = self.clock() if now is None else now
+        with self.lock:
+            self.start_time = now
+            self.hold_start = None
+            self.lethality.reset()
+            if self.process_type in ("HEAT", "HEAT_COOL"):
+                return self._transition(
+                    now, "HEATING", "PROCESS_STARTED", "heat",
+                    f"Started HEATING cycle (Target: {self.heat_setpoint}°C)")
+            return self._transition(
+                now, "COOLING", "PROCESS_STARTED", "cool",
+                f"Started COOLING cycle (Target: {self.cool_setpoint}°C)")
+
+    def stop(self, now=None):
+        now = self.clock() if now is None else now
+        with self.lock:
+            return self._transition(now, "IDLE", "PROCESS_STOPPED", "stop",
+                                    "Process stopped manually")
+
+    def update(self, core_temp, now=None):
+        """Feed one sample; return the list of transitions it triggered"""
+        now = self.clock() if now is None else now
+        transitions = []
+        with self.lock:
+            if self.state != "IDLE":
+                self.lethality.add(core_temp, now)
+            if self.state == "HEATING" and core_temp >= self.heat_setpoint:
+                self.hold_start = now
+                transitions.append(self._transition(
+                    now, "HOLDING", "HOLD_STARTED", None,
+                    f"Hold started - Target temp {self.heat_setpoint}°C reached"))
+
+            if self.state == "HOLDING" and self._hold_done(now):
+                transitions.append(self._hold_complete(now))
+
+            elif self.state == "COOLING" and core_temp <= self.cool_setpoint:
+                transitions.append(self._transition(
+                    now, "IDLE", "PROCESS_COMPLETED", "stop",
+                    f"Cooling complete - Target temp {self.cool_setpoint}°C reached"))
+        return transitions
+
+    def hold_remaining(self, now=None):
+        if self.state != "HOLDING":
+            return None
+        now = self.clock() if now is None else now
+        if self.target_lethality is not None:
+            # Estimate from the current lethal rate; None while it is negligible
+            lethality = self.lethality
+            missing = self.target_lethality - lethality.value
+            if missing <= 0:
+                return 0.0
+            return missing * 60 / lethality.last_rate if lethality.last_rate > 1e-6 else None
+        return max(0.0, self.hold_time - (now - self.hold_start))
+
+    def _hold_done(self, now):
+        if self.target_lethality is not None:
+            return self.lethality.value >= self.target_lethality
+        return now - self.hold_start >= self.hold_time
+
+    def _hold_complete(self, now):
+        if self.target_lethality is not None:
+            done = f"Lethality F={self.lethality.value:.2f} min reached"
+        else:
+            done = "Hold complete"
+        if self.process_type == "HEAT_COOL":
+            return self._transition(
+                now, "COOLING", "COOLING_STARTED", "cool",
+                f"{done} - Starting cooling to {self.cool_setpoint}°C")
+        return self._transition(now, "IDLE", "PROCESS_COMPLETED", "stop",
+                                "Process completed successfully")
+
+    def _transition(self, now, state, event, command, message):
+        transition = Transition(now, self.state, state, event, command, message)
+        self.state = state
+        return transition
@@ -0,0 +1,223 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from pasteurizer_control import ProcessStateMachine
+from pasteurizer_logger import COMPLIANCE_EVENTS, BackgroundCsvLogger, new_log_path
+from pasteurizer_metrics import REACTION_LATENCY
+from pasteurizer_telemetry import TelemetryWriter, new_run_path
+from pasteurizer_transports import CommandQueue, ConnectionManager
+
+
+class PasteurizerEngine:
+    """Acquisition, control and logging for one controller, with no GUI dependency.
+
+    Views subscribe to samples, events and link status; the callbacks run on
+    the reader thread, so a GUI must hand them over to its own thread (e.g.
+    root.after). All state read by the hot path is plain Python attributes.
+    max_bytes, max_age, flush_interval and fsync_events configure the CSV log
+    (see BackgroundCsvLogger).
+    """
+
+    def __init__(self, logs_dir="pasteurizer_logs", log_interval=10, telemetry=True, catalog=True,
+                 max_bytes=None, max_age=None, flush_interval=1.0, fsync_events=COMPLIANCE_EVENTS):
+        self.logs_dir = logs_dir
+        self.log_interval = log_interval
+        self.record_telemetry = telemetry
+        self.catalog = catalog
+        os.makedirs(logs_dir, exist_ok=True)
+        self.csv_logger = BackgroundCsvLogger(logs_dir, path=new_log_path(logs_dir),
+                                              flush_interval=flush_interval,
+                                              fsync_events=fsync_events, max_bytes=max_bytes,
+                                              max_age=max_age)
+
+        self.client = None
+        self.reader = None
+        self.commands = None
+        self.connected = False
+        self.link_status = "DISCONNECTED"
+        self.machine = ProcessStateMachine()
+        self.telemetry = None
+        self.core_temp = None  # no reading yet; logged as empty cells
+        self.water_temp = None
+        self.last_sample_time = None
+        self.last_log_time = None
+        self.sample_subscribers = []
+        self.event_subscribers = []
+        self.status_subscribers = []
+
+    @property
+    def log_file(self):
+        return self.csv_logger.path
+
+    @property
+    def process_state(self):
+        return self.machine.state
+
+    @property
+    def stale(self):
+        """True while core_temp/water_temp are not live readings"""
+        return self.link_status != "CONNECTED"
+
+    def subscribe_samples(self, callback):
+        self.sample_subscribers.append(callback)
+
+    def subscribe_events(self, callback):
+        self.event_subscribers.append(callback)
+
+    def subscribe_status(self, callback):
+        """callback(status, message) for link changes and commands that were never acknowledged"""
+        self.status_subscribers.append(callback)
+
+    def connect(self, client):
+        """Connect any transport interface (WiFi, USB or Modbus) and start reading it"""
+        if not client.connect():
+            return False
+        self.client = client
+        self.connected = True
+        self.link_status = "CONNECTED"
+        self.log_to_csv("CONNECTION_ESTABLISHED")
+        self.last_log_time = None
+        self.commands = CommandQueue(client)
+        self.commands.subscribe_failures(self.on_command_failed)
+        self.commands.start()
+        self.reader = ConnectionManager(client)
+        self.reader.subscribe(self.commands.observe)
+        self.reader.subscribe(self.on_sample)
+        self.reader.subscribe_status(self.on_link_status)
+        self.reader.start()
+        return True
+
+    def disconnect(self):
+        if self.reader:
+            self.reader.stop()
+            self.reader = None
+        if self.commands:
+            self.commands.stop()
+            self.commands = None
+        if self.client:
+            self.client.disconnect()
+        self.connected = False
+        self.link_status = "DISCONNECTED"
+        self.log_to_csv("CONNECTION_LOST")
+
+    def start_recipe(self, heat_setpoint=72.0, cool_setpoint=32.0, hold_time=30,
+                     process_type="HEAT_COOL", target_lethality=None, ref_temp=60.0, z_value=7.0):
+        self.machine = ProcessStateMachine(heat_setpoint, cool_setpoint, hold_time, process_type,
+                                           target_lethality=target_lethality, ref_temp=ref_temp,
+                                           z_value=z_value)
+        self.close_telemetry()
+        if self.record_telemetry:
+            self.telemetry = TelemetryWriter(new_run_path(self.logs_dir), heat_setpoint,
+                                             cool_setpoint, process_type, hold_time,
+                                             target_lethality, ref_temp, z_value)
+        self.handle_transition(self.machine.start())
+
+    def stop(self):
+        self.handle_transition(self.machine.stop())
+
+    def new_log_segment(self):
+        """Continue the CSV log in a new file (one per batch run); returns its path"""
+        path = new_log_path(self.logs_dir)
+        self.csv_logger.rotate(path)
+        return path
+
+    def close(self):
+        if self.connected:
+            self.disconnect()
+        self.close_telemetry()
+        self.csv_logger.close()
+        if self.catalog:
+            self.update_catalog()
+
+    def on_sample(self, sample):
+        """Called on the reader thread for every frame the controller sends"""
+        self.core_temp = sample.core_temp
+        self.water_temp = sample.water_temp
+        self.last_sample_time = sample.timestamp
+        machine = self.machine
+        telemetry = self.telemetry
+        if machine.active:
+            transitions = machine.update(sample.core_temp, sample.timestamp)
+            if transitions and telemetry:
+                # The sample that ends a cycle belongs to its run, which the transition closes
+                telemetry.append(sample.timestamp, sample.core_temp, sample.water_temp,
+                                 machine.state)
+                telemetry = None
+            for transition in transitions:
+                self.handle_transition(transition)
+            if transitions:
+                REACTION_LATENCY.observe(time.monotonic() - sample.timestamp)
+        if telemetry:
+            telemetry.append(sample.timestamp, sample.core_temp, sample.water_temp, machine.state)
+        for callback in self.sample_subscribers:
+            callback(sample)
+
+        # Log temperature data every log_interval seconds during monitoring
+        if self.last_log_time is None or sample.timestamp - self.last_log_time >= self.log_interval:
+            self.log_to_csv("TEMPERATURE_READING")
+            self.last_log_time = sample.timestamp
+
+    def on_link_status(self, status):
+        previous, self.link_status = self.link_status, status
+        if status == "RECONNECTING":
+            self.log_to_csv("CONNECTION_LOST")
+        elif status == "CONNECTED" and previous == "RECONNECTING":
+            self.log_to_csv("CONNECTION_ESTABLISHED")
+            commands = self.commands
+            if commands and self.machine.active and commands.pending:
+                commands.put(commands.pending)  # make sure the board is still in our mode
+        self.notify_status(status, f"Link {status.lower()}")
+
+    def on_command_failed(self, command):
+        self.log_to_csv(f"COMMAND_FAILED:{command}")
+        self.notify_status("COMMAND_FAILED", f"Controller did not acknowledge '{command}'")
+
+    def notify_status(self, status, message):
+        for callback in self.status_subscribers:
+            callback(status, message)
+
+    def handle_transition(self, transition):
+        if transition.command and self.commands:
+            self.commands.put(transition.command)
+        self.log_to_csv(transition.event)
+        if transition.state == "IDLE":
+            self.close_telemetry()
+            self.schedule_catalog_update()
+        for callback in self.event_subscribers:
+            callback(transition)
+
+    def schedule_catalog_update(self, delay=None):
+        """Index the finished cycle once the CSV writer has flushed it"""
+        if not self.catalog:
+            return
+        delay = 2 * self.csv_logger.flush_interval if delay is None else delay
+        timer = threading.Timer(delay, self.update_catalog)
+        timer.daemon = True
+        timer.start()
+
+    def update_catalog(self):
+        from pasteurizer_catalog import update_catalog  # sqlite3 is only needed here
+
+        update_catalog(self.logs_dir)
+
+    def close_telemetry(self):
+        telemetry, self.telemetry = self.telemetry, None
+        if telemetry:
+            telemetry.close()
+
+    def log_to_csv(self, event=""):
+        """Queue current state for the background CSV writer"""
+        machine = self.machine
+        self.csv_logger.log([
+            datetime.now().isoformat(),
+            self.core_temp,
+            self.water_temp,
+            machine.state,
+            machine.heat_setpoint,
+            machine.cool_setpoint,
+            machine.process_type,
+            event,
+            round(machine.lethality.value, 4)
+        ], event)
@@ -0,0 +1,347 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+from pasteurizer_control import ProcessStateMachine
+from pasteurizer_logger import COMPLIANCE_EVENTS, RotatingCsvFile
+from pasteurizer_metrics import CSV_WRITE_SECONDS, REACTION_LATENCY
+import pasteurizer_metrics
+from pasteurizer_transports import Sample, split_frames
+
+logger = logging.getLogger(__name__)
+
+
+class Vat:
+    """One controller in the fleet with its own state machine and log stream"""
+
+    def __init__(self, name, transport="wifi", host="127.0.0.1", port=12345, baudrate=9600,
+                 logs_dir="pasteurizer_logs"):
+        self.name = name
+        self.transport = transport
+        self.host = host
+        self.port = port
+        self.baudrate = baudrate
+        self.log_dir = os.path.join(logs_dir, name)
+        self.machine = ProcessStateMachine()
+        self.csv_file = None
+        self.pending_rows = []
+        self.pending_sync = False
+        self.rx_buffer = b""
+        self.send = None
+        self.connected = False
+        self.core_temp = None
+        self.water_temp = None
+        self.last_sample = None
+        self.last_log_time = None
+        self.subscribers = []
+
+    @classmethod
+    def from_config(cls, config, logs_dir="pasteurizer_logs"):
+        return cls(config["name"], config.get("transport", "wifi"), config.get("host", "127.0.0.1"),
+                   config.get("port", 12345), config.get("baudrate", 9600), logs_dir)
+
+    @property
+    def address(self):
+        if self.transport == "usb":
+            return self.port
+        return f"{self.host}:{self.port}"
+
+    def subscribe(self, callback):
+        """callback(sample, transitions) runs on the engine's event loop thread"""
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def log_row(self, event=""):
+        self.pending_rows.append([
+            datetime.now().isoformat(),
+            self.core_temp,
+            self.water_temp,
+            self.machine.state,
+            self.machine.heat_setpoint,
+            self.machine.cool_setpoint,
+            self.machine.process_type,
+            event,
+            round(self.machine.lethality.value, 4)
+        ])
+        self.pending_sync = self.pending_sync or event in COMPLIANCE_EVENTS
+
+
+class FleetEngine:
+    """Supervises many controllers from one asyncio event loop.
+
+    Every vat's socket or serial port is read by a coroutine on the same loop,
+    so the engine costs one thread for acquisition and control regardless of
+    how many vats it manages. CSV rows are batched per vat and written by a
+    single periodic flush.
+    """
+
+    def __init__(self, vats, flush_interval=1.0, retry_delay=5.0):
+        self.vats = {vat.name: vat for vat in vats}
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.loop = None
+        self.thread = None
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        tasks = [asyncio.create_task(self.supervise(vat)) for vat in self.vats.values()]
+        tasks.append(asyncio.create_task(self.flush_logs()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.to_thread(self.write_logs, self.take_rows(), close=True)
+
+    def start_in_thread(self):
+        """Run the event loop on a background thread (used by the Tk fleet view)"""
+        ready = threading.Event()
+
+        def target():
+            self.loop = asyncio.new_event_loop()
+            self.loop.call_soon(ready.set)
+            try:
+                self.loop.run_until_complete(self.run())
+            except asyncio.CancelledError:
+                pass
+
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+        ready.wait()
+
+    def shutdown(self):
+        if self.loop:
+            for task in asyncio.all_tasks(self.loop):
+                self.loop.call_soon_threadsafe(task.cancel)
+        if self.thread:
+            self.thread.join(5)
+
+    # Thread-safe control API
+
+    def start_cycle(self, name, heat_setpoint, cool_setpoint, hold_time, process_type):
+        self.loop.call_soon_threadsafe(self._start_cycle, self.vats[name], heat_setpoint,
+                                       cool_setpoint, hold_time, process_type)
+
+    def stop_cycle(self, name):
+        self.loop.call_soon_threadsafe(self._stop_cycle, self.vats[name])
+
+    def _start_cycle(self, vat, heat_setpoint, cool_setpoint, hold_time, process_type):
+        vat.machine = ProcessStateMachine(heat_setpoint, cool_setpoint, hold_time, process_type)
+        self.apply(vat, None, [vat.machine.start()])
+
+    def _stop_cycle(self, vat):
+        self.apply(vat, None, [vat.machine.stop()])
+
+    # Acquisition
+
+    async def supervise(self, vat):
+        while True:
+            try:
+                if vat.transport == "usb":
+                    await self.read_serial(vat)
+                else:
+                    await self.read_wifi(vat)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("%s: %s", vat.name, e)
+            if vat.connected:
+                vat.connected = False
+                vat.log_row("CONNECTION_LOST")
+            vat.send = None
+            await asyncio.sleep(self.retry_delay)
+
+    async def read_wifi(self, vat):
+        reader, writer = await asyncio.open_connection(vat.host, vat.port)
+        vat.send = lambda data: writer.write(data)
+        self.on_connected(vat)
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    raise ConnectionError("connection closed by controller")
+                self.receive(vat, data)
+        finally:
+            writer.close()
+
+    async def read_serial(self, vat):
+        # Serial ports are plain file descriptors on POSIX, so the loop can watch them directly
+        import serial
+
+        ser = serial.Serial(vat.port, vat.baudrate, timeout=0)
+        closed = self.loop.create_future()
+
+        def on_readable():
+            try:
+                data = ser.read(ser.in_waiting or 1)
+                if data:
+                    self.receive(vat, data)
+            except Exception as e:
+                if not closed.done():
+                    closed.set_exception(e)
+
+        vat.send = ser.write
+        self.loop.add_reader(ser.fileno(), on_readable)
+        self.on_connected(vat)
+        try:
+            await closed
+        finally:
+            self.loop.remove_reader(ser.fileno())
+            ser.close()
+
+    def on_connected(self, vat):
+        vat.connected = True
+        vat.rx_buffer = b""
+        vat.log_row("CONNECTION_ESTABLISHED")
+
+    def receive(self, vat, data):
+        frames, vat.rx_buffer = split_frames(vat.rx_buffer + data)
+        now = time.monotonic()
+        for frame in frames:
+            sample = Sample(now, frame["T_CORE"], frame["T_WATER"], frame.get("MODE"))
+            vat.core_temp = sample.core_temp
+            vat.water_temp = sample.water_temp
+            vat.last_sample = now
+            transitions = []
+            if vat.machine.active:
+                transitions = vat.machine.update(sample.core_temp, now)
+            self.apply(vat, sample, transitions)
+            if transitions:
+                REACTION_LATENCY.observe(time.monotonic() - now)
+            if vat.last_log_time is None or now - vat.last_log_time >= 10:
+                vat.log_row("TEMPERATURE_READING")
+                vat.last_log_time = now
+
+    def apply(self, vat, sample, transitions):
+        for transition in transitions:
+            if transition.command:
+                if vat.send:
+                    vat.send((transition.command + "\n").encode())
+                else:
+                    logger.error("%s: not connected, '%s' not sent", vat.name, transition.command)
+            vat.log_row(transition.event)
+        for callback in vat.subscribers:
+            try:
+                callback(sample, transitions)
+            except Exception as e:
+                logger.exception("%s: subscriber error: %s", vat.name, e)
+
+    # Logging
+
+    async def flush_logs(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            batches = self.take_rows()
+            if batches:
+                await asyncio.to_thread(self.write_logs, batches)
+
+    def take_rows(self):
+        batches = []
+        for vat in self.vats.values():
+            if vat.pending_rows:
+                batches.append((vat, vat.pending_rows, vat.pending_sync))
+                vat.pending_rows = []
+                vat.pending_sync = False
+        return batches
+
+    def write_logs(self, batches, close=False):
+        for vat, rows, sync in batches:
+            try:
+                if vat.csv_file is None:
+                    vat.csv_file = RotatingCsvFile(vat.log_dir)
+                start = time.perf_counter()
+                vat.csv_file.write_rows(rows)
+                vat.csv_file.flush(sync)
+                CSV_WRITE_SECONDS.observe(time.perf_counter() - start)
+            except Exception as e:
+                logger.error("%s: log write error: %s", vat.name, e)
+        if close:
+            for vat in self.vats.values():
+                if vat.csv_file:
+                    vat.csv_file.close()
+                    vat.csv_file = None
+
+    def snapshot(self):
+        now = time.monotonic()
+        rows = []
+        for vat in self.vats.values():
+            rows.append({
+                "name": vat.name,
+                "address": vat.address,
+                "connected": vat.connected,
+                "state": vat.machine.state,
+                "core_temp": vat.core_temp,
+                "water_temp": vat.water_temp,
+                "hold_remaining": vat.machine.hold_remaining(now),
+                "sample_age": None if vat.last_sample is None else now - vat.last_sample,
+            })
+        return rows
+
+
+def format_temp(temp):
+    return "--" if temp is None else f"{temp:.1f} °C"
+
+
+def load_fleet(path, logs_dir="pasteurizer_logs"):
+    """Read a fleet file: {"vats": [{"name": ..., "transport": "wifi"|"usb", "host"/"port": ...}]}"""
+    with open(path) as f:
+        config = json.load(f)
+    return [Vat.from_config(entry, logs_dir) for entry in config["vats"]]
+
+
+async def run_headless(engine, interval=10):
+    async def report():
+        while True:
+            await asyncio.sleep(interval)
+            for row in engine.snapshot():
+                print(f"[{row['name']}] {row['state']} core={format_temp(row['core_temp'])} "
+                      f"water={format_temp(row['water_temp'])} "
+                      f"{'connected' if row['connected'] else 'disconnected'}")
+
+    reporter = asyncio.create_task(report())
+    try:
+        await engine.run()
+    finally:
+        reporter.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Supervise several pasteurizer controllers")
+    parser.add_argument("fleet", help="JSON file listing the vats")
+    parser.add_argument("--logs-dir", default="pasteurizer_logs")
+    parser.add_argument("--headless", action="store_true",
+                        help="monitor and log without the Tk overview")
+    pasteurizer_metrics.add_arguments(parser)
+    args = parser.parse_args()
+    pasteurizer_metrics.configure(args)
+
+    engine = FleetEngine(load_fleet(args.fleet, args.logs_dir))
+    if args.headless:
+        try:
+            asyncio.run(run_headless(engine))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    import tkinter as tk  # only the overview needs Tk; --headless runs on boxes without it
+
+    from pasteurizer_fleet_gui import FleetApp
+
+    root = tk.Tk()
+    engine.start_in_thread()
+    FleetApp(root, engine)
+    root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
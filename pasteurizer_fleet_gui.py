@@ -0,0 +1,135 @@
+"""Tk overview and per-vat drill-down windows for pasteurizer_fleet (not needed for --headless)"""
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+from pasteurizer_chart import TemperatureChart
+from pasteurizer_fleet import format_temp
+
+
+class FleetApp:
+    """Overview of every vat; double-click a row to open its drill-down window"""
+
+    COLUMNS = ("address", "connection", "state", "core", "water", "hold", "age")
+
+    def __init__(self, root, engine):
+        self.root = root
+        self.engine = engine
+        self.windows = {}
+        self.root.title("Pasteurizer Fleet")
+        self.root.geometry("850x400")
+
+        frame = ttk.Frame(self.root, padding="10")
+        frame.pack(expand=True, fill="both")
+        self.tree = ttk.Treeview(frame, columns=self.COLUMNS, show="tree headings")
+        self.tree.heading("#0", text="Vat")
+        for column, title in zip(self.COLUMNS, ("Address", "Connection", "State", "Core", "Water",
+                                                "Hold", "Last Sample")):
+            self.tree.heading(column, text=title)
+            self.tree.column(column, width=100)
+        self.tree.pack(expand=True, fill="both")
+        self.tree.bind("<Double-1>", self.open_vat)
+        for name in engine.vats:
+            self.tree.insert("", tk.END, iid=name, text=name)
+
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.refresh()
+
+    def refresh(self):
+        for row in self.engine.snapshot():
+            hold = row["hold_remaining"]
+            age = row["sample_age"]
+            self.tree.item(row["name"], values=(
+                row["address"],
+                "Connected" if row["connected"] else "Disconnected",
+                row["state"],
+                format_temp(row["core_temp"]),
+                format_temp(row["water_temp"]),
+                "" if hold is None else f"{hold:.0f}s",
+                "" if age is None else f"{age:.1f}s ago",
+            ))
+        for window in list(self.windows.values()):
+            window.refresh()
+        self.root.after(500, self.refresh)
+
+    def open_vat(self, event=None):
+        name = self.tree.focus()
+        if not name:
+            return
+        if name in self.windows:
+            self.windows[name].window.lift()
+        else:
+            self.windows[name] = VatWindow(self, self.engine.vats[name])
+
+    def on_close(self):
+        self.engine.shutdown()
+        self.root.destroy()
+
+
+class VatWindow:
+    def __init__(self, app, vat):
+        self.app = app
+        self.engine = app.engine
+        self.vat = vat
+        self.window = tk.Toplevel(app.root)
+        self.window.title(f"Vat {vat.name}")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        main = ttk.Frame(self.window, padding="10")
+        main.pack(expand=True, fill="both")
+        self.temps = ttk.Label(main, text="Core: -- Water: --", font=("Arial", 14))
+        self.temps.grid(row=0, column=0, columnspan=4, sticky="w")
+        self.status = ttk.Label(main, text=vat.machine.state, font=("Arial", 14))
+        self.status.grid(row=1, column=0, columnspan=4, sticky="w")
+
+        self.heat_setpoint = tk.DoubleVar(value=vat.machine.heat_setpoint)
+        self.cool_setpoint = tk.DoubleVar(value=vat.machine.cool_setpoint)
+        self.hold_var = tk.IntVar(value=vat.machine.hold_time)
+        self.process_type = tk.StringVar(value=vat.machine.process_type)
+        ttk.Label(main, text="Heat Setpoint:").grid(row=2, column=0)
+        ttk.Entry(main, textvariable=self.heat_setpoint, width=8).grid(row=2, column=1)
+        ttk.Label(main, text="Cool Setpoint:").grid(row=2, column=2)
+        ttk.Entry(main, textvariable=self.cool_setpoint, width=8).grid(row=2, column=3)
+        ttk.Label(main, text="Hold Time (s):").grid(row=3, column=0)
+        ttk.Entry(main, textvariable=self.hold_var, width=8).grid(row=3, column=1)
+        ttk.Combobox(main, textvariable=self.process_type, values=["HEAT", "COOL", "HEAT_COOL"],
+                     state="readonly", width=10).grid(row=3, column=2, columnspan=2)
+        ttk.Button(main, text="Start", command=self.start).grid(row=4, column=0, columnspan=2)
+        ttk.Button(main, text="Stop", command=self.stop).grid(row=4, column=2, columnspan=2)
+
+        chart_frame = ttk.Frame(main)
+        chart_frame.grid(row=5, column=0, columnspan=4, sticky="nsew")
+        self.chart = TemperatureChart(chart_frame, width=600)
+        self.chart.pack(expand=True, fill="both")
+        self.chart.start()
+        vat.subscribe(self.on_update)
+
+    def on_update(self, sample, transitions):
+        if sample is not None:
+            self.chart.add_sample(sample)
+        for transition in transitions:
+            if transition.event == "PROCESS_STARTED":
+                self.chart.set_setpoints(self.vat.machine.heat_setpoint,
+                                         self.vat.machine.cool_setpoint)
+            self.chart.add_transition(transition)
+
+    def refresh(self):
+        self.temps.config(text=f"Core: {format_temp(self.vat.core_temp)}   "
+                               f"Water: {format_temp(self.vat.water_temp)}")
+        remaining = self.vat.machine.hold_remaining()
+        state = self.vat.machine.state
+        self.status.config(text=state if remaining is None else f"HOLDING {remaining:.0f}s")
+
+    def start(self):
+        if not self.vat.connected:
+            messagebox.showerror("Error", f"{self.vat.name} is not connected", parent=self.window)
+            return
+        self.engine.start_cycle(self.vat.name, self.heat_setpoint.get(), self.cool_setpoint.get(),
+                                self.hold_var.get(), self.process_type.get())
+
+    def stop(self):
+        self.engine.stop_cycle(self.vat.name)
+
+    def close(self):
+        self.vat.unsubscribe(self.on_update)
+        del self.app.windows[self.vat.name]
+        self.window.destroy()
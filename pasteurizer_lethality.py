@@ -0,0 +1,200 @@
+"""Recompute lethality (F-value) over stored logs and telemetry runs for audits.
+
+    python pasteurizer_lethality.py pasteurizer_logs/pasteurizer_log_*.csv
+    python pasteurizer_lethality.py pasteurizer_logs/pasteurizer_run_20250101_120000 --z-value 10
+
+Uses the same trapezoid integration as pasteurizer_control.LethalityAccumulator,
+vectorized with NumPy so a whole run is one pass over arrays. Telemetry runs
+hold every sample and are the real audit; pass the CSV logs alongside them to
+compare each run with the F-value the engine logged. CSV rows alone are too
+sparse to integrate, so CSV cycles are only recomputed when their rows are at
+most --max-gap seconds apart.
+"""
+import argparse
+import csv
+import os
+import sys
+from datetime import datetime
+
+from pasteurizer_telemetry import STATE_CODES, TelemetryRun
+
+# Largest row spacing (seconds) a CSV cycle may have and still be integrated
+MAX_ROW_GAP = 2.0
+
+
+def import_numpy():
+    """NumPy, imported on first use so the rest of the app never needs it"""
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("lethality audits need NumPy: pip install numpy") from None
+    return numpy
+
+
+def lethality_series(times, temps, ref_temp=60.0, z_value=7.0, active=None):
+    """Cumulative F-value (minutes at ref_temp) at every sample
+
+    times are in seconds. An interval counts when the sample it starts from is
+    `active`: the live accumulator adds every sample that arrives while a
+    cycle runs, including the one whose transition ends it (stored as IDLE).
+    """
+    np = import_numpy()
+    times = np.asarray(times, dtype=np.float64)
+    temps = np.asarray(temps, dtype=np.float64)
+    if len(times) < 2:
+        return np.zeros(len(times))
+    rates = np.power(10.0, (temps - ref_temp) / z_value)
+    steps = (rates[1:] + rates[:-1]) * np.maximum(np.diff(times), 0.0) / 120.0
+    if active is not None:
+        active = np.asarray(active, dtype=bool)
+        steps = np.where(active[:-1], steps, 0.0)
+    return np.concatenate(([0.0], np.cumsum(steps)))
+
+
+def audit_csv(path, ref_temp=60.0, z_value=7.0, max_gap=MAX_ROW_GAP):
+    """Logged F-value for every cycle in a CSV log, recomputed where the rows allow it
+
+    The logger writes a row every log_interval seconds plus one per event,
+    which is far too sparse to integrate; a cycle whose rows are more than
+    max_gap seconds apart keeps lethality None (audit its telemetry run).
+    """
+    np = import_numpy()
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        return []
+    times = np.array([datetime.fromisoformat(r["Timestamp"]).timestamp() for r in rows])
+    temps = np.array([float(r["Core_Temp_C"] or "nan") for r in rows])
+    states = np.array([r["Process_State"] for r in rows])
+    events = np.array([r["Event"] for r in rows])
+
+    cycles = []
+    for start in np.flatnonzero(events == "PROCESS_STARTED"):
+        idle = np.flatnonzero(states[start + 1:] == "IDLE")
+        end = start + 1 + idle[0] if len(idle) else len(rows) - 1
+        segment = slice(start, end + 1)
+        valid = ~np.isnan(temps[segment])
+        seg_times = times[segment][valid]
+        gap = float(np.diff(seg_times).max()) if len(seg_times) > 1 else 0.0
+        lethality = None
+        if gap <= max_gap:
+            f_value = lethality_series(seg_times, temps[segment][valid], ref_temp, z_value)
+            lethality = float(f_value[-1]) if len(f_value) else 0.0
+        logged = rows[end].get("Lethality_F_min")
+        cycles.append({
+            "start": rows[start]["Timestamp"],
+            "end": rows[end]["Timestamp"],
+            "start_time": float(times[start]),
+            "end_time": float(times[end]),
+            "result": events[end] or states[end],
+            "max_gap": gap,
+            "lethality": lethality,
+            "logged": float(logged) if logged else None,
+        })
+    return cycles
+
+
+def audit_run(path, ref_temp=None, z_value=None):
+    """Recomputed F-value of a binary telemetry run, sample by sample
+
+    ref_temp and z_value default to what the run was recorded with
+    (recipe.json), or 60 / 7 for runs without it.
+    """
+    np = import_numpy()
+    run = TelemetryRun(path)
+    try:
+        recipe = run.recipe or {}
+        ref_temp = recipe.get("ref_temp", 60.0) if ref_temp is None else ref_temp
+        z_value = recipe.get("z_value", 7.0) if z_value is None else z_value
+        # Copies, so the mapped buffers are not exported when the run is closed
+        times = np.array(run.columns["timestamp"], dtype=np.float64)
+        temps = np.array(run.columns["core_temp"], dtype=np.float64)
+        active = np.array(run.columns["state"], dtype=np.uint8) != STATE_CODES["IDLE"]
+        wall_offset = run.header["wall_start"] - run.header["monotonic_start"]
+    finally:
+        run.close()
+    f_value = lethality_series(times, temps, ref_temp, z_value, active)
+    return {
+        "samples": len(times),
+        "ref_temp": ref_temp,
+        "z_value": z_value,
+        "start_time": float(times[0]) + wall_offset if len(times) else None,
+        "lethality": float(f_value[-1]) if len(f_value) else 0.0,
+    }
+
+
+def logged_for(run, cycles, slack=2.0):
+    """The CSV cycle a telemetry run belongs to, or None"""
+    if run["start_time"] is None:
+        return None
+    for cycle in cycles:
+        if cycle["start_time"] - slack <= run["start_time"] <= cycle["end_time"] + slack:
+            return cycle
+    return None
+
+
+def differs(recomputed, logged, tolerance):
+    return abs(recomputed - logged) > max(tolerance * abs(logged), 1e-3)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute lethality over stored logs")
+    parser.add_argument("paths", nargs="+", help="CSV logs and/or telemetry run directories")
+    parser.add_argument("--ref-temp", type=float,
+                        help="override the reference temperature (default: the run's own, "
+                             "60 for CSV logs)")
+    parser.add_argument("--z-value", type=float,
+                        help="override the z-value (default: the run's own, 7 for CSV logs)")
+    parser.add_argument("--max-gap", type=float, default=MAX_ROW_GAP,
+                        help="only integrate CSV cycles whose rows are at most this many "
+                             f"seconds apart (default {MAX_ROW_GAP:g})")
+    parser.add_argument("--tolerance", type=float, default=0.01,
+                        help="relative difference from the logged F-value that counts as a "
+                             "mismatch (default 0.01)")
+    args = parser.parse_args(argv)
+    try:
+        import_numpy()
+    except ImportError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    runs = [path for path in args.paths if os.path.isdir(path)]
+    cycles = []
+    status = 0
+    for path in args.paths:
+        if path in runs:
+            continue
+        # CSV logs do not record ref/z
+        ref_temp = 60.0 if args.ref_temp is None else args.ref_temp
+        z_value = 7.0 if args.z_value is None else args.z_value
+        for cycle in audit_csv(path, ref_temp, z_value, args.max_gap):
+            cycles.append(cycle)
+            logged = f"logged F = {cycle['logged']:.3f} min" if cycle["logged"] is not None \
+                else "no logged F"
+            if cycle["lethality"] is None:
+                check = (f"not recomputed, rows up to {cycle['max_gap']:.1f}s apart; "
+                         "audit its telemetry run")
+            else:
+                check = f"recomputed {cycle['lethality']:.3f}"
+                if cycle["logged"] is not None and differs(cycle["lethality"], cycle["logged"],
+                                                           args.tolerance):
+                    check += " MISMATCH"
+                    status = 1
+            print(f"{path}: {cycle['start']} -> {cycle['end']} {cycle['result']}, "
+                  f"{logged} ({check})")
+    for path in runs:
+        result = audit_run(path, args.ref_temp, args.z_value)
+        line = (f"{path}: {result['samples']} samples, F = {result['lethality']:.3f} min "
+                f"(ref {result['ref_temp']:g} °C, z {result['z_value']:g})")
+        cycle = logged_for(result, cycles)
+        if cycle is not None and cycle["logged"] is not None:
+            line += f" (logged {cycle['logged']:.3f})"
+            if differs(result["lethality"], cycle["logged"], args.tolerance):
+                line += " MISMATCH"
+                status = 1
+        print(line)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
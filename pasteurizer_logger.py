@@ -0,0 +1,232 @@
+import csv
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from pasteurizer_metrics import CSV_WRITE_SECONDS, LOG_QUEUE_DEPTH, LOG_ROWS_DROPPED
+
+logger = logging.getLogger(__name__)
+
+
+CSV_HEADER = ['Timestamp', 'Core_Temp_C', 'Water_Temp_C', 'Process_State',
+              'Heat_Setpoint', 'Cool_Setpoint', 'Process_Type', 'Event', 'Lethality_F_min']
+
+# Events that must be on disk before we report them as done
+COMPLIANCE_EVENTS = ("HOLD_STARTED", "PROCESS_COMPLETED")
+# Size/age rotation waits for the end of a cycle, so every cycle stays in one file
+CYCLE_START_EVENT = "PROCESS_STARTED"
+CYCLE_END_EVENTS = ("PROCESS_COMPLETED", "PROCESS_STOPPED")
+# Periodic sample rows; the only rows that may be dropped when the writer falls behind
+SAMPLE_EVENTS = ("", "TEMPERATURE_READING")
+
+_ROTATE = object()
+
+
+def new_log_path(directory, prefix="pasteurizer_log"):
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(directory, f"{prefix}_{stamp}.csv")
+    suffix = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{prefix}_{stamp}_{suffix}.csv")
+        suffix += 1
+    return path
+
+
+class RotatingCsvFile:
+    """CSV file kept open between writes, rolled over by size or age
+
+    No rollover happens while `in_cycle` is set; an explicit rotate() still does.
+    """
+
+    def __init__(self, directory, path=None, header=CSV_HEADER, max_bytes=None, max_age=None,
+                 prefix="pasteurizer_log"):
+        self.directory = directory
+        self.header = header
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.prefix = prefix
+        self.file = None
+        self.writer = None
+        self.in_cycle = False
+        os.makedirs(directory, exist_ok=True)
+        self.open(path or new_log_path(directory, prefix))
+
+    def open(self, path):
+        self.path = path
+        self.opened_at = time.monotonic()
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='')
+        self.writer = csv.writer(self.file)
+        if new_file and self.header:
+            self.writer.writerow(self.header)
+
+    def write_rows(self, rows):
+        if self.should_rotate():
+            self.rotate()
+        self.writer.writerows(rows)
+
+    def should_rotate(self):
+        if self.in_cycle:
+            return False
+        if self.max_bytes and self.file.tell() >= self.max_bytes:
+            return True
+        return bool(self.max_age and time.monotonic() - self.opened_at >= self.max_age)
+
+    def rotate(self, path=None):
+        self.close()
+        self.open(path or new_log_path(self.directory, self.prefix))
+
+    def flush(self, sync=False):
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file:
+            self.flush(sync=True)
+            self.file.close()
+            self.file = None
+
+
+class BackgroundCsvLogger:
+    """Queue rows from any thread and write them in batches from a writer thread.
+
+    Nothing here blocks the caller. Once `max_queue` rows are waiting, further
+    sample rows are dropped and counted in `dropped`; event rows (and rotate /
+    close requests) are always queued, so compliance events are never lost.
+    The writer flushes every `flush_rows` rows or `flush_interval`
+    seconds, and fsyncs as soon as a row carrying one of `fsync_events` is written.
+    Size (`max_bytes`) and age (`max_age`) rollovers happen only between cycles.
+    """
+
+    def __init__(self, directory, path=None, header=CSV_HEADER, flush_rows=100, flush_interval=1.0,
+                 fsync_events=COMPLIANCE_EVENTS, max_queue=10000, max_bytes=None, max_age=None):
+        self.csv_file = RotatingCsvFile(directory, path, header, max_bytes, max_age)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.batch_size = max(flush_rows, 1000)
+        self.fsync_events = set(fsync_events or ())
+        # Unbounded, so events never wait; log() enforces max_queue for sample rows
+        self.queue = queue.Queue()
+        self.max_queue = max_queue
+        self.dropped = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    @property
+    def path(self):
+        return self.csv_file.path
+
+    def log(self, row, event=""):
+        """Queue one row; returns False if it was a sample row that had to be dropped"""
+        if event in SAMPLE_EVENTS and self.queue.qsize() >= self.max_queue:
+            self.dropped += 1
+            LOG_ROWS_DROPPED.inc()
+            return False
+        self.queue.put_nowait((row, event))
+        return True
+
+    def rotate(self, path=None):
+        """Start a new file once everything queued so far is written"""
+        self.queue.put_nowait((_ROTATE, path))
+
+    def close(self, timeout=5):
+        self.queue.put_nowait(None)
+        self.thread.join(timeout)
+
+    def run(self):
+        pending = 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            batch = []
+            try:
+                batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            LOG_QUEUE_DEPTH.set(self.queue.qsize())
+
+            rows = []
+            sync = False
+            stop = False
+            for entry in batch:
+                if entry is None:
+                    stop = True
+                elif entry[0] is _ROTATE:
+                    self.write(rows, sync)
+                    pending, rows, sync = 0, [], False
+                    self.csv_file.rotate(entry[1])
+                else:
+                    row, event = entry
+                    rows.append(row)
+                    sync = sync or event in self.fsync_events
+                    if event == CYCLE_START_EVENT:
+                        # A rollover that is due happens right before the cycle's first row
+                        self.write(rows[:-1], False)
+                        self.csv_file.in_cycle = False
+                        self.write(rows[-1:], False)
+                        self.csv_file.in_cycle = True
+                    elif event in CYCLE_END_EVENTS:
+                        self.write(rows, False)
+                        self.csv_file.in_cycle = False
+                    else:
+                        continue
+                    pending, rows = pending + len(rows), []
+            self.write(rows, False)
+            pending += len(rows)
+
+            if stop or sync or pending >= self.flush_rows or time.monotonic() >= deadline:
+                if pending or sync:
+                    self.flush(sync)
+                pending = 0
+                deadline = time.monotonic() + self.flush_interval
+            if stop:
+                self.csv_file.close()
+                return
+
+    def write(self, rows, sync):
+        if not rows:
+            return
+        try:
+            start = time.perf_counter()
+            self.csv_file.write_rows(rows)
+            if sync:
+                self.flush(True)
+            CSV_WRITE_SECONDS.observe(time.perf_counter() - start)
+        except Exception as e:
+            logger.error("CSV write error: %s", e)
+
+    def flush(self, sync):
+        try:
+            self.csv_file.flush(sync)
+        except Exception as e:
+            logger.error("CSV flush error: %s", e)
+
+
+def add_arguments(parser):
+    """CSV log flags shared by the command-line entry points"""
+    parser.add_argument("--log-max-mb", type=float, metavar="MB",
+                        help="start a new CSV log once it reaches this size (between cycles)")
+    parser.add_argument("--log-max-age", type=float, metavar="SECONDS",
+                        help="start a new CSV log once it is this old (between cycles)")
+    parser.add_argument("--log-flush-interval", type=float, default=1.0, metavar="SECONDS",
+                        help="flush the CSV log at least this often (default 1)")
+    parser.add_argument("--no-fsync", action="store_true",
+                        help="do not fsync the CSV log after HOLD_STARTED / PROCESS_COMPLETED")
+
+
+def options(args):
+    """PasteurizerEngine keyword arguments for the add_arguments() flags"""
+    return {
+        "max_bytes": int(args.log_max_mb * 1024 * 1024) if args.log_max_mb else None,
+        "max_age": args.log_max_age,
+        "flush_interval": args.log_flush_interval,
+        "fsync_events": () if args.no_fsync else COMPLIANCE_EVENTS,
+    }
@@ -0,0 +1,238 @@
+"""Lightweight counters, gauges and histograms for the acquisition and logging paths.
+
+Metrics are plain objects updated in place, cheap enough for per-frame use.
+Expose them with MetricsServer (Prometheus text format on /metrics) and/or a
+SummaryReporter that logs one line every few seconds.
+"""
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+AGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    """Monotonic count. Updates are not locked: each counter has one writer thread in practice"""
+
+    kind = "counter"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        yield self.name, self.value
+
+
+class Gauge:
+    """Current value, either set() by the owner or read from `function` at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help="", function=None):
+        self.name = name
+        self.help = help
+        self.function = function
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.function() if self.function else self.value
+
+    def samples(self):
+        yield self.name, self.get()
+
+
+class Histogram:
+    """Bucketed distribution of observations (seconds unless the name says otherwise)"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help="", buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation, or None if empty"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{self.name}_bucket{{le="{bound}"}}', cumulative
+        yield f'{self.name}_bucket{{le="+Inf"}}', self.count
+        yield f"{self.name}_sum", self.sum
+        yield f"{self.name}_count", self.count
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help=""):
+        return self.register(Counter(name, help))
+
+    def gauge(self, name, help="", function=None):
+        return self.register(Gauge(name, help, function))
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, buckets))
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in list(self.metrics.values()):
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, value in metric.samples():
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """One human-readable line: counters and gauges as values, histograms as p50/p99"""
+        parts = []
+        for metric in list(self.metrics.values()):
+            name = metric.name.replace("pasteurizer_", "")
+            if isinstance(metric, Histogram):
+                if metric.count:
+                    parts.append(f"{name} p50={metric.quantile(0.5):g} p99={metric.quantile(0.99):g}")
+            else:
+                parts.append(f"{name}={next(metric.samples())[1]:g}")
+        return " ".join(parts)
+
+
+REGISTRY = Registry()
+
+FRAMES_RECEIVED = REGISTRY.counter(
+    "pasteurizer_frames_received_total", "Complete frames parsed from controllers")
+PARSE_FAILURES = REGISTRY.counter(
+    "pasteurizer_parse_failures_total", "Non-empty lines that were not valid frames")
+SAMPLE_AGE = REGISTRY.histogram(
+    "pasteurizer_sample_age_seconds", "Age of the newest sample when the display was refreshed",
+    AGE_BUCKETS)
+REACTION_LATENCY = REGISTRY.histogram(
+    "pasteurizer_reaction_latency_seconds",
+    "Time from receiving a sample to queuing the command of the transition it caused")
+LOG_QUEUE_DEPTH = REGISTRY.gauge(
+    "pasteurizer_log_queue_depth", "Rows waiting for the CSV writer")
+LOG_ROWS_DROPPED = REGISTRY.counter(
+    "pasteurizer_log_rows_dropped_total", "Sample rows dropped because the CSV writer fell behind")
+CSV_WRITE_SECONDS = REGISTRY.histogram(
+    "pasteurizer_csv_write_seconds", "Time to write one batch of CSV rows")
+CRC_ERRORS = REGISTRY.counter(
+    "pasteurizer_crc_errors_total", "Binary frames rejected by their CRC or version byte")
+FRAMES_DROPPED = REGISTRY.counter(
+    "pasteurizer_frames_dropped_total", "Binary frames missing according to their sequence numbers")
+
+
+class MetricsServer:
+    """Serves REGISTRY.render() on http://host:port/metrics from a daemon thread"""
+
+    def __init__(self, registry=REGISTRY, host="127.0.0.1", port=9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.httpd = None
+
+    def start(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("metrics %s", format % args)
+
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        logger.info("Metrics on http://%s:%d/metrics", self.host, self.port)
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+
+class SummaryReporter:
+    """Logs registry.summary() at INFO every `interval` seconds"""
+
+    def __init__(self, registry=REGISTRY, interval=60.0):
+        self.registry = registry
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            logger.info("metrics %s", self.registry.summary())
+
+
+def add_arguments(parser):
+    """Logging and metrics flags shared by the command-line entry points"""
+    parser.add_argument("--log-level", default="INFO",
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on this local port")
+    parser.add_argument("--metrics-summary", type=float, metavar="SECONDS",
+                        help="log a metrics summary line this often")
+
+
+def configure(args):
+    """Set up logging and start whatever add_arguments() flags asked for"""
+    logging.basicConfig(level=args.log_level,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if args.metrics_port is not None:
+        MetricsServer(port=args.metrics_port).start()
+    if args.metrics_summary:
+        SummaryReporter(interval=args.metrics_summary).start()
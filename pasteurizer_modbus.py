@@ -0,0 +1,286 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+from pasteurizer_metrics import FRAMES_RECEIVED
+
+logger = logging.getLogger(__name__)
+
+
+class RegisterMap:
+    """Where a Modbus controller keeps its values.
+
+    Temperatures are scaled integers (register / scale). The core, water and
+    status registers are read together as one contiguous block, so keep them
+    close to each other on the device.
+    """
+
+    def __init__(self, core_temp=0, water_temp=1, status=2, command=10, scale=10.0, signed=True,
+                 input_registers=False, commands=None, modes=None):
+        self.core_temp = core_temp
+        self.water_temp = water_temp
+        self.status = status
+        self.command = command
+        self.scale = scale
+        self.signed = signed
+        self.input_registers = input_registers
+        self.commands = commands or {"stop": 0, "heat": 1, "cool": 2}
+        self.modes = {int(k): v for k, v in (modes or {0: "IDLE", 1: "HEAT", 2: "COOL"}).items()}
+        addresses = [a for a in (core_temp, water_temp, status) if a is not None]
+        self.start = min(addresses)
+        self.count = max(addresses) - self.start + 1
+
+    @classmethod
+    def load(cls, path):
+        """Read a JSON file whose keys match the constructor arguments"""
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def temperature(self, registers, address):
+        value = registers[address - self.start]
+        if self.signed and value >= 0x8000:
+            value -= 0x10000
+        return value / self.scale
+
+    def decode(self, registers):
+        frame = {
+            "T_CORE": self.temperature(registers, self.core_temp),
+            "T_WATER": self.temperature(registers, self.water_temp),
+        }
+        if self.status is not None:
+            code = registers[self.status - self.start]
+            frame["MODE"] = self.modes.get(code, str(code))
+        return frame
+
+
+class ModbusBus:
+    """One RS-485 line shared by several slaves.
+
+    Every request goes through transaction(), which holds the bus lock and
+    leaves `turnaround` seconds of silence after the previous response, so
+    pollers and command writers on different threads never collide.
+    """
+
+    def __init__(self, port, baudrate=9600, parity="N", stopbits=1, bytesize=8, timeout=1,
+                 turnaround=0.005):
+        self.port = port
+        self.baudrate = baudrate
+        self.parity = parity
+        self.stopbits = stopbits
+        self.bytesize = bytesize
+        self.timeout = timeout
+        self.turnaround = turnaround
+        self.client = None
+        self.users = 0
+        self.lock = threading.Lock()
+        self.last_transaction = 0.0
+
+    def connect(self):
+        with self.lock:
+            if self.client is None:
+                from pymodbus.client import ModbusSerialClient
+
+                self.client = ModbusSerialClient(port=self.port, baudrate=self.baudrate,
+                                                 parity=self.parity, stopbits=self.stopbits,
+                                                 bytesize=self.bytesize, timeout=self.timeout)
+            if not self.client.connected and not self.client.connect():
+                return False
+            self.users += 1
+            return True
+
+    def close(self):
+        with self.lock:
+            self.users = max(0, self.users - 1)
+            if self.users == 0 and self.client:
+                self.client.close()
+
+    def transaction(self, request):
+        with self.lock:
+            gap = self.turnaround - (time.monotonic() - self.last_transaction)
+            if gap > 0:
+                time.sleep(gap)
+            try:
+                return request(self.client)
+            finally:
+                self.last_transaction = time.monotonic()
+
+    def read_registers(self, slave, start, count, input_registers=False):
+        def request(client):
+            if input_registers:
+                return client.read_input_registers(start, count=count, slave=slave)
+            return client.read_holding_registers(start, count=count, slave=slave)
+
+        result = self.transaction(request)
+        if result.isError():
+            raise IOError(f"Modbus error from slave {slave}: {result}")
+        return result.registers
+
+    def write_register(self, slave, address, value):
+        result = self.transaction(
+            lambda client: client.write_register(address, value, slave=slave))
+        if result.isError():
+            raise IOError(f"Modbus error from slave {slave}: {result}")
+
+
+class ModbusControllerInterface:
+    """PID controller / PLC over Modbus RTU with the same contract as the Arduino interfaces.
+
+    Each poll is a single multi-register read covering core temp, water temp
+    and status. read_frames() paces itself to `poll_interval` so the interface
+    can be driven by a DeviceReader. With several slaves on one bus, a
+    ModbusPollScheduler does the polling and read_frames() takes the frames it
+    hands over in `inbox`.
+    """
+
+    def __init__(self, port='/dev/ttyUSB0', slave=1, baudrate=9600, register_map=None, bus=None,
+                 poll_interval=0.5):
+        self.bus = bus or ModbusBus(port, baudrate)
+        self.slave = slave
+        self.register_map = register_map or RegisterMap()
+        self.poll_interval = poll_interval
+        self.next_poll = 0.0
+        self.connected = False
+        self.inbox = None
+
+    @property
+    def port(self):
+        return self.bus.port
+
+    def connect(self):
+        try:
+            if not self.bus.connect():
+                logger.warning("Could not open Modbus port %s", self.bus.port)
+                return False
+            self.connected = True
+            self.poll()  # make sure the slave answers
+            return True
+        except Exception as e:
+            logger.warning("Modbus connection to slave %s failed: %s", self.slave, e)
+            self.disconnect()
+            return False
+
+    def disconnect(self):
+        if self.connected:
+            self.connected = False
+            self.bus.close()
+
+    def poll(self, retries=0):
+        """One block read; returns a frame dict like parse_frame()
+
+        A missed or garbled response is retried `retries` times before the
+        error is raised.
+        """
+        rmap = self.register_map
+        for attempt in range(retries + 1):
+            try:
+                registers = self.bus.read_registers(self.slave, rmap.start, rmap.count,
+                                                    rmap.input_registers)
+                break
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                logger.debug("Modbus slave %s: %s, retrying", self.slave, e)
+        FRAMES_RECEIVED.inc()
+        return rmap.decode(registers)
+
+    def read_frames(self):
+        inbox = self.inbox
+        if inbox is not None:
+            try:
+                item = inbox.get(timeout=1.0)
+            except queue.Empty:
+                return []
+            if isinstance(item, Exception):
+                raise item
+            return [item]
+        delay = self.next_poll - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_poll = max(self.next_poll + self.poll_interval, time.monotonic())
+        # One retry, so a single transient error does not cost a full reconnect
+        return [self.poll(retries=1)]
+
+    def read_temperatures(self):
+        try:
+            frame = self.poll()
+            return frame["T_CORE"], frame["T_WATER"]
+        except Exception as e:
+            logger.warning("Modbus read error: %s", e)
+            return None
+
+    def write_command(self, command):
+        code = self.register_map.commands.get(command)
+        if code is None:
+            logger.error("Unknown command for Modbus controller: %s", command)
+            return False
+        try:
+            self.bus.write_register(self.slave, self.register_map.command, code)
+            return True
+        except Exception as e:
+            logger.error("Modbus write error: %s", e)
+            return False
+
+
+class ModbusPollScheduler:
+    """Polls every slave on one bus round-robin from a single thread.
+
+    The cycle is spread evenly over `rate` polls per second per slave; if the
+    bus cannot keep up, the scheduler simply runs back to back. Callbacks get
+    (interface, frame) or (interface, None) when a slave did not answer.
+    While running, each interface's read_frames() returns the frames polled
+    here, so every slave can still be read by its own ConnectionManager.
+    """
+
+    def __init__(self, interfaces, rate=2.0, inbox_size=16):
+        self.interfaces = list(interfaces)
+        self.inbox_size = inbox_size
+        self.rate = rate
+        self.subscribers = []
+        self.errors = {id(i): 0 for i in self.interfaces}
+        self.running = False
+        self.thread = None
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def start(self):
+        for interface in self.interfaces:
+            interface.inbox = queue.Queue(self.inbox_size)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        for interface in self.interfaces:
+            interface.inbox = None
+
+    def run(self):
+        slot = 1.0 / (self.rate * max(1, len(self.interfaces)))
+        next_slot = time.monotonic()
+        while self.running:
+            for interface in self.interfaces:
+                delay = next_slot - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_slot = max(next_slot + slot, time.monotonic())
+                try:
+                    frame = interface.poll(retries=1)
+                    item = frame
+                except Exception as e:
+                    self.errors[id(interface)] += 1
+                    logger.warning("Modbus slave %s: %s", interface.slave, e)
+                    frame = None
+                    item = e
+                inbox = interface.inbox
+                if inbox is not None:
+                    try:
+                        inbox.put_nowait(item)
+                    except queue.Full:
+                        pass  # nobody is reading this slave right now
+                for callback in self.subscribers:
+                    callback(interface, frame)
+                if not self.running:
+                    break
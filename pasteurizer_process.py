@@ -0,0 +1,431 @@
+"""Run acquisition and control in a child process.
+
+The child owns the transport, the ProcessStateMachine and the CSV/telemetry
+logs (a regular PasteurizerEngine). Every sample goes into a shared-memory
+ring; transitions, link status and a periodic state snapshot come back over a
+pipe, and commands (connect, start, stop...) go the other way. The GUI never
+touches the controller, so Tk redraws and GC pauses in the GUI process cannot
+delay the control loop.
+
+ProcessEngine offers the same interface the views use on PasteurizerEngine.
+"""
+import itertools
+import logging
+import multiprocessing
+import queue
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+from pasteurizer_control import Transition
+from pasteurizer_telemetry import STATE_CODES
+from pasteurizer_transports import Sample
+
+logger = logging.getLogger(__name__)
+
+# write count, capacity
+RING_HEADER = struct.Struct("<QQ")
+# timestamp, core temp, water temp, lethality, state code
+RING_RECORD = struct.Struct("<dfffB3x")
+
+
+class SharedSampleRing:
+    """Fixed-size sample ring in shared memory: one writer, any number of readers.
+
+    The writer fills a slot and then bumps the write count. A reader copies
+    the slots it has not seen and re-reads the count afterwards, discarding
+    any slot the writer lapped in the meantime, plus the one it may be
+    writing right now (the slot of index count - capacity).
+    """
+
+    def __init__(self, name=None, capacity=65536):
+        if name is None:
+            size = RING_HEADER.size + capacity * RING_RECORD.size
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            RING_HEADER.pack_into(self.shm.buf, 0, 0, capacity)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.name = self.shm.name
+        self.capacity = RING_HEADER.unpack_from(self.shm.buf, 0)[1]
+
+    @property
+    def count(self):
+        return RING_HEADER.unpack_from(self.shm.buf, 0)[0]
+
+    def write(self, timestamp, core_temp, water_temp, lethality, state):
+        count = self.count
+        offset = RING_HEADER.size + (count % self.capacity) * RING_RECORD.size
+        RING_RECORD.pack_into(self.shm.buf, offset, timestamp, core_temp, water_temp, lethality,
+                              STATE_CODES.get(state, 0))
+        RING_HEADER.pack_into(self.shm.buf, 0, count + 1, self.capacity)
+
+    def read_since(self, index):
+        """Records written since index (oldest first) and the index to pass next time"""
+        count = self.count
+        start = max(index, count - self.capacity)
+        buf = self.shm.buf
+        records = [RING_RECORD.unpack_from(buf, RING_HEADER.size + (i % self.capacity) * RING_RECORD.size)
+                   for i in range(start, count)]
+        # Slot `count % capacity` may be half-written, so index count - capacity is gone too
+        lapped = self.count - self.capacity + 1 - start
+        if lapped > 0:
+            records = records[lapped:]
+        return records, count
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def make_client(spec):
+    """Build a transport from a picklable description (see client_spec)"""
+    kind = spec["kind"]
+    if kind == "wifi":
+        from pasteurizer_transports import WiFiArduinoInterface
+        return WiFiArduinoInterface(spec["host"], spec["port"], protocol=spec.get("protocol", "text"))
+    if kind == "usb":
+        from pasteurizer_transports import ArduinoSerialInterface
+        return ArduinoSerialInterface(spec["port"], spec.get("baudrate", 9600),
+                                      protocol=spec.get("protocol", "text"))
+    if kind == "modbus":
+        from pasteurizer_modbus import ModbusControllerInterface, RegisterMap
+        register_map = RegisterMap(**spec["register_map"]) if spec.get("register_map") else None
+        return ModbusControllerInterface(spec["port"], spec["slave"], spec.get("baudrate", 9600),
+                                         register_map, poll_interval=spec.get("poll_interval", 0.5))
+    if kind == "replay":
+        from pasteurizer_replay import ReplayTransport, load_path
+        return ReplayTransport(load_path(spec["source"])[spec["cycle"]], spec["speed"])
+    raise ValueError(f"unknown transport {kind}")
+
+
+def client_spec(client):
+    """Describe a not-yet-connected transport so the child can build its own copy"""
+    name = type(client).__name__
+    if name == "WiFiArduinoInterface":
+        return {"kind": "wifi", "host": client.host, "port": client.port,
+                "protocol": client.protocol}
+    if name == "ArduinoSerialInterface":
+        return {"kind": "usb", "port": client.port, "baudrate": client.baudrate,
+                "protocol": client.protocol}
+    if name == "ModbusControllerInterface":
+        rmap = client.register_map
+        return {"kind": "modbus", "port": client.port, "slave": client.slave,
+                "baudrate": client.bus.baudrate, "poll_interval": client.poll_interval,
+                "register_map": {k: getattr(rmap, k) for k in (
+                    "core_temp", "water_temp", "status", "command", "scale", "signed",
+                    "input_registers", "commands", "modes")}}
+    if name == "ReplayTransport":
+        return {"kind": "replay", "source": client.recording.source,
+                "cycle": client.recording.cycle, "speed": client.speed}
+    raise ValueError(f"{name} cannot be used from the acquisition process")
+
+
+def snapshot(engine):
+    machine = engine.machine
+    return {
+        "time": time.monotonic(),
+        "state": machine.state,
+        "heat_setpoint": machine.heat_setpoint,
+        "cool_setpoint": machine.cool_setpoint,
+        "hold_time": machine.hold_time,
+        "process_type": machine.process_type,
+        "target_lethality": machine.target_lethality,
+        "lethality": machine.lethality.value,
+        "hold_remaining": machine.hold_remaining(),
+        "connected": engine.connected,
+        "link_status": engine.link_status,
+        "log_file": engine.log_file,
+    }
+
+
+def acquisition_main(conn, ring_name, logs_dir, log_level="INFO", engine_options=None,
+                     snapshot_interval=0.2):
+    """Child process entry point"""
+    from pasteurizer_engine import PasteurizerEngine
+
+    logging.basicConfig(level=log_level,
+                        format="%(asctime)s %(levelname)s %(name)s[acq]: %(message)s")
+    # Spawned children share the parent's resource tracker, so the segment is
+    # unlinked once, by the parent
+    ring = SharedSampleRing(ring_name)
+    send_lock = threading.Lock()
+
+    def send(*message):
+        with send_lock:
+            try:
+                conn.send(message)
+            except (OSError, ValueError):
+                pass  # parent went away
+
+    engine = PasteurizerEngine(logs_dir, **(engine_options or {}))
+    engine.subscribe_samples(lambda s: ring.write(s.timestamp, s.core_temp, s.water_temp,
+                                                  engine.machine.lethality.value,
+                                                  engine.machine.state))
+    engine.subscribe_events(lambda t: send("event", t._asdict(), snapshot(engine)))
+    engine.subscribe_status(lambda status, message: send("status", status, message))
+
+    try:
+        while True:
+            if conn.poll(snapshot_interval):
+                try:
+                    command, *args = conn.recv()
+                except EOFError:
+                    break
+                if command == "connect":
+                    send("reply", engine.connect(make_client(args[0])), snapshot(engine), args[1])
+                elif command == "disconnect":
+                    engine.disconnect()
+                elif command == "start_recipe":
+                    engine.start_recipe(**args[0])
+                elif command == "stop":
+                    engine.stop()
+                elif command == "segment":
+                    engine.new_log_segment()
+                elif command == "log":
+                    engine.log_to_csv(args[0])
+                elif command == "close":
+                    break
+            send("snapshot", snapshot(engine))
+    finally:
+        engine.close()
+        ring.close()
+        send("closed")
+
+
+class Lethality:
+    def __init__(self):
+        self.value = 0.0
+
+
+class MachineView:
+    """Read-only stand-in for the child's ProcessStateMachine, fed by snapshots"""
+
+    def __init__(self):
+        self.state = "IDLE"
+        self.heat_setpoint = 72.0
+        self.cool_setpoint = 32.0
+        self.hold_time = 30
+        self.process_type = "HEAT_COOL"
+        self.target_lethality = None
+        self.lethality = Lethality()
+        self.remaining = None
+        self.received = time.monotonic()
+
+    @property
+    def active(self):
+        return self.state != "IDLE"
+
+    def apply(self, snap):
+        self.state = snap["state"]
+        self.heat_setpoint = snap["heat_setpoint"]
+        self.cool_setpoint = snap["cool_setpoint"]
+        self.hold_time = snap["hold_time"]
+        self.process_type = snap["process_type"]
+        self.target_lethality = snap["target_lethality"]
+        self.lethality.value = snap["lethality"]
+        self.remaining = snap["hold_remaining"]
+        self.received = time.monotonic()
+
+    def hold_remaining(self, now=None):
+        if self.state != "HOLDING" or self.remaining is None:
+            return None
+        if self.target_lethality is not None:
+            return self.remaining
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.remaining - (now - self.received))
+
+
+class ProcessEngine:
+    """PasteurizerEngine look-alike whose acquisition and control run in a child process.
+
+    Samples are read from the shared ring every `poll_interval` seconds on a
+    local thread; subscriber callbacks run on that thread or on the pipe
+    listener thread, like the reader thread callbacks of PasteurizerEngine.
+    """
+
+    def __init__(self, logs_dir="pasteurizer_logs", poll_interval=0.05, capacity=65536,
+                 log_level=None, **engine_options):
+        self.logs_dir = logs_dir
+        self.poll_interval = poll_interval
+        self.ring = SharedSampleRing(capacity=capacity)
+        context = multiprocessing.get_context("spawn")  # never fork a process that has Tk
+        self.conn, child_conn = context.Pipe()
+        level = log_level or logging.getLevelName(logging.getLogger().getEffectiveLevel())
+        self.process = context.Process(target=acquisition_main, name="pasteurizer-acquisition",
+                                       args=(child_conn, self.ring.name, logs_dir, level,
+                                             engine_options),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+
+        self.machine = MachineView()
+        self.connected = False
+        self.link_status = "DISCONNECTED"
+        self.log_file = None
+        self.core_temp = None
+        self.water_temp = None
+        self.last_sample_time = None
+        self.sample_subscribers = []
+        self.event_subscribers = []
+        self.status_subscribers = []
+        self.replies = queue.Queue()
+        self.request_ids = itertools.count(1)
+        self.send_lock = threading.Lock()
+        self.exit_reported = False
+        self.closing = False
+        self.running = True
+        threading.Thread(target=self.listen, daemon=True).start()
+        threading.Thread(target=self.poll_samples, daemon=True).start()
+
+    @property
+    def process_state(self):
+        return self.machine.state
+
+    @property
+    def stale(self):
+        return self.link_status != "CONNECTED"
+
+    def subscribe_samples(self, callback):
+        self.sample_subscribers.append(callback)
+
+    def subscribe_events(self, callback):
+        self.event_subscribers.append(callback)
+
+    def subscribe_status(self, callback):
+        self.status_subscribers.append(callback)
+
+    def send(self, *message):
+        """Pass a command to the child; returns False, with a status report, once it has exited"""
+        if not self.process.is_alive():
+            self.report_exit()
+            return False
+        with self.send_lock:
+            try:
+                self.conn.send(message)
+                return True
+            except (OSError, ValueError):
+                self.report_exit()  # exited between the check and the send
+                return False
+
+    def report_exit(self):
+        """Tell status subscribers (once) that the acquisition process is gone"""
+        if self.exit_reported:
+            return
+        self.exit_reported = True
+        self.connected = False
+        self.link_status = "DISCONNECTED"
+        logger.error("Acquisition process exited with code %s", self.process.exitcode)
+        for callback in self.status_subscribers:
+            callback("DISCONNECTED", f"Acquisition process exited (code {self.process.exitcode})")
+
+    def connect(self, client, timeout=30):
+        # Replies carry the request id, so a late answer to an earlier connect (one that
+        # timed out here) is not taken for this one
+        request = next(self.request_ids)
+        if not self.send("connect", client_spec(client), request):
+            return False
+        deadline = time.monotonic() + timeout
+        while self.process.is_alive():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                reply, ok = self.replies.get(timeout=min(remaining, 0.5))
+            except queue.Empty:
+                continue
+            if reply == request:
+                return ok
+            logger.debug("Discarding late reply to connect request %s", reply)
+        self.report_exit()
+        return False
+
+    def disconnect(self):
+        self.send("disconnect")
+        self.connected = False
+        self.link_status = "DISCONNECTED"
+
+    def start_recipe(self, heat_setpoint=72.0, cool_setpoint=32.0, hold_time=30,
+                     process_type="HEAT_COOL", target_lethality=None, ref_temp=60.0, z_value=7.0):
+        self.send("start_recipe", dict(
+            heat_setpoint=heat_setpoint, cool_setpoint=cool_setpoint, hold_time=hold_time,
+            process_type=process_type, target_lethality=target_lethality, ref_temp=ref_temp,
+            z_value=z_value))
+
+    def stop(self):
+        self.send("stop")
+
+    def new_log_segment(self):
+        self.send("segment")
+
+    def log_to_csv(self, event=""):
+        self.send("log", event)
+
+    def close(self, timeout=10):
+        if not self.running:
+            return
+        self.closing = True
+        self.send("close")
+        self.process.join(timeout)
+        if self.process.is_alive():
+            logger.warning("Acquisition process did not exit, terminating it")
+            self.process.terminate()
+        self.running = False
+        self.conn.close()
+        self.ring.close()
+
+    def listen(self):
+        while self.running:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            kind = message[0]
+            if kind == "snapshot":
+                self.apply(message[1])
+            elif kind == "event":
+                self.apply(message[2])
+                transition = Transition(**message[1])
+                for callback in self.event_subscribers:
+                    callback(transition)
+            elif kind == "status":
+                self.link_status = message[1]
+                for callback in self.status_subscribers:
+                    callback(message[1], message[2])
+            elif kind == "reply":
+                self.apply(message[2])
+                self.replies.put((message[3], message[1]))
+            elif kind == "closed":
+                break
+        if self.running and not self.closing:
+            self.process.join(1.0)
+            if not self.process.is_alive():
+                self.report_exit()
+
+    def apply(self, snap):
+        self.machine.apply(snap)
+        self.log_file = snap["log_file"]
+        self.connected = snap["connected"]
+        self.link_status = snap["link_status"]
+
+    def poll_samples(self):
+        index = self.ring.count
+        while self.running:
+            time.sleep(self.poll_interval)
+            try:
+                records, index = self.ring.read_since(index)
+            except (TypeError, ValueError):
+                break  # ring closed
+            for timestamp, core, water, _lethality, _state in records:
+                self.core_temp = core
+                self.water_temp = water
+                self.last_sample_time = timestamp
+                sample = Sample(timestamp, core, water, None)
+                for callback in self.sample_subscribers:
+                    try:
+                        callback(sample)
+                    except Exception as e:
+                        logger.exception("Sample subscriber error: %s", e)
@@ -0,0 +1,107 @@
+"""Binary frame protocol (version 1), an optional alternative to the text frames.
+
+    offset  size  field
+    0       2     sync word A5 5A
+    2       1     version (1)
+    3       2     sequence number, wraps at 65536
+    5       2     core temp, signed, 0.01 °C
+    7       2     water temp, signed, 0.01 °C
+    9       1     mode (0 IDLE, 1 HEAT, 2 COOL)
+    10      2     CRC-16/CCITT (binascii.crc_hqx, init 0xFFFF) of bytes 2..9
+
+All fields little-endian. A client asks for it by sending "binary 1"; a
+controller that does not understand the command keeps sending text, and
+FrameDecoder accepts both on the same stream, so nothing breaks either way.
+"""
+import binascii
+import struct
+
+from pasteurizer_metrics import CRC_ERRORS, FRAMES_DROPPED, FRAMES_RECEIVED, PARSE_FAILURES
+from pasteurizer_transports import parse_frame
+
+SYNC = b"\xa5\x5a"
+VERSION = 1
+FRAME = struct.Struct("<2sBHhhBH")
+BODY = slice(2, FRAME.size - 2)
+SCALE = 100.0
+REQUEST = "binary 1"
+
+MODES = ("IDLE", "HEAT", "COOL")
+MODE_CODES = {name: code for code, name in enumerate(MODES)}
+
+
+def encode_frame(seq, core_temp, water_temp, mode="IDLE"):
+    body = struct.pack("<BHhhB", VERSION, seq & 0xFFFF, round(core_temp * SCALE),
+                       round(water_temp * SCALE), MODE_CODES.get(mode, 0))
+    return SYNC + body + struct.pack("<H", binascii.crc_hqx(body, 0xFFFF))
+
+
+class FrameDecoder:
+    """Turns a byte stream of text lines and/or binary frames into frame dicts.
+
+    Binary frames are unpacked in place from the receive buffer. Text lines
+    go through parse_frame() as before. Non-ASCII sync bytes never occur in a
+    text line, so the two cannot be confused.
+    """
+
+    def __init__(self, max_buffer=4096):
+        self.buffer = bytearray()
+        self.max_buffer = max_buffer
+        self.last_seq = None
+        self.dropped = 0
+        self.crc_errors = 0
+        self.binary = False
+
+    def feed(self, data):
+        buf = self.buffer
+        buf += data
+        frames = []
+        failures = 0
+        pos = 0
+        with memoryview(buf) as view:
+            while True:
+                sync = buf.find(SYNC, pos)
+                newline = buf.find(b"\n", pos, sync if sync != -1 else len(buf))
+                if newline != -1:
+                    line = bytes(view[pos:newline])
+                    pos = newline + 1
+                    frame = parse_frame(line.decode(errors="ignore"))
+                    if frame is not None:
+                        frames.append(frame)
+                    elif line.strip():
+                        failures += 1
+                    continue
+                if sync == -1 or len(buf) - sync < FRAME.size:
+                    break
+                _, version, seq, core, water, mode, crc = FRAME.unpack_from(buf, sync)
+                if version != VERSION or binascii.crc_hqx(view[sync + BODY.start:sync + BODY.stop],
+                                                          0xFFFF) != crc:
+                    self.crc_errors += 1
+                    CRC_ERRORS.inc()
+                    pos = sync + 1  # resynchronise on the next sync word
+                    continue
+                pos = sync + FRAME.size
+                self.track(seq)
+                frames.append({"T_CORE": core / SCALE, "T_WATER": water / SCALE,
+                               "MODE": MODES[mode] if mode < len(MODES) else str(mode),
+                               "SEQ": seq})
+        del buf[:pos]
+        if len(buf) > self.max_buffer:
+            del buf[:-FRAME.size]  # keep a possible partial binary frame
+        FRAMES_RECEIVED.inc(len(frames))
+        if failures:
+            PARSE_FAILURES.inc(failures)
+        return frames
+
+    def track(self, seq):
+        self.binary = True
+        if self.last_seq is not None:
+            gap = (seq - self.last_seq - 1) & 0xFFFF
+            if gap and gap < 0x8000:  # a huge gap means the controller restarted its counter
+                self.dropped += gap
+                FRAMES_DROPPED.inc(gap)
+        self.last_seq = seq
+
+    def reset(self):
+        self.buffer.clear()
+        self.last_seq = None
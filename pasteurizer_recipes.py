@@ -0,0 +1,331 @@
+"""Recipes and a queue that runs them back to back.
+
+A recipe file is a JSON list of recipes (or {"recipes": [...]}):
+
+    [
+      {"name": "Milk 72/15", "heat_setpoint": 72, "cool_setpoint": 4, "hold_time": 15},
+      {"name": "Juice", "heat_setpoint": 85, "cool_setpoint": 8, "target_lethality": 5,
+       "water_below": 40, "max_wait": 900, "count": 3}
+    ]
+
+water_below / core_below must hold before the cycle starts (e.g. let the
+water cool down from the last heat). max_wait pauses the queue when they are
+not met in time. count queues the same recipe several times.
+
+BatchScheduler starts each queued recipe as soon as the previous cycle ended
+and the next one's preconditions are met. Each run is logged to its own CSV
+file, and one summary row per run is appended to batch_summary.csv in the logs
+directory.
+"""
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+PROCESS_TYPES = ("HEAT", "COOL", "HEAT_COOL")
+SUMMARY_NAME = "batch_summary.csv"
+SUMMARY_HEADER = ['Recipe', 'Log_File', 'Start', 'End', 'Result', 'Process_Type',
+                  'Heat_Setpoint', 'Cool_Setpoint', 'Hold_Time', 'Target_F', 'Wait_s',
+                  'Duration_s', 'Hold_s', 'Min_Hold_Core_C', 'Lethality_F_min']
+
+
+def format_reading(temp):
+    return "no reading" if temp is None else f"{temp:.1f}"
+
+
+class Recipe:
+    """One cycle's settings, plus what must be true before it may start"""
+
+    FIELDS = ("name", "process_type", "heat_setpoint", "cool_setpoint", "hold_time",
+              "target_lethality", "ref_temp", "z_value", "water_below", "core_below", "max_wait")
+
+    def __init__(self, name="", process_type="HEAT_COOL", heat_setpoint=72.0, cool_setpoint=32.0,
+                 hold_time=30, target_lethality=None, ref_temp=60.0, z_value=7.0,
+                 water_below=None, core_below=None, max_wait=None):
+        if process_type not in PROCESS_TYPES:
+            raise ValueError(f"unknown process type {process_type}")
+        self.name = name or f"{process_type} {heat_setpoint:g}/{cool_setpoint:g}"
+        self.process_type = process_type
+        self.heat_setpoint = float(heat_setpoint)
+        self.cool_setpoint = float(cool_setpoint)
+        self.hold_time = hold_time
+        self.target_lethality = target_lethality
+        self.ref_temp = ref_temp
+        self.z_value = z_value
+        self.water_below = water_below
+        self.core_below = core_below
+        self.max_wait = max_wait
+
+    @classmethod
+    def from_dict(cls, data):
+        unknown = set(data) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"unknown recipe keys: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    def params(self):
+        """Keyword arguments for engine.start_recipe()"""
+        return {field: getattr(self, field) for field in (
+            "heat_setpoint", "cool_setpoint", "hold_time", "process_type", "target_lethality",
+            "ref_temp", "z_value")}
+
+    def unmet(self, core_temp, water_temp):
+        """Why the recipe may not start yet, or None; temperatures are None before the first reading"""
+        if self.water_below is not None and (water_temp is None or water_temp >= self.water_below):
+            return f"water below {self.water_below:g} °C (now {format_reading(water_temp)})"
+        if self.core_below is not None and (core_temp is None or core_temp >= self.core_below):
+            return f"core below {self.core_below:g} °C (now {format_reading(core_temp)})"
+        return None
+
+    def describe(self):
+        if self.target_lethality is not None:
+            hold = f"F={self.target_lethality:g}"
+        else:
+            hold = f"hold {self.hold_time}s"
+        text = f"{self.name}: {self.process_type} {self.heat_setpoint:g}/{self.cool_setpoint:g} {hold}"
+        conditions = [f"water<{self.water_below:g}" if self.water_below is not None else "",
+                      f"core<{self.core_below:g}" if self.core_below is not None else ""]
+        conditions = [c for c in conditions if c]
+        return f"{text} [{' '.join(conditions)}]" if conditions else text
+
+
+def load_recipes(path):
+    """Recipes from a JSON file, with "count" expanded into repeated entries"""
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("recipes", [data])
+    recipes = []
+    for entry in data:
+        entry = dict(entry)
+        count = int(entry.pop("count", 1))
+        recipe = Recipe.from_dict(entry)
+        recipes.extend([recipe] * count)
+    return recipes
+
+
+class BatchScheduler:
+    """Runs queued recipes back to back on a PasteurizerEngine (or ProcessEngine).
+
+    A worker thread starts the next recipe once the previous cycle has ended,
+    `gap` seconds have passed and the recipe's preconditions hold on live
+    readings. A cycle that was stopped by hand or by a fault (ABORTED), or
+    preconditions not met within max_wait, pause the queue. Status callbacks
+    get (status, message) with status one of RUNNING, WAITING, FINISHED,
+    ABORTED, PAUSED or DONE (IDLE before the queue first runs).
+    """
+
+    def __init__(self, engine, gap=0.0, poll_interval=0.5):
+        self.engine = engine
+        self.gap = gap
+        self.poll_interval = poll_interval
+        self.summary_path = os.path.join(engine.logs_dir, SUMMARY_NAME)
+        self.queue = deque()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.running = False
+        self.closed = False
+        self.thread = None
+        self.status = "IDLE"
+        self.current = None
+        self.waiting_since = None
+        self.ready_at = 0.0
+        self.summaries = []
+        self.subscribers = []
+        engine.subscribe_events(self.on_transition)
+        engine.subscribe_samples(self.on_sample)
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def notify(self, status, message):
+        self.status = status
+        logger.info("Batch %s: %s", status.lower(), message)
+        for callback in self.subscribers:
+            try:
+                callback(status, message)
+            except Exception as e:
+                logger.exception("Batch subscriber error: %s", e)
+
+    # Queue
+
+    def add(self, recipe):
+        with self.lock:
+            self.queue.append(recipe)
+        self.wake.set()
+
+    def extend(self, recipes):
+        with self.lock:
+            self.queue.extend(recipes)
+        self.wake.set()
+
+    def remove(self, index):
+        with self.lock:
+            if 0 <= index < len(self.queue):
+                del self.queue[index]
+
+    def clear(self):
+        with self.lock:
+            self.queue.clear()
+
+    def pending(self):
+        with self.lock:
+            return list(self.queue)
+
+    def start(self):
+        """Run the queue; the first cycle starts as soon as its preconditions hold"""
+        self.running = True
+        self.waiting_since = None
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="batch-scheduler", daemon=True)
+            self.thread.start()
+        self.wake.set()
+
+    def pause(self):
+        """Start no further cycles; the one running finishes normally"""
+        if self.running:
+            self.running = False
+            self.notify("PAUSED", "Queue paused")
+
+    def stop(self):
+        """Pause the queue and stop the running cycle"""
+        self.pause()
+        if self.current is not None:
+            self.engine.stop()
+
+    def close(self):
+        self.running = False
+        self.closed = True
+        self.wake.set()
+
+    # Engine callbacks (reader thread)
+
+    def on_transition(self, transition):
+        run = self.current
+        if run is None:
+            return
+        if transition.event == "HOLD_STARTED":
+            run["hold_start"] = transition.timestamp
+        elif run["hold_start"] is not None and run["hold_end"] is None:
+            run["hold_end"] = transition.timestamp
+        if transition.state == "IDLE":
+            run["result"] = transition.event
+            run["finished"] = transition.timestamp
+            self.wake.set()
+
+    def on_sample(self, sample):
+        run = self.current
+        if run is not None and self.engine.process_state == "HOLDING":
+            low = run["min_hold_core"]
+            run["min_hold_core"] = sample.core_temp if low is None else min(low, sample.core_temp)
+        elif self.status == "WAITING":
+            self.wake.set()
+
+    # Worker
+
+    def run(self):
+        while not self.closed:
+            self.wake.wait(self.poll_interval)
+            self.wake.clear()
+            try:
+                self.step()
+            except Exception as e:
+                logger.exception("Batch scheduler error: %s", e)
+
+    def step(self):
+        if self.current is not None:
+            if self.current["result"] is None:
+                return  # still running (or not confirmed started yet)
+            self.finish()
+        if not self.running:
+            return
+        with self.lock:
+            recipe = self.queue[0] if self.queue else None
+        if recipe is None:
+            self.running = False
+            self.notify("DONE", f"Queue finished after {len(self.summaries)} runs")
+            return
+
+        engine = self.engine
+        now = time.monotonic()
+        if now < self.ready_at:
+            return
+        if engine.stale or engine.last_sample_time is None:
+            reason = "live readings"
+        else:
+            reason = recipe.unmet(engine.core_temp, engine.water_temp)
+        if reason:
+            if self.waiting_since is None:
+                self.waiting_since = now
+                self.notify("WAITING", f"{recipe.name}: waiting for {reason}")
+            elif recipe.max_wait is not None and now - self.waiting_since > recipe.max_wait:
+                self.running = False
+                self.waiting_since = None
+                self.notify("PAUSED", f"{recipe.name}: {reason} not met after "
+                                      f"{recipe.max_wait:g}s, queue paused")
+            return
+
+        with self.lock:
+            if not self.queue or self.queue[0] is not recipe:
+                return  # edited meanwhile; look again on the next pass
+            self.queue.popleft()
+            left = len(self.queue)
+        waited = now - self.waiting_since if self.waiting_since is not None else 0.0
+        self.waiting_since = None
+        engine.new_log_segment()
+        self.current = {"recipe": recipe, "start": datetime.now().isoformat(timespec="seconds"),
+                        "started": now, "waited": waited, "hold_start": None, "hold_end": None,
+                        "min_hold_core": None, "result": None, "finished": None}
+        engine.start_recipe(**recipe.params())
+        self.notify("RUNNING", f"Started {recipe.name} ({left} queued)")
+
+    def finish(self):
+        run, self.current = self.current, None
+        recipe = run["recipe"]
+        machine = self.engine.machine
+        hold = None
+        if run["hold_start"] is not None:
+            hold = (run["hold_end"] or run["finished"]) - run["hold_start"]
+        summary = {
+            "Recipe": recipe.name,
+            "Log_File": self.engine.log_file,
+            "Start": run["start"],
+            "End": datetime.now().isoformat(timespec="seconds"),
+            "Result": run["result"],
+            "Process_Type": recipe.process_type,
+            "Heat_Setpoint": recipe.heat_setpoint,
+            "Cool_Setpoint": recipe.cool_setpoint,
+            "Hold_Time": recipe.hold_time,
+            "Target_F": recipe.target_lethality,
+            "Wait_s": round(run["waited"], 1),
+            "Duration_s": round(time.monotonic() - run["started"], 1),
+            "Hold_s": round(hold, 1) if hold is not None else None,
+            "Min_Hold_Core_C": round(run["min_hold_core"], 2) if run["min_hold_core"] is not None else None,
+            "Lethality_F_min": round(machine.lethality.value, 4),
+        }
+        self.summaries.append(summary)
+        self.write_summary(summary)
+        self.ready_at = time.monotonic() + self.gap
+        status = "FINISHED"
+        if run["result"] != "PROCESS_COMPLETED":
+            self.running = False  # a cycle stopped by hand pauses the queue
+            status = "ABORTED"
+        self.notify(status, f"{recipe.name}: {run['result']} after "
+                            f"{summary['Duration_s']:.0f}s, F={summary['Lethality_F_min']:.2f}")
+
+    def write_summary(self, summary):
+        try:
+            new_file = not os.path.exists(self.summary_path)
+            with open(self.summary_path, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=SUMMARY_HEADER)
+                if new_file:
+                    writer.writeheader()
+                writer.writerow(summary)
+        except OSError as e:
+            logger.error("Could not write batch summary: %s", e)
@@ -0,0 +1,403 @@
+"""Replay recorded runs through the cycle logic and compare with what was logged.
+
+    python pasteurizer_replay.py pasteurizer_logs                  # every CSV cycle, flat out
+    python pasteurizer_replay.py pasteurizer_logs --hold 45        # what would a longer hold do?
+    python pasteurizer_replay.py pasteurizer_logs/pasteurizer_run_20250601_101500 --realtime
+    python pasteurizer_replay.py pasteurizer_logs --source telemetry --jobs 4
+
+A recording is one cycle: the samples from PROCESS_STARTED to the end of the
+cycle, the recipe it ran with, and the control events logged for it. Replaying
+feeds the samples, with their recorded timestamps, to a fresh
+ProcessStateMachine; because the machine only looks at those timestamps the
+result is the same at any speed. The replayed HOLD_STARTED, COOLING_STARTED and
+PROCESS_COMPLETED events are then compared with the logged ones.
+
+Replay is open loop: the recorded temperatures do not respond to the replayed
+commands, so a recipe override shows when the logic would have switched, not
+how the vat would have behaved afterwards.
+
+CSV logs carry no hold time, so it is taken from the logged hold (whole
+seconds) unless --hold is given. Telemetry runs store the full-rate samples and
+the recipe in their headers and recipe.json; their events are derived from the
+state column. Runs recorded before recipe.json existed do not say whether a
+target lethality ended the hold, so one whose hold ended early is skipped
+unless --target-lethality is given.
+"""
+import argparse
+import csv
+import glob
+import logging
+import os
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from pasteurizer_control import ProcessStateMachine
+
+logger = logging.getLogger(__name__)
+
+CONTROL_EVENTS = ("HOLD_STARTED", "COOLING_STARTED", "PROCESS_COMPLETED")
+END_EVENTS = ("PROCESS_COMPLETED", "PROCESS_STOPPED")
+RECIPE_KEYS = ("heat_setpoint", "cool_setpoint", "hold_time", "process_type", "target_lethality",
+               "ref_temp", "z_value")
+
+# State column changes of a telemetry run -> the event that caused them
+STATE_EVENTS = {
+    ("HEATING", "HOLDING"): "HOLD_STARTED",
+    ("HOLDING", "COOLING"): "COOLING_STARTED",
+    ("HOLDING", "IDLE"): "PROCESS_COMPLETED",
+    ("COOLING", "IDLE"): "PROCESS_COMPLETED",
+}
+
+Recording = namedtuple("Recording", ["source", "cycle", "recipe", "start", "stop", "times",
+                                     "core_temps", "water_temps", "events", "wall_start", "skip"],
+                       defaults=[None])
+Event = namedtuple("Event", ["timestamp", "event"])
+ReplayResult = namedtuple("ReplayResult", ["label", "recipe", "logged", "replayed", "differences",
+                                           "final_state", "lethality", "samples", "skipped"],
+                          defaults=[None])
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def first_state(process_type):
+    return "HEATING" if process_type in ("HEAT", "HEAT_COOL") else "COOLING"
+
+
+def load_csv(path, default_hold=30):
+    """Every cycle (PROCESS_STARTED to its end) in one pasteurizer_log_*.csv"""
+    recordings = []
+    with open(path, newline="") as f:
+        rows = csv.reader(f)
+        columns = next(rows, None)
+        if not columns:
+            return recordings
+        index = {name: i for i, name in enumerate(columns)}
+        i_time, i_core, i_water = index["Timestamp"], index["Core_Temp_C"], index["Water_Temp_C"]
+        i_event = index["Event"]
+        cycle = None
+        for values in rows:
+            if len(values) < len(columns):
+                continue  # partial last line of a log still being written
+            event = values[i_event]
+            try:
+                timestamp = datetime.fromisoformat(values[i_time]).timestamp()
+            except ValueError:
+                continue
+            if event == "PROCESS_STARTED":
+                if cycle is not None:
+                    recordings.append(finish_cycle(cycle, timestamp, default_hold))
+                cycle = {
+                    "recipe": {
+                        "heat_setpoint": to_float(values[index["Heat_Setpoint"]]),
+                        "cool_setpoint": to_float(values[index["Cool_Setpoint"]]),
+                        "process_type": values[index["Process_Type"]],
+                    },
+                    "source": path, "cycle": len(recordings), "start": timestamp,
+                    "wall_start": values[i_time], "times": [], "core": [], "water": [],
+                    "events": [],
+                }
+                continue
+            if cycle is None:
+                continue
+            core = to_float(values[i_core])
+            if core is not None:
+                cycle["times"].append(timestamp)
+                cycle["core"].append(core)
+                cycle["water"].append(to_float(values[i_water]) or 0.0)
+            if event in CONTROL_EVENTS or event == "PROCESS_STOPPED":
+                cycle["events"].append(Event(timestamp, event))
+            if event in END_EVENTS:
+                recordings.append(finish_cycle(cycle, None, default_hold))
+                cycle = None
+    if cycle is not None:
+        recordings.append(finish_cycle(cycle, None, default_hold))
+    return recordings
+
+
+def finish_cycle(cycle, interrupted_at, default_hold):
+    events = cycle["events"]
+    stop = interrupted_at
+    if events and events[-1].event == "PROCESS_STOPPED":
+        stop = events.pop().timestamp
+    hold_start = next((e.timestamp for e in events if e.event == "HOLD_STARTED"), None)
+    hold_end = next((e.timestamp for e in events
+                     if hold_start is not None and e.event != "HOLD_STARTED"), None)
+    recipe = dict(cycle["recipe"])
+    # Samples arrive after the hold has run out, so the logged hold is never shorter than the
+    # configured one; whole seconds recovers it for the usual integer hold times
+    recipe["hold_time"] = int(hold_end - hold_start) if hold_end is not None else default_hold
+    return Recording(cycle["source"], cycle["cycle"], recipe, cycle["start"], stop,
+                     cycle["times"], cycle["core"], cycle["water"], events, cycle["wall_start"])
+
+
+def load_run(path):
+    """The cycle stored in one telemetry run directory"""
+    from pasteurizer_telemetry import STATE_NAMES, TelemetryRun
+
+    run = TelemetryRun(path)
+    try:
+        header = run.header
+        stored = run.recipe
+        times = run.columns["timestamp"].tolist()
+        # Temperatures are stored as float32; frames carry at most two decimals, so rounding
+        # gives back the exact values the machine compared against its setpoints
+        core_temps = [round(t, 2) for t in run.columns["core_temp"].tolist()]
+        water_temps = [round(t, 2) for t in run.columns["water_temp"].tolist()]
+        states = run.columns["state"].tolist()
+    finally:
+        run.close()
+
+    events = []
+    previous = first_state(header["process_type"])
+    for timestamp, code in zip(times, states):
+        state = STATE_NAMES.get(code, "IDLE")
+        if state != previous:
+            event = STATE_EVENTS.get((previous, state))
+            if event:
+                events.append(Event(timestamp, event))
+            previous = state
+    recipe = {key: header[key] for key in ("heat_setpoint", "cool_setpoint", "process_type")}
+    recipe["hold_time"] = header["hold_time"]
+    skip = None
+    if stored is not None:
+        recipe.update({key: stored[key] for key in ("target_lethality", "ref_temp", "z_value")
+                       if stored.get(key) is not None})
+    else:
+        hold_start = next((e.timestamp for e in events if e.event == "HOLD_STARTED"), None)
+        hold_end = next((e.timestamp for e in events
+                         if hold_start is not None and e.event != "HOLD_STARTED"), None)
+        if hold_end is not None and hold_end - hold_start < header["hold_time"] - 1.0:
+            skip = (f"hold ended after {hold_end - hold_start:.0f}s of {header['hold_time']:g}s, "
+                    "probably at a target lethality this run has no recipe.json for; "
+                    "pass --target-lethality to replay it")
+    wall_start = datetime.fromtimestamp(header["wall_start"]).isoformat()
+    return [Recording(path, 0, recipe, header["monotonic_start"], None, times, core_temps,
+                      water_temps, events, wall_start, skip)]
+
+
+def load_path(path, default_hold=30):
+    if os.path.isdir(path):
+        return load_run(path)
+    return load_csv(path, default_hold)
+
+
+def find_recordings(path, source="csv"):
+    """Files (CSV logs) or run directories (telemetry) under path, or path itself"""
+    if not os.path.isdir(path) or os.path.exists(os.path.join(path, "timestamp.col")):
+        return [path]
+    if source == "telemetry":
+        pattern = os.path.join(path, "**", "pasteurizer_run_*")
+        return sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isdir(p))
+    return sorted(glob.glob(os.path.join(path, "**", "pasteurizer_log_*.csv"), recursive=True))
+
+
+def replay(recording, speed=None, **overrides):
+    """Run recording through a fresh ProcessStateMachine; returns (transitions, machine).
+
+    With speed set, samples are fed at `speed` times their recorded pace
+    (1.0 is real time); otherwise as fast as possible. The outcome is the same.
+    """
+    recipe = dict(recording.recipe)
+    recipe.update({k: v for k, v in overrides.items() if v is not None})
+    machine = ProcessStateMachine(**{k: v for k, v in recipe.items() if k in RECIPE_KEYS})
+    transitions = [machine.start(recording.start)]
+    stop = recording.stop
+    origin = time.monotonic()
+    for timestamp, core_temp in zip(recording.times, recording.core_temps):
+        if stop is not None and timestamp >= stop:
+            break
+        if speed:
+            delay = origin + (timestamp - recording.start) / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        transitions += machine.update(core_temp, timestamp)
+        if machine.state == "IDLE":
+            break
+    if stop is not None and machine.active:
+        transitions.append(machine.stop(stop))
+    return transitions, machine
+
+
+def compare(logged, replayed, start, tolerance=1.0):
+    """Human-readable differences between two lists of control Events"""
+    differences = []
+    for i in range(max(len(logged), len(replayed))):
+        old = logged[i] if i < len(logged) else None
+        new = replayed[i] if i < len(replayed) else None
+        if old is None:
+            differences.append(f"extra {new.event} at {new.timestamp - start:.1f}s")
+        elif new is None:
+            differences.append(f"missing {old.event} (logged at {old.timestamp - start:.1f}s)")
+        elif old.event != new.event:
+            differences.append(f"{new.event} instead of {old.event} at "
+                               f"{new.timestamp - start:.1f}s")
+        elif abs(new.timestamp - old.timestamp) > tolerance:
+            differences.append(f"{old.event} {new.timestamp - old.timestamp:+.1f}s")
+    return differences
+
+
+def replay_recording(recording, tolerance=1.0, speed=None, **overrides):
+    label = os.path.basename(recording.source)
+    if not os.path.isdir(recording.source):
+        label = f"{label}#{recording.cycle + 1}"
+    recipe = dict(recording.recipe)
+    recipe.update({k: v for k, v in overrides.items() if v is not None})
+    if recording.skip and overrides.get("target_lethality") is None:
+        return ReplayResult(label, recipe, recording.events, [], [], None, 0.0,
+                            len(recording.times), recording.skip)
+    transitions, machine = replay(recording, speed, **overrides)
+    replayed = [Event(t.timestamp, t.event) for t in transitions if t.event in CONTROL_EVENTS]
+    return ReplayResult(label, recipe, recording.events, replayed,
+                        compare(recording.events, replayed, recording.start, tolerance),
+                        machine.state, machine.lethality.value, len(recording.times))
+
+
+def replay_file(path, tolerance=1.0, speed=None, default_hold=30, **overrides):
+    """Replay every cycle in one file or run directory (top level, so a process pool can call it)"""
+    try:
+        recordings = load_path(path, default_hold)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("Could not read %s: %s", path, e)
+        return []
+    return [replay_recording(r, tolerance, speed, **overrides) for r in recordings]
+
+
+class ReplayTransport:
+    """Plays a Recording back like a controller, for PasteurizerEngine or the CLI.
+
+    Frames come out at `speed` times the recorded pace, with the last one
+    repeated every second in between. Commands only change the MODE reported
+    in the frames, so the command queue sees them acknowledged.
+    The engine timestamps frames on arrival, so use speed 1.0 when hold times matter.
+    """
+
+    MODES = {"heat": "HEAT", "cool": "COOL", "stop": "IDLE"}
+
+    def __init__(self, recording, speed=1.0):
+        self.recording = recording
+        self.speed = speed
+        self.index = 0
+        self.origin = None
+        self.mode = "IDLE"
+
+    def connect(self):
+        if self.origin is None:
+            self.origin = time.monotonic()
+        return True
+
+    def disconnect(self):
+        pass
+
+    def read_frames(self):
+        recording = self.recording
+        if self.index >= len(recording.times):
+            time.sleep(1.0)  # recording finished: a silent controller
+            return []
+        elapsed = (time.monotonic() - self.origin) * self.speed
+        due = recording.times[self.index] - recording.times[0]
+        if due > elapsed:
+            time.sleep(min(due - elapsed, 1.0) / self.speed)
+            elapsed = (time.monotonic() - self.origin) * self.speed
+        frames = []
+        while self.index < len(recording.times) and \
+                recording.times[self.index] - recording.times[0] <= elapsed:
+            frames.append(self.frame(self.index))
+            self.index += 1
+        if not frames and self.index:
+            # CSV logs hold a row every few seconds; repeat the last one like a controller would
+            frames.append(self.frame(self.index - 1))
+        return frames
+
+    def frame(self, index):
+        return {"T_CORE": self.recording.core_temps[index],
+                "T_WATER": self.recording.water_temps[index], "MODE": self.mode}
+
+    def write_command(self, command):
+        self.mode = self.MODES.get(command, self.mode)
+        return True
+
+
+def hold_text(recipe):
+    if recipe.get("target_lethality") is not None:
+        return f"F={recipe['target_lethality']:g}"
+    return f"hold {recipe['hold_time']:g}s"
+
+
+def print_result(result, verbose=False):
+    recipe = result.recipe
+    if result.skipped:
+        print(f"SKIP {result.label:<40} {result.skipped}")
+        return
+    status = "OK  " if not result.differences else "DIFF"
+    print(f"{status} {result.label:<40} {recipe['process_type']:<9} "
+          f"{recipe['heat_setpoint']:g}/{recipe['cool_setpoint']:g} {hold_text(recipe)}  "
+          f"F={result.lethality:.2f}  {result.final_state if result.final_state != 'IDLE' else ''}")
+    for difference in result.differences:
+        print(f"       {difference}")
+    if verbose:
+        for name, events in (("logged", result.logged), ("replayed", result.replayed)):
+            print(f"       {name}: {', '.join(e.event for e in events) or '-'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded runs through the cycle logic")
+    parser.add_argument("paths", nargs="+",
+                        help="CSV logs, telemetry run directories, or directories to search")
+    parser.add_argument("--source", choices=["csv", "telemetry"], default="csv",
+                        help="what to look for inside directories (default csv)")
+    parser.add_argument("--heat", type=float, dest="heat_setpoint")
+    parser.add_argument("--cool", type=float, dest="cool_setpoint")
+    parser.add_argument("--hold", type=float, dest="hold_time")
+    parser.add_argument("--process-type", choices=["HEAT", "COOL", "HEAT_COOL"])
+    parser.add_argument("--target-lethality", type=float)
+    parser.add_argument("--ref-temp", type=float)
+    parser.add_argument("--z-value", type=float)
+    parser.add_argument("--default-hold", type=float, default=30,
+                        help="hold time for CSV cycles that never finished a hold (default 30)")
+    parser.add_argument("--tolerance", type=float, default=1.0,
+                        help="seconds an event may move before it counts as different")
+    parser.add_argument("--realtime", nargs="?", type=float, const=1.0, metavar="SPEED",
+                        help="feed samples at their recorded pace (times SPEED)")
+    parser.add_argument("--jobs", type=int, default=1, help="replay files in parallel processes")
+    parser.add_argument("--verbose", action="store_true", help="list the events of every cycle")
+    parser.add_argument("--log-level", default="WARNING",
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(levelname)s %(name)s: %(message)s")
+
+    overrides = {key: getattr(args, key) for key in RECIPE_KEYS}
+    files = [f for path in args.paths for f in find_recordings(path, args.source)]
+    start = time.perf_counter()
+    if args.jobs > 1 and len(files) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        from functools import partial
+
+        work = partial(replay_file, tolerance=args.tolerance, speed=args.realtime,
+                       default_hold=args.default_hold, **overrides)
+        with ProcessPoolExecutor(args.jobs) as pool:
+            batches = list(pool.map(work, files))
+    else:
+        batches = [replay_file(f, args.tolerance, args.realtime, args.default_hold, **overrides)
+                   for f in files]
+    elapsed = time.perf_counter() - start
+
+    results = [result for batch in batches for result in batch]
+    for result in results:
+        print_result(result, args.verbose)
+    differ = sum(1 for r in results if r.differences)
+    skipped = sum(1 for r in results if r.skipped)
+    samples = sum(r.samples for r in results if not r.skipped)
+    print(f"{len(results)} cycles from {len(files)} files, {differ} differ, {skipped} skipped; "
+          f"{samples} samples in {elapsed:.2f}s")
+    return 1 if differ else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime
+
+from pasteurizer_control import LethalityAccumulator
+from pasteurizer_logger import CSV_HEADER
+
+
+MAGIC = b"PSTC"
+VERSION = 1
+# magic, version, typecode, heat, cool, hold time, wall-clock start, monotonic start, process type
+HEADER = struct.Struct("<4sHcxddddd16s")
+HEADER_SIZE = 64
+# The header is full; recipe fields added since version 1 live in this JSON file next to the columns
+RECIPE_FILE = "recipe.json"
+
+# column name -> array typecode (fixed width, little-endian on every platform we ship)
+COLUMNS = {
+    "timestamp": "d",
+    "core_temp": "f",
+    "water_temp": "f",
+    "state": "B",
+}
+
+STATE_CODES = {"IDLE": 0, "HEATING": 1, "HOLDING": 2, "COOLING": 3}
+STATE_NAMES = {code: name for name, code in STATE_CODES.items()}
+
+
+def new_run_path(directory, prefix="pasteurizer_run"):
+    """Create and return a new run directory; runs started in the same second get a _N suffix"""
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(directory, f"{prefix}_{stamp}")
+    suffix = 1
+    while True:
+        try:
+            os.makedirs(path, exist_ok=False)
+            return path
+        except FileExistsError:
+            path = os.path.join(directory, f"{prefix}_{stamp}_{suffix}")
+            suffix += 1
+
+
+class TelemetryWriter:
+    """Append-only per-run store: one fixed-width binary file per column.
+
+    Samples are collected in array.array buffers and appended to the column
+    files every `chunk` samples, so a crash loses at most one chunk.
+    """
+
+    def __init__(self, path, heat_setpoint, cool_setpoint, process_type, hold_time=0,
+                 target_lethality=None, ref_temp=60.0, z_value=7.0, chunk=1024):
+        self.path = path
+        self.chunk = chunk
+        self.lock = threading.Lock()
+        self.buffers = {name: array(code) for name, code in COLUMNS.items()}
+        self.files = {}
+        os.makedirs(path, exist_ok=True)
+        header = dict(heat_setpoint=heat_setpoint, cool_setpoint=cool_setpoint, hold_time=hold_time,
+                      wall_start=time.time(), monotonic_start=time.monotonic(),
+                      process_type=process_type)
+        for name, code in COLUMNS.items():
+            f = open(os.path.join(path, f"{name}.col"), "ab")
+            if f.tell() == 0:
+                f.write(pack_header(code, **header))
+            self.files[name] = f
+        with open(os.path.join(path, RECIPE_FILE), "w") as f:
+            json.dump({"target_lethality": target_lethality, "ref_temp": ref_temp,
+                       "z_value": z_value}, f)
+
+    def append(self, timestamp, core_temp, water_temp, state):
+        with self.lock:
+            if not self.files:
+                return
+            self.buffers["timestamp"].append(timestamp)
+            self.buffers["core_temp"].append(core_temp)
+            self.buffers["water_temp"].append(water_temp)
+            self.buffers["state"].append(STATE_CODES.get(state, 0))
+            if len(self.buffers["timestamp"]) >= self.chunk:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            for f in self.files.values():
+                f.close()
+            self.files = {}
+
+    def _flush(self):
+        for name, buffer in self.buffers.items():
+            if buffer and name in self.files:
+                buffer.tofile(self.files[name])
+                self.files[name].flush()
+                del buffer[:]
+
+
+def pack_header(typecode, heat_setpoint, cool_setpoint, hold_time, wall_start, monotonic_start,
+                process_type):
+    header = HEADER.pack(MAGIC, VERSION, typecode.encode(), heat_setpoint, cool_setpoint,
+                         hold_time, wall_start, monotonic_start, process_type.encode()[:16])
+    return header.ljust(HEADER_SIZE, b"\0")
+
+
+def unpack_header(data):
+    magic, version, typecode, heat, cool, hold, wall_start, mono_start, process_type = \
+        HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a pasteurizer telemetry column")
+    if version != VERSION:
+        raise ValueError(f"unsupported telemetry version {version}")
+    return {
+        "typecode": typecode.decode(),
+        "heat_setpoint": heat,
+        "cool_setpoint": cool,
+        "hold_time": hold,
+        "wall_start": wall_start,
+        "monotonic_start": mono_start,
+        "process_type": process_type.rstrip(b"\0").decode(),
+    }
+
+
+class TelemetryRun:
+    """Memory-mapped, read-only view of a stored run.
+
+    `columns` holds memoryviews straight over the mapped files, so nothing is
+    copied or parsed; numpy.frombuffer() accepts them directly. `recipe`
+    holds the fields from recipe.json, or None for runs recorded without it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.maps = {}
+        self.columns = {}
+        self.header = None
+        self.recipe = None
+        try:
+            with open(os.path.join(path, RECIPE_FILE)) as f:
+                self.recipe = json.load(f)
+        except FileNotFoundError:
+            pass
+        lengths = []
+        for name, code in COLUMNS.items():
+            with open(os.path.join(path, f"{name}.col"), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            header = unpack_header(mm)
+            if header["typecode"] != code:
+                raise ValueError(f"column {name} has type {header['typecode']}, expected {code}")
+            self.header = self.header or header
+            self.maps[name] = mm
+            lengths.append((len(mm) - HEADER_SIZE) // array(code).itemsize)
+        # A run that is still being written may have one column a chunk ahead
+        self.length = min(lengths)
+        for name, code in COLUMNS.items():
+            size = array(code).itemsize
+            with memoryview(self.maps[name]) as whole:
+                self.columns[name] = whole[HEADER_SIZE:HEADER_SIZE + self.length * size].cast(code)
+
+    def __len__(self):
+        return self.length
+
+    def rows(self):
+        wall_offset = self.header["wall_start"] - self.header["monotonic_start"]
+        ts, core, water, state = (self.columns[name] for name in COLUMNS)
+        recipe = self.recipe or {}
+        lethality = LethalityAccumulator(recipe.get("ref_temp", 60.0), recipe.get("z_value", 7.0))
+        # Like the live accumulator: every sample that arrives while the cycle runs counts,
+        # including the last one, stored as IDLE by the transition it caused
+        counting = True
+        for i in range(self.length):
+            if counting:
+                lethality.add(core[i], ts[i])
+            counting = bool(state[i])
+            yield [
+                datetime.fromtimestamp(ts[i] + wall_offset).isoformat(),
+                round(core[i], 2),
+                round(water[i], 2),
+                STATE_NAMES.get(state[i], "IDLE"),
+                self.header["heat_setpoint"],
+                self.header["cool_setpoint"],
+                self.header["process_type"],
+                "TEMPERATURE_READING",
+                round(lethality.value, 4),
+            ]
+
+    def close(self):
+        for view in self.columns.values():
+            view.release()
+        for mm in self.maps.values():
+            mm.close()
+        self.columns = {}
+        self.maps = {}
+
+
+def run_to_csv(run_path, csv_path):
+    """Convert a stored run back to the pasteurizer_logs CSV column layout"""
+    run = TelemetryRun(run_path)
+    try:
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER)
+            writer.writerows(run.rows())
+        return len(run)
+    finally:
+        run.close()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python pasteurizer_telemetry.py RUN_DIR [OUTPUT.csv]")
+        return 1
+    run_path = sys.argv[1].rstrip(os.sep)
+    csv_path = sys.argv[2] if len(sys.argv) > 2 else run_path + ".csv"
+    count = run_to_csv(run_path, csv_path)
+    print(f"Wrote {count} samples to {csv_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
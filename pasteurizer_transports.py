@@ -0,0 +1,583 @@
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from collections import namedtuple
+
+from pasteurizer_metrics import FRAMES_RECEIVED, PARSE_FAILURES
+
+logger = logging.getLogger(__name__)
+
+
+def parse_frame(line):
+    """Parse one T_CORE:..,T_WATER:..,MODE:.. line, or return None if it is incomplete"""
+    if "Sent:" in line:
+        line = line.split("Sent:", 1)[-1]
+    parts = {}
+    for kv in line.split(","):
+        if ":" in kv:
+            key, val = kv.split(":", 1)
+            key = key.strip()
+            val = val.strip()
+            if key in ("T_CORE", "T_WATER"):
+                try:
+                    parts[key] = float(val)
+                except ValueError:
+                    return None
+            elif key == "MODE":
+                parts[key] = val
+    if "T_CORE" in parts and "T_WATER" in parts:
+        return parts
+    return None
+
+
+def split_frames(buffer, max_buffer=4096):
+    """Split complete lines off buffer; return (frames, remaining partial line)"""
+    *lines, rest = buffer.split(b"\n")
+    if len(rest) > max_buffer:
+        rest = b""  # drop a partial frame that never saw a newline
+    frames = []
+    failures = 0
+    for line in lines:
+        frame = parse_frame(line.decode(errors="ignore"))
+        if frame is not None:
+            frames.append(frame)
+        elif line.strip():
+            failures += 1
+    FRAMES_RECEIVED.inc(len(frames))
+    if failures:
+        PARSE_FAILURES.inc(failures)
+    return frames, rest
+
+
+def make_decoder(protocol):
+    """FrameDecoder for protocol "binary" (it also accepts text), None for plain text"""
+    if protocol == "text":
+        return None
+    if protocol != "binary":
+        raise ValueError(f"unknown protocol {protocol}")
+    from pasteurizer_protocol import FrameDecoder
+
+    return FrameDecoder()
+
+
+def request_protocol(client):
+    """Ask the controller for binary frames; one without support ignores it and keeps sending text"""
+    if client.decoder is not None:
+        from pasteurizer_protocol import REQUEST
+
+        client.decoder.reset()
+        client.write_command(REQUEST)
+
+
+class WiFiArduinoInterface:
+    def __init__(self, host='0.0.0.0', port=12345, timeout=1.0, protocol="text",
+                 connect_timeout=5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.protocol = protocol
+        self.decoder = make_decoder(protocol)
+        self.sock = None
+        self.rx_buffer = b""
+
+    def connect(self):
+        try:
+            # An unreachable host must not hold up reconnects for the OS's SYN timeout
+            self.sock = socket.create_connection((self.host, self.port),
+                                                 timeout=self.connect_timeout)
+            # Bounded blocking so a reader thread can notice it was stopped
+            self.sock.settimeout(self.timeout)
+            self.rx_buffer = b""
+            request_protocol(self)
+            return True
+        except Exception as e:
+            logger.warning("WiFi connection to %s:%s failed: %s", self.host, self.port, e)
+            return False
+
+    def disconnect(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        self.rx_buffer = b""
+
+    def read_frames(self):
+        """Block until data arrives and return every complete frame now in the buffer"""
+        try:
+            data = self.sock.recv(4096)
+        except socket.timeout:
+            return []
+        if not data:
+            raise ConnectionError("connection closed by controller")
+        if self.decoder is not None:
+            return self.decoder.feed(data)
+        frames, self.rx_buffer = split_frames(self.rx_buffer + data)
+        return frames
+
+    def read_temperatures(self, all_frames=False):
+        """Return (core, water) of the newest frame, or every frame if all_frames is set.
+
+        Returns None (or an empty list) when no complete frame has arrived yet.
+        """
+        try:
+            frames = self.read_frames()
+        except Exception as e:
+            logger.warning("WiFi read error: %s", e)
+            frames = []
+        temps = [(f["T_CORE"], f["T_WATER"]) for f in frames]
+        if all_frames:
+            return temps
+        return temps[-1] if temps else None
+
+    def write_command(self, command):
+        try:
+            self.sock.sendall((command + "\n").encode())
+            return True
+        except Exception as e:
+            logger.error("WiFi write error: %s", e)
+            return False
+
+
+class ArduinoSerialInterface:
+    def __init__(self, port='/dev/tty.usbmodem12345', baudrate=9600, boot_timeout=2.0,
+                 protocol="text"):
+        self.port = port
+        self.baudrate = baudrate
+        self.boot_timeout = boot_timeout
+        self.protocol = protocol
+        self.decoder = make_decoder(protocol)
+        self.ser = None
+        self.rx_buffer = b""
+        self.core_temp = None  # no frame yet
+        self.water_temp = None
+
+    def connect(self):
+        try:
+            import serial
+
+            self.ser = serial.Serial(self.port, self.baudrate, timeout=1)
+            self.rx_buffer = b""
+            self.wait_for_frame()
+            request_protocol(self)  # after the boot frame, so a resetting board hears it
+            return True
+        except Exception as e:
+            logger.warning("Serial connection to %s failed: %s", self.port, e)
+            return False
+
+    def wait_for_frame(self):
+        """Wait until the board sends a frame, at most boot_timeout seconds.
+
+        Opening the port may reset the board; one that is already running
+        answers straight away, so there is no fixed boot delay.
+        """
+        self.ser.timeout = 0.1
+        deadline = time.monotonic() + self.boot_timeout
+        try:
+            while time.monotonic() < deadline:
+                frames = self.read_frames()
+                if frames:
+                    self.core_temp = frames[-1]["T_CORE"]
+                    self.water_temp = frames[-1]["T_WATER"]
+                    return True
+            return False
+        finally:
+            self.ser.timeout = 1
+
+    def disconnect(self):
+        if self.ser and self.ser.is_open:
+            self.ser.close()
+
+    def read_frames(self):
+        """Block until data arrives, drain the input buffer and return every complete frame"""
+        data = self.ser.read(1)
+        if not data:
+            return []
+        if self.ser.in_waiting:
+            data += self.ser.read(self.ser.in_waiting)
+        if self.decoder is not None:
+            return self.decoder.feed(data)
+        frames, self.rx_buffer = split_frames(self.rx_buffer + data)
+        return frames
+
+    def read_temperatures(self):
+        """Return (core, water) of the newest frame so far; (None, None) before the first one"""
+        try:
+            frames = self.read_frames()
+            if frames:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Parsed: %s", frames[-1])
+                self.core_temp = frames[-1]["T_CORE"]
+                self.water_temp = frames[-1]["T_WATER"]
+            return self.core_temp, self.water_temp
+
+        except Exception as e:
+            logger.warning("Serial read error: %s", e)
+            return self.core_temp, self.water_temp
+
+    def write_command(self, command):
+        try:
+            self.ser.write((command + "\n").encode())
+            return True
+        except Exception as e:
+            logger.error("Serial write error: %s", e)
+            return False
+
+
+def list_serial_ports():
+    """Device paths of the serial ports present now (pyserial is imported on first use)"""
+    import serial.tools.list_ports
+
+    return [port.device for port in serial.tools.list_ports.comports()]
+
+
+Sample = namedtuple("Sample", ["timestamp", "core_temp", "water_temp", "mode"])
+
+
+class DeviceReader:
+    """Dedicated thread that blocks on a transport and publishes each frame as it arrives"""
+
+    def __init__(self, client):
+        self.client = client
+        self.subscribers = []
+        self.running = False
+        self.thread = None
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        while self.running:
+            try:
+                frames = self.client.read_frames()
+            except Exception as e:
+                if self.running:
+                    logger.error("Read error, reader stopped: %s", e)
+                    self.running = False
+                break
+            now = time.monotonic()
+            for frame in frames:
+                self.publish(Sample(now, frame["T_CORE"], frame["T_WATER"], frame.get("MODE")))
+
+    def publish(self, sample):
+        for callback in self.subscribers:
+            try:
+                callback(sample)
+            except Exception as e:
+                logger.exception("Sample subscriber error: %s", e)
+
+
+class ConnectionManager(DeviceReader):
+    """DeviceReader that survives a lost link.
+
+    No frame for `stale_after` seconds marks the link STALE; a read error or
+    `reconnect_after` seconds of silence drops it and reconnects with
+    exponential backoff. Status callbacks get "CONNECTED", "STALE" or
+    "RECONNECTING" on every change.
+    """
+
+    def __init__(self, client, initial_backoff=0.5, max_backoff=30.0, stale_after=5.0,
+                 reconnect_after=15.0):
+        super().__init__(client)
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.stale_after = stale_after
+        self.reconnect_after = reconnect_after
+        self.status = "CONNECTED"
+        self.status_subscribers = []
+        self.reconnects = 0
+        self.wake = threading.Event()
+
+    def subscribe_status(self, callback):
+        self.status_subscribers.append(callback)
+
+    def set_status(self, status):
+        if status == self.status:
+            return
+        self.status = status
+        for callback in self.status_subscribers:
+            try:
+                callback(status)
+            except Exception as e:
+                logger.exception("Status subscriber error: %s", e)
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+
+    def run(self):
+        last_frame = time.monotonic()
+        while self.running:
+            try:
+                frames = self.client.read_frames()
+            except Exception as e:
+                if not self.running:
+                    break
+                logger.warning("Read error, reconnecting: %s", e)
+                self.reconnect()
+                last_frame = time.monotonic()
+                continue
+            now = time.monotonic()
+            if frames:
+                last_frame = now
+                self.set_status("CONNECTED")
+            elif now - last_frame >= self.reconnect_after:
+                logger.warning("No data for %.0fs, reconnecting", now - last_frame)
+                self.reconnect()
+                last_frame = time.monotonic()
+            elif now - last_frame >= self.stale_after:
+                self.set_status("STALE")
+            for frame in frames:
+                self.publish(Sample(now, frame["T_CORE"], frame["T_WATER"], frame.get("MODE")))
+
+    def reconnect(self):
+        self.set_status("RECONNECTING")
+        delay = self.initial_backoff
+        while self.running:
+            try:
+                self.client.disconnect()
+            except Exception:
+                pass
+            if self.client.connect():
+                self.reconnects += 1
+                self.set_status("CONNECTED")
+                return True
+            # Jitter keeps several controllers on one network from retrying in lockstep
+            if self.wake.wait(delay * random.uniform(0.8, 1.2)):
+                break
+            delay = min(delay * 2, self.max_backoff)
+        return False
+
+
+class CommandQueue:
+    """Sends controller commands from its own thread and confirms them.
+
+    put() never blocks, and a newer command replaces one still in flight
+    (heat/cool/stop all set the controller's mode). A command is acknowledged
+    when a frame reports the matching MODE; controllers that never report MODE
+    are taken at their word once the write succeeds. Unacknowledged commands
+    are resent every `ack_timeout` seconds, up to `retries` times.
+    """
+
+    EXPECTED_MODE = {"heat": "HEAT", "cool": "COOL", "stop": "IDLE"}
+
+    def __init__(self, client, ack_timeout=2.0, retries=3):
+        self.client = client
+        self.ack_timeout = ack_timeout
+        self.retries = retries
+        self.pending = None
+        self.acked = False
+        self.reports_mode = False
+        self.failure_subscribers = []
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def subscribe_failures(self, callback):
+        """callback(command) runs on the queue thread when every retry went unacknowledged"""
+        self.failure_subscribers.append(callback)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def put(self, command):
+        with self.condition:
+            self.pending = command
+            self.acked = False
+            self.condition.notify_all()
+
+    def observe(self, sample):
+        """Sample subscriber: acknowledge the pending command from the reported MODE"""
+        if sample.mode is None:
+            return
+        self.reports_mode = True
+        pending = self.pending
+        if pending and not self.acked and sample.mode == self.EXPECTED_MODE.get(pending):
+            with self.condition:
+                if self.pending == pending:
+                    self.acked = True
+                    self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and (self.pending is None or self.acked):
+                    self.condition.wait()
+                if not self.running:
+                    return
+                command = self.pending
+            if self.send(command):
+                continue
+            with self.condition:
+                if self.pending == command:
+                    self.pending = None
+            logger.error("'%s' not acknowledged after %d attempts", command, self.retries + 1)
+            for callback in self.failure_subscribers:
+                callback(command)
+
+    def send(self, command):
+        """Write until acknowledged; False when retries run out. Returns True if superseded"""
+        for _ in range(self.retries + 1):
+            written = self.client.write_command(command) is not False
+            expects_mode = self.reports_mode and command in self.EXPECTED_MODE
+            if written and not expects_mode:
+                with self.condition:
+                    if self.pending == command:
+                        self.acked = True
+                return True
+            deadline = time.monotonic() + self.ack_timeout
+            with self.condition:
+                while self.running and self.pending == command and not self.acked:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if not self.running or self.pending != command or self.acked:
+                    return True
+        return False
+
+
+def discover_arduinos(timeout=3):
+    import socket
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.settimeout(timeout)
+    sock.bind(("", 8888))  # Port should match Arduino broadcast
+
+    found = set()
+    try:
+        while True:
+            data, addr = sock.recvfrom(1024)
+            msg = data.decode()
+            found.add((msg, addr[0]))
+    except socket.timeout:
+        pass
+    finally:
+        sock.close()
+    return list(found)
+
+
+class DeviceDiscovery:
+    """Long-lived UDP listener that keeps a TTL cache of announcing controllers.
+
+    Devices seen in a previous session are loaded from `cache_file` and offered
+    straight away; they drop out if they do not announce again within `ttl`.
+    """
+
+    def __init__(self, port=8888, ttl=15, cache_file=None):
+        self.port = port
+        self.ttl = ttl
+        self.cache_file = cache_file
+        self.devices = {}  # ip -> (announcement, ip, last_seen)
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.running = False
+        self.sock = None
+        self.load_cache()
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def snapshot(self):
+        with self.lock:
+            entries = sorted(self.devices.values(), key=lambda d: d[2], reverse=True)
+        return [(msg, ip) for msg, ip, _ in entries]
+
+    def start(self):
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.sock.settimeout(1.0)
+            self.sock.bind(("", self.port))  # Port should match Arduino broadcast
+        except OSError as e:
+            logger.warning("Discovery could not listen on UDP %s: %s", self.port, e)
+            return False
+        self.running = True
+        threading.Thread(target=self.run, daemon=True).start()
+        return True
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        try:
+            while self.running:
+                try:
+                    data, addr = self.sock.recvfrom(1024)
+                    changed = self.seen(data.decode(errors="ignore").strip(), addr[0])
+                except socket.timeout:
+                    changed = False
+                if self.expire() or changed:
+                    self.save_cache()
+                    self.notify()
+        finally:
+            self.sock.close()
+
+    def seen(self, msg, ip):
+        with self.lock:
+            previous = self.devices.get(ip)
+            self.devices[ip] = (msg, ip, time.time())
+        return previous is None or previous[0] != msg
+
+    def expire(self):
+        cutoff = time.time() - self.ttl
+        with self.lock:
+            stale = [ip for ip, (_, _, last_seen) in self.devices.items() if last_seen < cutoff]
+            for ip in stale:
+                del self.devices[ip]
+        return bool(stale)
+
+    def notify(self):
+        devices = self.snapshot()
+        for callback in self.subscribers:
+            callback(devices)
+
+    def load_cache(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring device cache: %s", e)
+            return
+        now = time.time()
+        for entry in entries:
+            # Give remembered devices one TTL to announce themselves again
+            self.devices[entry["ip"]] = (entry["announcement"], entry["ip"], now)
+
+    def save_cache(self):
+        if not self.cache_file:
+            return
+        with self.lock:
+            entries = [{"announcement": msg, "ip": ip, "last_seen": last_seen}
+                       for msg, ip, last_seen in self.devices.values()]
+        if not entries:
+            return  # keep the last known devices for the next launch
+        try:
+            with open(self.cache_file, "w") as f:
+                json.dump(entries, f)
+        except OSError as e:
+            logger.warning("Could not save device cache: %s", e)
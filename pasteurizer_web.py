@@ -0,0 +1,253 @@
+"""Read-only web dashboard over a running PasteurizerEngine.
+
+    GET /        live page (no external assets)
+    GET /state   current state as JSON
+    GET /events  server-sent events: "sample", "transition" and "status"
+
+The server runs its own asyncio loop on a daemon thread. Engine callbacks only
+hand data to that loop; each viewer has a bounded buffer that drops its oldest
+entries when the viewer falls behind, so a slow browser never slows acquisition.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Pasteurizer</title>
+<style>
+body { font-family: sans-serif; margin: 2em; }
+.big { font-size: 2em; margin: 0.2em 0; }
+#state { font-weight: bold; }
+#log { font-family: monospace; white-space: pre; height: 14em; overflow-y: auto; border: 1px solid #ccc; }
+canvas { border: 1px solid #ccc; width: 100%; height: 200px; }
+.stale { color: #999; }
+</style></head>
+<body>
+<div class="big">State: <span id="state">--</span> <span id="hold"></span></div>
+<div class="big" id="temps">Core: -- Water: --</div>
+<div>Lethality F: <span id="lethality">--</span> min &middot; Link: <span id="link">--</span></div>
+<canvas id="chart" width="900" height="200"></canvas>
+<div id="log"></div>
+<script>
+const points = [];
+const chart = document.getElementById("chart");
+function line(text) {
+  const log = document.getElementById("log");
+  log.textContent += new Date().toLocaleTimeString() + " " + text + "\\n";
+  log.scrollTop = log.scrollHeight;
+}
+function show(s) {
+  document.getElementById("state").textContent = s.state;
+  document.getElementById("hold").textContent = s.hold_remaining == null ? "" : Math.round(s.hold_remaining) + "s";
+  document.getElementById("lethality").textContent = s.lethality.toFixed(2);
+  document.getElementById("link").textContent = s.link_status;
+  const temps = document.getElementById("temps");
+  const temp = t => t == null ? "--" : t.toFixed(1) + " \\u00b0C";
+  temps.textContent = "Core: " + temp(s.core_temp) + "  Water: " + temp(s.water_temp);
+  temps.className = "big" + (s.link_status === "CONNECTED" ? "" : " stale");
+}
+function draw() {
+  const ctx = chart.getContext("2d");
+  ctx.clearRect(0, 0, chart.width, chart.height);
+  if (points.length < 2) return;
+  const t0 = points[0].t, span = Math.max(points[points.length - 1].t - t0, 1);
+  for (const [key, color] of [["core", "#c0392b"], ["water", "#2980b9"]]) {
+    ctx.strokeStyle = color;
+    ctx.beginPath();
+    points.forEach((p, i) => {
+      const x = (p.t - t0) / span * chart.width, y = chart.height - p[key] / 100 * chart.height;
+      i ? ctx.lineTo(x, y) : ctx.moveTo(x, y);
+    });
+    ctx.stroke();
+  }
+}
+fetch("state").then(r => r.json()).then(show);
+const events = new EventSource("events");
+events.addEventListener("state", e => show(JSON.parse(e.data)));
+events.addEventListener("sample", e => {
+  const s = JSON.parse(e.data);
+  points.push({t: s.timestamp, core: s.core_temp, water: s.water_temp});
+  while (points.length && points[points.length - 1].t - points[0].t > 600) points.shift();
+});
+events.addEventListener("transition", e => line(JSON.parse(e.data).message));
+events.addEventListener("status", e => line(JSON.parse(e.data).message));
+events.addEventListener("dropped", e => line("(viewer fell behind, " + e.data + " updates skipped)"));
+setInterval(() => { fetch("state").then(r => r.json()).then(show); draw(); }, 1000);
+</script>
+</body></html>
+"""
+
+
+class Viewer:
+    """One /events connection: a bounded buffer and a wakeup"""
+
+    def __init__(self, size):
+        self.buffer = deque(maxlen=size)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, item):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(item)
+        self.ready.set()
+
+
+class WebDashboard:
+    def __init__(self, engine, host="127.0.0.1", port=8080, buffer_size=256, keepalive=15.0):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.buffer_size = buffer_size
+        self.keepalive = keepalive
+        self.viewers = set()
+        self.loop = None
+        self.server = None
+        self.started = threading.Event()
+
+    def start(self):
+        """Start serving on a daemon thread; returns False if the port could not be opened"""
+        threading.Thread(target=self.run, daemon=True).start()
+        self.started.wait(5)
+        if self.server is None:
+            return False
+        self.engine.subscribe_samples(self.on_sample)
+        self.engine.subscribe_events(self.on_transition)
+        self.engine.subscribe_status(self.on_status)
+        return True
+
+    def stop(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.server.close)
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self.serve())
+        except Exception as e:
+            logger.error("Web dashboard stopped: %s", e)
+        finally:
+            self.started.set()
+            self.loop.close()
+
+    async def serve(self):
+        try:
+            self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        except OSError as e:
+            logger.error("Web dashboard could not listen on %s:%s: %s", self.host, self.port, e)
+            return
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info("Web dashboard on http://%s:%d/", self.host, self.port)
+        self.started.set()
+        async with self.server:
+            try:
+                await self.server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    # Engine callbacks (reader/command threads): hand over to the loop and return
+
+    def post(self, kind, payload):
+        if not self.viewers:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.broadcast, kind, payload)
+        except RuntimeError:
+            pass  # the dashboard was stopped
+
+    def on_sample(self, sample):
+        if self.viewers:
+            self.post("sample", {
+                "timestamp": sample.timestamp,
+                "core_temp": sample.core_temp,
+                "water_temp": sample.water_temp,
+                "mode": sample.mode,
+            })
+
+    def on_transition(self, transition):
+        payload = transition._asdict()
+        payload["time"] = time.time()
+        self.post("transition", payload)
+
+    def on_status(self, status, message):
+        self.post("status", {"status": status, "message": message, "time": time.time()})
+
+    def broadcast(self, kind, payload):
+        item = f"event: {kind}\ndata: {json.dumps(payload)}\n\n".encode()
+        for viewer in self.viewers:
+            viewer.put(item)
+
+    def state(self):
+        engine = self.engine
+        machine = engine.machine
+        return {
+            "state": machine.state,
+            "core_temp": engine.core_temp,
+            "water_temp": engine.water_temp,
+            "lethality": machine.lethality.value,
+            "hold_remaining": machine.hold_remaining(),
+            "heat_setpoint": machine.heat_setpoint,
+            "cool_setpoint": machine.cool_setpoint,
+            "process_type": machine.process_type,
+            "connected": engine.connected,
+            "link_status": engine.link_status,
+            "log_file": engine.log_file,
+            "viewers": len(self.viewers),
+        }
+
+    # HTTP
+
+    async def handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+            method, path = request.split(b" ", 2)[:2]
+            path = path.decode(errors="ignore").split("?")[0]
+            if method != b"GET":
+                await self.respond(writer, 405, "text/plain", b"Method not allowed")
+            elif path == "/":
+                await self.respond(writer, 200, "text/html; charset=utf-8", PAGE.encode())
+            elif path == "/state":
+                await self.respond(writer, 200, "application/json",
+                                   json.dumps(self.state()).encode())
+            elif path == "/events":
+                await self.stream(writer)
+            else:
+                await self.respond(writer, 404, "text/plain", b"Not found")
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, content_type, body):
+        reason = {200: "OK", 404: "Not Found", 405: "Method Not Allowed"}[status]
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def stream(self, writer):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n")
+        viewer = Viewer(self.buffer_size)
+        viewer.put(f"event: state\ndata: {json.dumps(self.state())}\n\n".encode())
+        self.viewers.add(viewer)
+        reported = 0
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(viewer.ready.wait(), self.keepalive)
+                except asyncio.TimeoutError:
+                    writer.write(b": keepalive\n\n")
+                viewer.ready.clear()
+                if viewer.dropped != reported:
+                    writer.write(f"event: dropped\ndata: {viewer.dropped - reported}\n\n".encode())
+                    reported = viewer.dropped
+                items, viewer.buffer = viewer.buffer, deque(maxlen=self.buffer_size)
+                writer.write(b"".join(items))
+                await writer.drain()
+        finally:
+            self.viewers.discard(viewer)
@@ -0,0 +1,378 @@
+# benchmark_pasteurizer.py
+"""End-to-end benchmarks for acquisition, parsing, control and logging.
+
+    python test/benchmark_pasteurizer.py --output bench.json
+    python test/benchmark_pasteurizer.py --quick --compare bench.json
+    python test/benchmark_pasteurizer.py --startup-only --startup-budget-ms 1500
+
+Results are JSON. Metric names ending in _per_sec are higher-is-better;
+everything else numeric (_ms, _bytes) is lower-is-better. --compare exits
+with status 1 when a metric is worse than the baseline by more than --tolerance,
+and so does a GUI startup slower than --startup-budget-ms.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from pasteurizer_control import ProcessStateMachine  # noqa: E402
+from pasteurizer_engine import PasteurizerEngine  # noqa: E402
+from pasteurizer_protocol import encode_frame  # noqa: E402
+from pasteurizer_transports import (  # noqa: E402
+    ArduinoSerialInterface, Sample, WiFiArduinoInterface)
+
+
+def percentiles(values, points=(50, 90, 99)):
+    values = sorted(values)
+    result = {}
+    for p in points:
+        index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+        result[f"p{p}"] = values[index]
+    result["max"] = values[-1]
+    return result
+
+
+def frames_payload(count, prefix=""):
+    # T_CORE carries the frame index so the reader can tell when it has seen the last one
+    return b"".join(f"{prefix}T_CORE:{i},T_WATER:25.0,MODE:HEAT\n".encode() for i in range(count))
+
+
+def serve_once(payload):
+    """Local TCP server that sends payload to the first client and closes"""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    def run():
+        conn, _ = server.accept()
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn.sendall(payload)
+        # Drain what the client sent (a protocol request) so close() does not reset the stream
+        conn.shutdown(socket.SHUT_WR)
+        while conn.recv(4096):
+            pass
+        conn.close()
+        server.close()
+
+    threading.Thread(target=run, daemon=True).start()
+    return server.getsockname()[1]
+
+
+def bench_wifi_parse(count):
+    port = serve_once(frames_payload(count))
+    client = WiFiArduinoInterface("127.0.0.1", port)
+    client.connect()
+    received = 0
+    start = time.perf_counter()
+    while received < count and time.perf_counter() - start < 60:
+        temps = client.read_temperatures(all_frames=True)
+        received += len(temps)
+        if temps and temps[-1][0] == count - 1:
+            break
+    elapsed = time.perf_counter() - start
+    client.disconnect()
+    return {"frames": received, "frames_per_sec": received / elapsed}
+
+
+def bench_wifi_binary_parse(count):
+    payload = b"".join(encode_frame(i, 60.0 + i % 20, 70.0, "HEAT") for i in range(count))
+    port = serve_once(payload)
+    client = WiFiArduinoInterface("127.0.0.1", port, protocol="binary")
+    client.connect()
+    received = 0
+    start = time.perf_counter()
+    while received < count and time.perf_counter() - start < 60:
+        try:
+            received += len(client.read_frames())
+        except ConnectionError:
+            break
+    elapsed = time.perf_counter() - start
+    dropped = client.decoder.dropped
+    client.disconnect()
+    return {"frames": received, "frames_per_sec": received / elapsed, "dropped": dropped}
+
+
+def bench_serial_parse(count):
+    try:
+        import serial  # noqa: F401
+        import tty
+    except ImportError as e:
+        return {"skipped": str(e)}
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    path = os.ttyname(slave)
+    payload = frames_payload(count, prefix="[Arduino] Sent: ")
+    client = ArduinoSerialInterface(path, 115200)
+    if not client.connect():
+        return {"skipped": f"could not open {path}"}
+
+    def feed():
+        view = memoryview(payload)
+        while view:
+            written = os.write(master, view[:4096])
+            view = view[written:]
+
+    writer = threading.Thread(target=feed, daemon=True)
+    start = time.perf_counter()
+    writer.start()
+    core = None
+    while core != count - 1 and time.perf_counter() - start < 60:
+        core, _ = client.read_temperatures()
+    elapsed = time.perf_counter() - start
+    client.disconnect()
+    os.close(master)
+    os.close(slave)
+    return {"frames": count, "frames_per_sec": count / elapsed}
+
+
+def bench_state_machine(count):
+    machine = ProcessStateMachine(72.0, 32.0, 30, "HEAT_COOL")
+    machine.start(0.0)
+    temp = 20.0
+    start = time.perf_counter()
+    for i in range(count):
+        now = i * 0.001
+        temp += 0.001 if machine.state == "HEATING" else -0.001
+        machine.update(temp, now)
+        if not machine.active:
+            machine.start(now)
+    elapsed = time.perf_counter() - start
+    return {"samples": count, "samples_per_sec": count / elapsed}
+
+
+def bench_transition_latency(logs_dir, trials):
+    """Time from writing the frame that crosses the setpoint to the HOLD_STARTED event"""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    client = WiFiArduinoInterface("127.0.0.1", server.getsockname()[1])
+    engine = PasteurizerEngine(logs_dir, telemetry=False, catalog=False)
+    hold_started = threading.Event()
+    received_at = {}
+
+    def on_event(transition):
+        if transition.event == "HOLD_STARTED":
+            received_at["t"] = time.perf_counter()
+            hold_started.set()
+
+    engine.subscribe_events(on_event)
+    threading.Thread(target=lambda: engine.connect(client), daemon=True).start()
+    conn, _ = server.accept()
+    # Like a controller writing each frame as it is produced; with Nagle the crossing frame
+    # waits for the client's delayed ACK of the previous one (~40 ms)
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    time.sleep(0.1)
+
+    latencies = []
+    for _ in range(trials):
+        hold_started.clear()
+        engine.start_recipe(50.0, 30.0, 3600, "HEAT")
+        conn.sendall(b"T_CORE:40.0,T_WATER:45.0,MODE:HEAT\n")
+        time.sleep(0.002)
+        sent_at = time.perf_counter()
+        conn.sendall(b"T_CORE:50.5,T_WATER:55.0,MODE:HEAT\n")
+        if hold_started.wait(2):
+            latencies.append((received_at["t"] - sent_at) * 1000)
+        engine.stop()
+    engine.close()
+    conn.close()
+    server.close()
+    result = {"trials": trials, "completed": len(latencies)}
+    if latencies:
+        result.update({f"latency_{k}_ms": v for k, v in percentiles(latencies).items()})
+    return result
+
+
+def bench_csv_logging(logs_dir, rows):
+    engine = PasteurizerEngine(logs_dir, telemetry=False, catalog=False)
+    stalls = []
+    start = time.perf_counter()
+    for i in range(rows):
+        t0 = time.perf_counter()
+        engine.log_to_csv("TEMPERATURE_READING")
+        stalls.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    dropped = engine.csv_logger.dropped
+    engine.close()
+    stall = percentiles([s * 1000 for s in stalls])
+    return {
+        "rows": rows,
+        "rows_per_sec": rows / elapsed,
+        "dropped_rows": dropped,
+        "write_stall_p50_ms": stall["p50"],
+        "write_stall_p99_ms": stall["p99"],
+        "write_stall_max_ms": stall["max"],
+    }
+
+
+def bench_memory(logs_dir, samples):
+    """Memory growth while a long run streams through the engine (no transport)"""
+    engine = PasteurizerEngine(logs_dir, log_interval=1, catalog=False)
+    engine.subscribe_samples(lambda sample: None)
+    engine.start_recipe(72.0, 32.0, 30, "HEAT_COOL")
+    runs = [engine.telemetry.path]
+    engine.stop()
+    engine.start_recipe(72.0, 32.0, 30, "HEAT_COOL")  # back to back, same second
+    runs.append(engine.telemetry.path)
+    tracemalloc.start()
+    temp = 20.0
+    baseline = None
+    for i in range(samples):
+        if i == samples // 10:
+            baseline = tracemalloc.get_traced_memory()[0]
+        now = i * 0.01
+        temp += 0.002 if engine.process_state == "HEATING" else -0.002
+        engine.on_sample(Sample(now, temp, temp + 1, None))
+        if not engine.machine.active:
+            engine.start_recipe(72.0, 32.0, 30, "HEAT_COOL")
+            runs.append(engine.telemetry.path)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    engine.close()
+    return {
+        "samples": samples,
+        "growth_bytes": current - baseline,
+        "peak_traced_bytes": peak,
+        "runs": len(runs),
+        "run_directories": len(set(runs)),
+    }
+
+
+def time_process(args, env=None):
+    """Wall time of a fresh interpreter running args, plus its stdout"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + args, cwd=REPO, capture_output=True, text=True,
+                            timeout=120, env=env)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def bench_startup(repeats):
+    """Cold-process import times and, with a display, time until the GUI is interactive"""
+    result = {}
+    for module in ("pasteurizer_application", "pasteurizer_cli"):
+        times = [time_process(["-c", f"import {module}"])[0] for _ in range(repeats)]
+        result[f"import_{module.split('_')[1]}_ms"] = min(times)
+
+    with tempfile.TemporaryDirectory() as logs_dir:
+        ready, wall = [], []
+        for _ in range(repeats):
+            elapsed, proc = time_process(
+                ["-c", "import os, sys; os.chdir(sys.argv[1]); sys.argv[1:] = ['--exit-after-startup',"
+                       " '--log-level', 'WARNING']; import pasteurizer_application as a; a.main()",
+                 logs_dir], env=dict(os.environ, PYTHONPATH=REPO))
+            marker = [line for line in proc.stdout.splitlines() if line.startswith("STARTUP_MS")]
+            if proc.returncode or not marker:
+                result["gui_skipped"] = (proc.stderr.strip().splitlines() or ["no startup marker"])[-1]
+                break
+            ready.append(float(marker[0].split()[1]))
+            wall.append(elapsed)
+        if ready:
+            result["gui_ready_ms"] = min(ready)
+            result["gui_process_ms"] = min(wall)
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], cwd=REPO,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_all(quick=False):
+    scale = 10 if quick else 1
+    with tempfile.TemporaryDirectory() as logs_dir:
+        return {
+            "startup": bench_startup(3 if quick else 5),
+            "wifi_parse": bench_wifi_parse(200000 // scale),
+            "wifi_binary_parse": bench_wifi_binary_parse(200000 // scale),
+            "serial_parse": bench_serial_parse(100000 // scale),
+            "state_machine": bench_state_machine(1000000 // scale),
+            "transition_latency": bench_transition_latency(logs_dir, 200 // scale),
+            "csv_logging": bench_csv_logging(logs_dir, 100000 // scale),
+            "memory": bench_memory(logs_dir, 500000 // scale),
+        }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions"""
+    regressions = []
+    for section, metrics in results.items():
+        for name, value in metrics.items():
+            old = baseline.get(section, {}).get(name)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            if name.endswith("_per_sec"):
+                worse = value < old * (1 - tolerance)
+            elif name.endswith(("_ms", "_bytes")):
+                worse = value > old * (1 + tolerance)
+            else:
+                continue
+            if worse:
+                regressions.append(f"{section}.{name}: {old:.4g} -> {value:.4g}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pasteurizer end-to-end benchmarks")
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    parser.add_argument("--quick", action="store_true", help="10x smaller workloads")
+    parser.add_argument("--compare", metavar="BASELINE", help="previous results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative regression (default 0.2)")
+    parser.add_argument("--startup-only", action="store_true", help="run only the startup benchmark")
+    parser.add_argument("--startup-budget-ms", type=float, default=1500,
+                        help="fail when the GUI takes longer than this to become interactive")
+    args = parser.parse_args()
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": {"startup": bench_startup(3)} if args.startup_only else run_all(args.quick),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    status = 0
+    gui_ready = report["results"]["startup"].get("gui_ready_ms")
+    if gui_ready is not None and gui_ready > args.startup_budget_ms:
+        print(f"OVER BUDGET startup.gui_ready_ms: {gui_ready:.0f} > {args.startup_budget_ms:.0f}",
+              file=sys.stderr)
+        status = 1
+    memory = report["results"].get("memory", {})
+    if memory.get("runs") != memory.get("run_directories"):
+        # Back-to-back runs (same second) must not share a telemetry directory
+        print(f"RUN COLLISION memory: {memory['runs']} runs in {memory['run_directories']} directories",
+              file=sys.stderr)
+        status = 1
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(report["results"], baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        status = 1 if regressions else status
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,99 +1,333 @@
 # mock_arduino_pasteurizer.py
+"""Simulated pasteurizer controllers for local load and soak testing.
+
+One asyncio process serves any number of vats. Over TCP, vat N listens on
+--port + N and every client connected to it receives that vat's frames.
+With --serial, each vat gets a pseudo-terminal instead and the frames use the
+"[Arduino] Sent: ..." wrapping of the USB firmware.
+
+    python test/mock_arduino_pasteurizer.py                       # one vat, 1 Hz, like the board
+    python test/mock_arduino_pasteurizer.py 0.3 0.25              # legacy heat/cool rate arguments
+    python test/mock_arduino_pasteurizer.py --vats 20 --rate 500 --split 0.05 --garbage 0.01
+    python test/mock_arduino_pasteurizer.py --serial --vats 2     # prints the /dev/pts paths
+    python test/mock_arduino_pasteurizer.py --rate 2000 --corrupt 0.001 --lose 0.001
+
+A client that sends "binary 1" gets binary frames (see pasteurizer_protocol)
+from then on; the encoder here is written out separately, like firmware would
+be, so it also checks the decoder against the documented layout.
+"""
+import argparse
+import asyncio
+import binascii
+import math
+import os
+import random
 import socket
-import time
-import threading
-import select
+import struct
 import sys
+import time
 
-# State
-T_core = 25.0
-T_water = 25.0
-mode = "IDLE"  # "HEAT", "COOL", or "IDLE"
-running = True
+BINARY_MODES = {"IDLE": 0, "HEAT": 1, "COOL": 2}
 
-# Default Simulation parameters
-HEAT_RATE = 0.3   # degrees/sec
-COOL_RATE = 0.25  # degrees/sec
 
-# Parse command-line args for heat and cool rates if provided
-if len(sys.argv) > 1:
-    try:
-        HEAT_RATE = float(sys.argv[1])
-    except ValueError:
-        print(f"Invalid heat rate '{sys.argv[1]}', using default {HEAT_RATE}")
+def binary_frame(seq, core, water, mode):
+    body = struct.pack("<BHhhB", 1, seq & 0xFFFF, round(core * 100), round(water * 100),
+                       BINARY_MODES[mode])
+    return b"\xa5\x5a" + body + struct.pack("<H", binascii.crc_hqx(body, 0xFFFF))
+
+
+class ThermalModel:
+    """First-order plant: water chases the heater/chiller, the core lags behind the water.
+
+    heat_rate and cool_rate cap how fast the water can move (°/s), which keeps
+    the command-line meaning of the old linear simulator.
+    """
+
+    def __init__(self, heat_rate=0.3, cool_rate=0.25, ambient=25.0, heater_temp=95.0,
+                 chiller_temp=2.0, water_tau=60.0, core_tau=90.0, noise=0.05):
+        self.heat_rate = heat_rate
+        self.cool_rate = cool_rate
+        self.ambient = ambient
+        self.heater_temp = heater_temp
+        self.chiller_temp = chiller_temp
+        self.water_tau = water_tau
+        self.core_tau = core_tau
+        self.noise = noise
+        self.core = ambient
+        self.water = ambient
+        self.mode = "IDLE"
+
+    def step(self, dt):
+        if self.mode == "HEAT":
+            target, tau = self.heater_temp, self.water_tau
+        elif self.mode == "COOL":
+            target, tau = self.chiller_temp, self.water_tau
+        else:
+            target, tau = self.ambient, self.water_tau * 20  # losses to the room
+        change = (target - self.water) * (1 - math.exp(-dt / tau))
+        self.water += max(-self.cool_rate * dt, min(self.heat_rate * dt, change))
+        self.core += (self.water - self.core) * (1 - math.exp(-dt / self.core_tau))
+        self.core = max(0.0, min(self.core, 100.0))
+        self.water = max(0.0, min(self.water, 100.0))
+
+    def reading(self):
+        return (self.core + random.gauss(0, self.noise),
+                self.water + random.gauss(0, self.noise))
+
+
+class Faults:
+    def __init__(self, split=0.0, merge=0.0, garbage=0.0, drop_after=0.0, corrupt=0.0, lose=0.0):
+        self.split = split
+        self.merge = merge
+        self.garbage = garbage
+        self.drop_after = drop_after
+        self.corrupt = corrupt
+        self.lose = lose
+
+    def drop_deadline(self):
+        if not self.drop_after:
+            return None
+        return time.monotonic() + random.expovariate(1.0 / self.drop_after)
+
+
+GARBAGE = [b"\x00\xff\xfe", b"T_CORE:7x.4,T_WATER:", b"Watchdog reset", b"T_CORE:,T_WATER:nan,"]
+
+
+class SimulatedVat:
+    def __init__(self, name, model, rate, faults, prefix="", verbose=False):
+        self.name = name
+        self.model = model
+        self.rate = rate
+        self.faults = faults
+        self.prefix = prefix
+        self.verbose = verbose
+        self.clients = set()
+
+    def command(self, line, client=None):
+        command = line.strip().lower()
+        if not command:
+            return
+        print(f"[Mock Arduino {self.name}] Received: {command}")
+        if command in ("binary 1", "text"):
+            if client is not None:
+                client.binary = command != "text"
+        elif command == "cool":
+            self.model.mode = "COOL"
+        elif command == "heat":
+            self.model.mode = "HEAT"
+        elif command == "stop":
+            self.model.mode = "IDLE"
+
+    def frame(self):
+        core, water = self.model.reading()
+        if self.verbose:
+            print(f"[Mock Arduino {self.name}] Sent: T_CORE:{core:.1f},T_WATER:{water:.1f},"
+                  f"MODE:{self.model.mode}")
+        return core, water, self.model.mode
+
+    def text_frame(self, core, water, mode):
+        return f"{self.prefix}T_CORE:{core:.1f},T_WATER:{water:.1f},MODE:{mode}\n".encode()
+
+    async def simulate(self):
+        """Step the model at the frame rate and hand each frame to every client"""
+        period = 1.0 / self.rate
+        next_frame = time.monotonic()
+        while True:
+            now = time.monotonic()
+            frames = []
+            while next_frame <= now:
+                self.model.step(period)
+                frames.append(self.frame())
+                next_frame += period
+            for client in list(self.clients):
+                client.send_frames(frames)
+            # Above ~500 Hz frames go out in small bursts rather than one wakeup each
+            await asyncio.sleep(max(next_frame - time.monotonic(), 0.002))
+
+
+class Client:
+    """One connection to a vat; applies the output faults to its own stream"""
+
+    def __init__(self, vat, write, close):
+        self.vat = vat
+        self.write = write
+        self.close = close
+        self.held = b""
+        self.drop_at = vat.faults.drop_deadline()
+        self.binary = False
+        self.seq = 0
+
+    def encode(self, reading):
+        if not self.binary:
+            return self.vat.text_frame(*reading)
+        frame = binary_frame(self.seq, *reading)
+        self.seq += 1
+        corrupt = self.vat.faults.corrupt
+        if corrupt and random.random() < corrupt:
+            i = random.randrange(2, len(frame))
+            frame = frame[:i] + bytes([frame[i] ^ 0x10]) + frame[i + 1:]
+        return frame
+
+    def send_frames(self, readings):
+        faults = self.vat.faults
+        if self.drop_at and time.monotonic() >= self.drop_at:
+            print(f"[Mock Arduino {self.vat.name}] Dropping connection (fault injection)")
+            self.close()
+            return
+        for reading in readings:
+            frame = self.encode(reading)
+            if faults.lose and random.random() < faults.lose:
+                continue  # lost on the wire
+            if faults.garbage and random.random() < faults.garbage:
+                self.held += random.choice(GARBAGE) + b"\n"
+            self.held += frame
+            if faults.merge and random.random() < faults.merge:
+                continue  # glue the next frame onto this one
+            if faults.split and random.random() < faults.split:
+                cut = random.randrange(1, len(self.held))
+                self.write(self.held[:cut])
+                self.held = self.held[cut:]
+                continue  # the rest goes out with the next write
+            self.write(self.held)
+            self.held = b""
+
+
+async def serve_tcp(vat, host, port):
+    async def handle(reader, writer):
+        addr = writer.get_extra_info("peername")
+        print(f"[Mock Arduino {vat.name}] Connected by {addr}")
+        def write(data):
+            # A stalled reader must not make the simulator buffer without bound
+            if writer.transport.get_write_buffer_size() < 1_000_000:
+                writer.write(data)
+
+        client = Client(vat, write, writer.close)
+        vat.clients.add(client)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                vat.command(line.decode(errors="ignore"), client)
+        except ConnectionError:
+            pass
+        finally:
+            vat.clients.discard(client)
+            writer.close()
+            print(f"[Mock Arduino {vat.name}] Client {addr} disconnected.")
+
+    server = await asyncio.start_server(handle, host, port, reuse_address=True)
+    print(f"[Mock Arduino {vat.name}] Listening on {host}:{port}")
+    return server
+
+
+def serve_pty(vat):
+    import tty
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    os.set_blocking(master, False)
+    path = os.ttyname(slave)
+    loop = asyncio.get_running_loop()
+    buffer = b""
+    client = Client(vat, lambda data: write(data), lambda: None)
+
+    def on_command():
+        nonlocal buffer
+        try:
+            buffer += os.read(master, 1024)
+        except BlockingIOError:
+            return
+        except OSError:
+            return  # no process has the slave open yet
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            vat.command(line.decode(errors="ignore"), client)
+
+    def write(data):
+        try:
+            os.write(master, data)
+        except (BlockingIOError, OSError):
+            pass  # nobody reading: the tty buffer is full, drop like a real UART
+
+    loop.add_reader(master, on_command)
+    vat.clients.add(client)
+    print(f"[Mock Arduino {vat.name}] Serial port at {path}")
+    return slave  # keep the slave fd open so the pty survives client reconnects
+
+
+async def announce(vats, base_port, interval=2.0, port=8888):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sock.setblocking(False)
+    while True:
+        for i, vat in enumerate(vats):
+            message = f"PASTEURIZER {vat.name} port={base_port + i}".encode()
+            try:
+                sock.sendto(message, ("255.255.255.255", port))
+            except OSError:
+                sock.sendto(message, ("127.0.0.1", port))
+        await asyncio.sleep(interval)
+
+
+async def run(args):
+    faults = Faults(args.split, args.merge, args.garbage, args.drop_after, args.corrupt, args.lose)
+    vats = []
+    for i in range(args.vats):
+        model = ThermalModel(args.heat_rate, args.cool_rate, water_tau=args.water_tau,
+                             core_tau=args.core_tau, noise=args.noise)
+        vats.append(SimulatedVat(f"vat{i + 1}", model, args.rate, faults,
+                                 "[Arduino] Sent: " if args.serial else "", args.verbose))
+    print(f"[Mock Arduino] {args.vats} vat(s) at {args.rate} Hz, "
+          f"heat rate {args.heat_rate}°/s, cool rate {args.cool_rate}°/s")
+
+    keep = []
+    for i, vat in enumerate(vats):
+        if args.serial:
+            keep.append(serve_pty(vat))
+        else:
+            keep.append(await serve_tcp(vat, args.host, args.port + i))
+    tasks = [asyncio.create_task(vat.simulate()) for vat in vats]
+    if args.announce and not args.serial:
+        tasks.append(asyncio.create_task(announce(vats, args.port)))
+    await asyncio.gather(*tasks)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulated pasteurizer controllers")
+    parser.add_argument("heat_rate", nargs="?", type=float, default=0.3,
+                        help="maximum water heating rate in °/s (default 0.3)")
+    parser.add_argument("cool_rate", nargs="?", type=float, default=0.25,
+                        help="maximum water cooling rate in °/s (default 0.25)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12345, help="port of the first vat")
+    parser.add_argument("--vats", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=1.0, help="frames per second per vat")
+    parser.add_argument("--water-tau", type=float, default=60.0, help="water time constant (s)")
+    parser.add_argument("--core-tau", type=float, default=90.0, help="core lag behind water (s)")
+    parser.add_argument("--noise", type=float, default=0.05, help="sensor noise std-dev (°)")
+    parser.add_argument("--split", type=float, default=0.0,
+                        help="probability a frame is split across two writes")
+    parser.add_argument("--merge", type=float, default=0.0,
+                        help="probability a frame is merged with the next one")
+    parser.add_argument("--garbage", type=float, default=0.0,
+                        help="probability of a garbage line before a frame")
+    parser.add_argument("--drop-after", type=float, default=0.0,
+                        help="mean seconds before a client connection is dropped (0 = never)")
+    parser.add_argument("--corrupt", type=float, default=0.0,
+                        help="probability a binary frame has a flipped bit")
+    parser.add_argument("--lose", type=float, default=0.0,
+                        help="probability a frame is lost before it is written")
+    parser.add_argument("--serial", action="store_true", help="serve pseudo-terminals, not TCP")
+    parser.add_argument("--announce", action="store_true",
+                        help="broadcast discovery announcements on UDP 8888")
+    parser.add_argument("--verbose", action="store_true", help="print every frame")
+    return parser.parse_args(argv)
 
-if len(sys.argv) > 2:
-    try:
-        COOL_RATE = float(sys.argv[2])
-    except ValueError:
-        print(f"Invalid cool rate '{sys.argv[2]}', using default {COOL_RATE}")
-
-def simulate_temps():
-    global T_core, T_water, mode, running
-    while running:
-        if mode == "HEAT":
-            T_water += HEAT_RATE
-            if T_water > T_core:
-                T_core += HEAT_RATE * 0.9
-        elif mode == "COOL":
-            T_water -= COOL_RATE
-            if T_water < T_core:
-                T_core -= COOL_RATE * 0.8
-        # Clamp values
-        T_core = max(0, min(T_core, 100))
-        T_water = max(0, min(T_water, 100))
-        time.sleep(1)
-
-def start_server():
-    global mode, running
-
-    HOST = '127.0.0.1'
-    PORT = 12345
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    server.bind((HOST, PORT))
-    server.listen(1)
-    print(f"[Mock Arduino] Listening on {HOST}:{PORT}")
-    print(f"[Mock Arduino] Heat rate: {HEAT_RATE}°/s, Cool rate: {COOL_RATE}°/s")
-
-    conn, addr = server.accept()
-    conn.setblocking(False)
-    print(f"[Mock Arduino] Connected by {addr}")
 
+if __name__ == "__main__":
     try:
-        while running:
-            # Send simulated temperature data
-            payload = f"T_CORE:{T_core:.1f},T_WATER:{T_water:.1f},MODE:{mode}\n"
-            conn.sendall(payload.encode())
-            print(f"[Mock Arduino] Sent: {payload.strip()}")
-
-            # Check for readable data without blocking
-            ready_to_read, _, _ = select.select([conn], [], [], 1.0)
-            if ready_to_read:
-                try:
-                    data = conn.recv(1024)
-                    if data:
-                        command = data.decode().strip().lower()
-                        print(f"[Mock Arduino] Received: {command}")
-                        if command == "cool":
-                            mode = "COOL"
-                        elif command == "heat":
-                            mode = "HEAT"
-                        elif command == "stop":
-                            mode = "IDLE"
-                    else:
-                        print("[Mock Arduino] Client disconnected.")
-                        break
-                except Exception as e:
-                    print(f"[Mock Arduino] Receive error: {e}")
+        asyncio.run(run(parse_args()))
     except KeyboardInterrupt:
         print("[Mock Arduino] Shutting down on keyboard interrupt.")
-    finally:
-        running = False
-        conn.close()
-        server.close()
-        print("[Mock Arduino] Server closed.")
-
-# Start simulating in parallel
-threading.Thread(target=simulate_temps, daemon=True).start()
-start_server()
+        sys.exit(0)
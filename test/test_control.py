@@ -0,0 +1,115 @@
+"""ProcessStateMachine cycles driven by a fake monotonic clock.
+
+    python -m pytest test
+"""
+import os
+import sys
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from pasteurizer_control import ProcessStateMachine  # noqa: E402
+
+
+class FakeClock:
+    """Monotonic clock the test advances by hand"""
+
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class ProcessStateMachineTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def machine(self, **kwargs):
+        settings = dict(heat_setpoint=72.0, cool_setpoint=32.0, hold_time=30,
+                        process_type="HEAT_COOL", clock=self.clock)
+        settings.update(kwargs)
+        return ProcessStateMachine(**settings)
+
+    def feed(self, machine, core_temp, seconds=1.0):
+        """Advance the clock and feed one sample; the events it triggered"""
+        self.clock.advance(seconds)
+        return [t.event for t in machine.update(core_temp)]
+
+    def test_hold_timer_starts_at_setpoint_and_runs_for_hold_time(self):
+        machine = self.machine()
+        started = machine.start()
+        self.assertEqual((started.state, started.command), ("HEATING", "heat"))
+        self.assertEqual(started.timestamp, 100.0)
+
+        self.assertEqual(self.feed(machine, 60.0), [])
+        self.assertEqual(self.feed(machine, 72.0), ["HOLD_STARTED"])
+        self.assertEqual(machine.state, "HOLDING")
+        self.assertEqual(machine.hold_start, 102.0)
+        self.assertEqual(machine.hold_remaining(), 30.0)
+
+        self.assertEqual(self.feed(machine, 72.5, 29.0), [])
+        self.assertEqual(machine.hold_remaining(), 1.0)
+        self.assertEqual(self.feed(machine, 72.5), ["COOLING_STARTED"])
+        self.assertEqual(machine.state, "COOLING")
+        self.assertIsNone(machine.hold_remaining())
+
+        self.assertEqual(self.feed(machine, 40.0), [])
+        self.assertEqual(self.feed(machine, 32.0), ["PROCESS_COMPLETED"])
+        self.assertEqual(machine.state, "IDLE")
+
+    def test_heat_only_completes_when_hold_ends(self):
+        machine = self.machine(process_type="HEAT")
+        machine.start()
+        self.assertEqual(self.feed(machine, 75.0), ["HOLD_STARTED"])
+        transitions = machine.update(75.0, self.clock.now + 30)
+        self.assertEqual([(t.event, t.state, t.command) for t in transitions],
+                         [("PROCESS_COMPLETED", "IDLE", "stop")])
+
+    def test_lethality_target_ends_hold(self):
+        # At ref_temp the lethal rate is 1 min/min, so F grows by 1 per 60 s.
+        # Counting starts at the first sample after start().
+        machine = self.machine(hold_time=10_000, target_lethality=1.0,
+                               ref_temp=72.0, z_value=7.0)
+        machine.start()
+        self.assertEqual(self.feed(machine, 72.0), ["HOLD_STARTED"])
+        self.assertEqual(self.feed(machine, 72.0, 30.0), [])
+        self.assertAlmostEqual(machine.lethality.value, 0.5)
+        self.assertAlmostEqual(machine.hold_remaining(), 30.0)
+
+        self.assertEqual(self.feed(machine, 72.0, 29.0), [])
+        self.assertEqual(self.feed(machine, 72.0), ["COOLING_STARTED"])
+        self.assertGreaterEqual(machine.lethality.value, 1.0)
+
+    def test_cool_only_goes_straight_to_cooling(self):
+        machine = self.machine(process_type="COOL")
+        started = machine.start()
+        self.assertEqual((started.state, started.command), ("COOLING", "cool"))
+        self.assertEqual(self.feed(machine, 80.0), [])
+        self.assertIsNone(machine.hold_start)
+        self.assertEqual(self.feed(machine, 31.0), ["PROCESS_COMPLETED"])
+        self.assertEqual(machine.state, "IDLE")
+
+    def test_manual_stop_goes_idle_and_ignores_later_samples(self):
+        machine = self.machine()
+        machine.start()
+        self.feed(machine, 72.0)
+        self.clock.advance(5.0)
+        stopped = machine.stop()
+        self.assertEqual((stopped.previous, stopped.state, stopped.event, stopped.command),
+                         ("HOLDING", "IDLE", "PROCESS_STOPPED", "stop"))
+        self.assertEqual(stopped.timestamp, 106.0)
+
+        lethality = machine.lethality.value
+        self.assertEqual(self.feed(machine, 90.0, 60.0), [])
+        self.assertEqual(machine.state, "IDLE")
+        self.assertEqual(machine.lethality.value, lethality)
+        self.assertIsNone(machine.hold_remaining())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""SharedSampleRing when the writer laps the reader.
+
+    python -m pytest test
+"""
+import os
+import sys
+import threading
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from pasteurizer_process import RING_HEADER, RING_RECORD, SharedSampleRing  # noqa: E402
+
+
+class SharedSampleRingTest(unittest.TestCase):
+    def setUp(self):
+        self.ring = SharedSampleRing(capacity=4)
+        self.addCleanup(self.ring.close)
+
+    def write(self, *indices):
+        for i in indices:
+            self.ring.write(float(i), float(i), float(i), 0.0, "HEATING")
+
+    def test_reads_everything_while_not_lapped(self):
+        self.write(0, 1, 2)
+        records, index = self.ring.read_since(0)
+        self.assertEqual([r[0] for r in records], [0.0, 1.0, 2.0])
+        self.assertEqual(index, 3)
+
+    def test_skips_the_slot_being_written_after_a_lap(self):
+        self.write(*range(8))
+        # The writer is half-way through index 8, which reuses the slot of index 4
+        offset = RING_HEADER.size + (8 % self.ring.capacity) * RING_RECORD.size
+        self.ring.shm.buf[offset:offset + 8] = b"\xff" * 8
+        records, index = self.ring.read_since(0)
+        self.assertEqual([r[0] for r in records], [5.0, 6.0, 7.0])
+        self.assertEqual(index, 8)
+
+    def test_concurrent_writer_lapping_the_reader(self):
+        ring = SharedSampleRing(capacity=16)
+        self.addCleanup(ring.close)
+        total = 50000
+
+        def writer():
+            for i in range(total):
+                ring.write(float(i), float(i), float(i), 0.0, "HEATING")
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        index, last = 0, -1
+        while thread.is_alive() or index < ring.count:
+            records, index = ring.read_since(index)
+            for timestamp, core, water, _lethality, _state in records:
+                # Every record is whole (all fields from one write) and in order
+                self.assertEqual(timestamp, core)
+                self.assertEqual(timestamp, water)
+                self.assertGreater(timestamp, last)
+                last = timestamp
+        thread.join()
+        self.assertEqual(last, total - 1)
+
+
+if __name__ == "__main__":
+    unittest.main()